@@ -17,12 +17,13 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from window_video_player import WindowVideoPlayer
+import sys
+from pathlib import Path
 
+# Modules of the app import each other by their names (also with python -m)
+sys.path.insert(0, str(Path(__file__).parent))
 
-def main():
-    WindowVideoPlayer()
-
+from command_line import main  # noqa: E402
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,197 @@
+# OTVideoPlayer: Command line interface of the app
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+COMMANDS = ["play", "info", "snapshots", "frames"]
+
+# Only the play command imports tkinter (see play()), all other commands run
+# without a display
+
+
+def play(args):
+    from window_video_player import WindowVideoPlayer
+
+    WindowVideoPlayer(video_path=args.video, playlist=args.playlist)
+
+
+def info(args):
+    from segmented_video_capture import SegmentedVideoCapture, find_segments
+    from video_capture import VideoCapture
+    from video_index import VideoIndex
+
+    if args.playlist:
+        capture = SegmentedVideoCapture(find_segments(args.video))
+        # Exact frame counts of all segments
+        capture.wait_for_indexes()
+    else:
+        # Exact frame count and times of variable frame rate videos
+        capture = VideoCapture(args.video, use_index=False)
+        capture.set_index(VideoIndex.load_or_build(args.video))
+    try:
+        total_frames = int(capture.total_frames)
+        print(
+            json.dumps(
+                {
+                    "video_path": str(capture.video_path),
+                    "width": int(capture.width),
+                    "height": int(capture.height),
+                    "fps": float(capture.fps),
+                    "total_frames": total_frames,
+                    "start_time": capture.start_time.isoformat(),
+                    "end_time": capture.get_time_of_frame(total_frames).isoformat(),
+                },
+                indent=4,
+            )
+        )
+    finally:
+        capture.release()
+
+
+def snapshots(args):
+    from export import export_snapshots
+    from helpers import _get_datetime_from_string
+    from video_capture import VideoCapture
+    from video_index import VideoIndex
+
+    frame_numbers = list(args.frames)
+    if args.times:
+        capture = VideoCapture(args.video, use_index=False)
+        try:
+            capture.set_index(VideoIndex.load_or_build(args.video))
+            frame_numbers.extend(
+                capture.get_frame_of_time(
+                    _get_datetime_from_string(text, capture.start_time)
+                )
+                for text in args.times
+            )
+        finally:
+            capture.release()
+    snapshot_paths = export_snapshots(
+        [(args.video, frame_number) for frame_number in sorted(set(frame_numbers))],
+        output_dir=args.output_dir,
+        processes=args.processes,
+    )
+    for snapshot_path in snapshot_paths:
+        print(snapshot_path)
+
+
+def frames(args):
+    import cv2
+
+    from player_engine import PlayerEngine
+
+    engine = PlayerEngine(args.video, playlist=args.playlist)
+    output_dir = Path(args.output_dir or Path(engine.video_path).with_suffix(""))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.height:
+        capture = engine.video_capture
+        width = round(args.height * capture.width / capture.height)
+        engine.set_size(args.height, width)
+    count = 0
+    try:
+        with open(output_dir / "frames.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "realtime", "videotime", "path"])
+            for frame_number, _, frame in engine.frames(
+                start=args.start, end=args.end, step=args.step
+            ):
+                frame_path = output_dir / f"{frame_number:06d}.{args.format}"
+                # Frames of the engine are RGB
+                cv2.imwrite(str(frame_path), cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+                realtime, videotime, _ = engine.get_timestamp()
+                writer.writerow([frame_number, realtime, videotime, frame_path.name])
+                count += 1
+    finally:
+        engine.release()
+    print(f"{count} frames saved in {output_dir}")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="OTVideoPlayer",
+        description="Play videos or export frames of videos without user interface",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    parser_play = subparsers.add_parser("play", help="Open the video player window")
+    parser_play.add_argument("video", nargs="?", help="Video file")
+    parser_play.add_argument(
+        "--playlist", action="store_true", help="Play all recording segments"
+    )
+    parser_play.set_defaults(function=play)
+
+    parser_info = subparsers.add_parser("info", help="Print properties of a video")
+    parser_info.add_argument("video", help="Video file")
+    parser_info.add_argument(
+        "--playlist", action="store_true", help="All recording segments as one"
+    )
+    parser_info.set_defaults(function=info)
+
+    parser_snapshots = subparsers.add_parser(
+        "snapshots", help="Save frames in native resolution"
+    )
+    parser_snapshots.add_argument("video", help="Video file")
+    parser_snapshots.add_argument(
+        "--frames", nargs="+", type=int, default=[], help="Frame numbers"
+    )
+    parser_snapshots.add_argument(
+        "--times",
+        nargs="+",
+        default=[],
+        help="Real times (yyyy-mm-dd HH:MM:SS, dd.mm.yyyy HH:MM:SS or HH:MM:SS)",
+    )
+    parser_snapshots.add_argument("--output-dir", help="Defaults to video directory")
+    parser_snapshots.add_argument(
+        "--processes", type=int, help="Number of worker processes"
+    )
+    parser_snapshots.set_defaults(function=snapshots)
+
+    parser_frames = subparsers.add_parser(
+        "frames", help="Save a range of frames with their times"
+    )
+    parser_frames.add_argument("video", help="Video file")
+    parser_frames.add_argument(
+        "--playlist", action="store_true", help="All recording segments as one"
+    )
+    parser_frames.add_argument("--start", type=int, default=1, help="First frame")
+    parser_frames.add_argument("--end", type=int, help="Last frame")
+    parser_frames.add_argument("--step", type=int, default=1, help="Frame step")
+    parser_frames.add_argument("--height", type=int, help="Defaults to native")
+    parser_frames.add_argument(
+        "--output-dir", help="Defaults to a directory named like the video"
+    )
+    parser_frames.add_argument(
+        "--format", choices=["jpg", "png"], default="jpg", help="Image format"
+    )
+    parser_frames.set_defaults(function=frames)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Without command the window is opened like before
+    if not argv or argv[0] not in [*COMMANDS, "-h", "--help"]:
+        argv = ["play", *argv]
+    args = get_parser().parse_args(argv)
+    args.function(args)
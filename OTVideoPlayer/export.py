@@ -0,0 +1,408 @@
+# OTVideoPlayer: Export of snapshots and clips from videos
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import multiprocessing
+import os
+import queue
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from segmented_video_capture import get_frame_count, get_segment_frame
+from video_capture import VideoCapture
+from video_index import VideoIndex
+
+
+def get_export_path(video_path, time, output_dir=None, suffix=".jpg"):
+    """Get the path of a snapshot or clip named <stem>_<time><suffix>.
+
+    Args:
+        video_path (str or Path): Path of the video file
+        time (datetime.datetime): Real time of the (first) frame
+        output_dir (str or Path, optional): Directory of the exported file.
+            Defaults to None (directory of the video).
+        suffix (str, optional): Suffix of the exported file. Defaults to ".jpg".
+
+    Returns:
+        Path: Path of the exported file
+    """
+    video_path = Path(video_path)
+    time_str = time.strftime("%Y-%m-%d_%H-%M-%S-%f")[:-3]
+    export_path = video_path.with_name(f"{video_path.stem}_{time_str}{suffix}")
+    if output_dir:
+        export_path = Path(output_dir) / export_path.name
+    return export_path
+
+
+def save_snapshots(
+    video_path, frame_numbers, output_dir=None, index=None, progress=None, cancel=None
+):
+    """Save snapshots of frames of a video in native resolution.
+
+    Frames are read in ascending order, so the video is decoded sequentially
+    (seeking only where it is faster than decoding forward).
+
+    Args:
+        video_path (str or Path): Path of the video file
+        frame_numbers (list): Numbers of the frames (starting at 1)
+        output_dir (str or Path, optional): Directory of the snapshots.
+            Defaults to None (directory of the video).
+        index (VideoIndex, optional): Keyframe index of the video.
+            Defaults to None (loaded from the sidecar file).
+        progress (queue.Queue, optional): 1 is put for every processed frame.
+            Defaults to None.
+        cancel (threading.Event, optional): Stops saving snapshots if set.
+            Defaults to None.
+
+    Returns:
+        list: Paths of the saved snapshots (frames that could not be read or
+            written are reported and skipped)
+    """
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    video_capture = VideoCapture(
+        str(video_path), buffer_size=1, cache_mb=0, use_index=index is None
+    )
+    if index is not None:
+        video_capture.set_index(index)
+    snapshot_paths = []
+    try:
+        for frame_number in sorted(frame_numbers):
+            if cancel is not None and cancel.is_set():
+                break
+            ret, frame = video_capture.get_native_frame(frame_number)
+            if not ret:
+                print(f"Could not read frame {frame_number} of {video_path}")
+            else:
+                snapshot_path = get_export_path(
+                    video_path, video_capture.current_time, output_dir
+                )
+                if cv2.imwrite(filename=str(snapshot_path), img=frame):
+                    snapshot_paths.append(str(snapshot_path))
+                else:
+                    print(f"Could not write snapshot {snapshot_path}")
+            if progress is not None:
+                progress.put(1)
+    finally:
+        video_capture.release()
+    return snapshot_paths
+
+
+def split_into_segments(frame_numbers, count):
+    """Split sorted frame numbers into count contiguous segments of similar size.
+
+    Args:
+        frame_numbers (list): Sorted numbers of the frames
+        count (int): Number of segments
+
+    Returns:
+        list: Segments (lists of frame numbers), empty ones are omitted
+    """
+    count = max(min(count, len(frame_numbers)), 1)
+    size, remainder = divmod(len(frame_numbers), count)
+    segments = []
+    start = 0
+    for segment in range(count):
+        end = start + size + (segment < remainder)
+        segments.append(frame_numbers[start:end])
+        start = end
+    return [segment for segment in segments if segment]
+
+
+def group_frames_by_video(timestamps):
+    """Group frame numbers of timestamps by video file.
+
+    Frame numbers beyond the end of a video (counted across recording segments in
+    playlist mode) are assigned to the segment they belong to.
+
+    Args:
+        timestamps (iterable): Video paths and frame numbers (starting at 1)
+
+    Returns:
+        dict: Sets of frame numbers by video path
+    """
+    frame_counts = {}
+    frames_by_video = defaultdict(set)
+    for video_path, frame_number in timestamps:
+        video_path, frame_number = str(video_path), int(frame_number)
+        if video_path not in frame_counts:
+            frame_counts[video_path] = get_frame_count(video_path)
+        if frame_number > frame_counts[video_path]:
+            video_path, frame_number = get_segment_frame(video_path, frame_number)
+        frames_by_video[str(video_path)].add(frame_number)
+    return frames_by_video
+
+
+def export_snapshots(
+    timestamps, output_dir=None, processes=None, on_progress=None, cancel_event=None
+):
+    """Save snapshots of many frames of one or more videos in parallel.
+
+    Frames are sorted by video and frame number and each video is split into
+    contiguous segments (proportional to its number of frames), which are decoded
+    sequentially by a pool of processes.
+
+    Args:
+        timestamps (iterable): Video paths and frame numbers (starting at 1)
+        output_dir (str or Path, optional): Directory of the snapshots.
+            Defaults to None (directory of each video).
+        processes (int, optional): Number of worker processes.
+            Defaults to None (number of CPUs).
+        on_progress (callable, optional): Called with number of processed frames,
+            total number of frames and throughput in frames/s. Defaults to None.
+        cancel_event (threading.Event, optional): Cancels the export if set.
+            Defaults to None.
+
+    Returns:
+        list: Paths of the saved snapshots
+    """
+    frames_by_video = group_frames_by_video(timestamps)
+    total = sum(len(frame_numbers) for frame_numbers in frames_by_video.values())
+    if not total:
+        return []
+    processes = processes or os.cpu_count() or 1
+
+    tasks = []
+    for video_path, frame_numbers in sorted(frames_by_video.items()):
+        # Build missing keyframe indexes once instead of in every worker
+        try:
+            VideoIndex.load_or_build(video_path)
+        except ValueError as e:
+            print(e)
+        segment_count = max(round(processes * len(frame_numbers) / total), 1)
+        tasks.extend(
+            (video_path, segment)
+            for segment in split_into_segments(sorted(frame_numbers), segment_count)
+        )
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        progress = manager.Queue()
+        cancel = manager.Event()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    save_snapshots,
+                    video_path,
+                    segment,
+                    output_dir,
+                    progress=progress,
+                    cancel=cancel,
+                )
+                for video_path, segment in tasks
+            ]
+            _report_progress(
+                futures, total, progress, cancel, on_progress, cancel_event
+            )
+            return [path for future in futures for path in future.result()]
+
+
+def _report_progress(futures, total, progress, cancel, on_progress, cancel_event):
+    start_time = time.perf_counter()
+    processed = 0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            cancel.set()
+        finished = all(future.done() for future in futures)
+        try:
+            progress.get(timeout=0.1)
+        except queue.Empty:
+            if finished:
+                return
+            continue
+        processed += 1
+        if on_progress:
+            elapsed = time.perf_counter() - start_time
+            on_progress(processed, total, processed / elapsed if elapsed else 0.0)
+
+
+def merge_windows(frame_numbers, frames_before, frames_after, total_frames):
+    """Merge windows of frames around frame numbers that overlap or touch.
+
+    Args:
+        frame_numbers (list): Numbers of the frames (starting at 1)
+        frames_before (int): Number of frames before each frame
+        frames_after (int): Number of frames after each frame
+        total_frames (int): Number of frames of the video
+
+    Returns:
+        list: First and last frame number of each merged window
+    """
+    windows = []
+    for frame_number in sorted(frame_numbers):
+        start = max(frame_number - frames_before, 1)
+        end = min(frame_number + frames_after, int(total_frames))
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return [tuple(window) for window in windows]
+
+
+def save_clips(
+    video_path, windows, output_dir=None, fourcc="mp4v", progress=None, cancel=None
+):
+    """Save clips of windows of frames of a video in a single forward pass.
+
+    Frames are streamed from the decoder into the video writer of each clip, so
+    clips are never held in memory.
+
+    Args:
+        video_path (str or Path): Path of the video file
+        windows (list): First and last frame number of each clip, sorted and not
+            overlapping (see merge_windows())
+        output_dir (str or Path, optional): Directory of the clips.
+            Defaults to None (directory of the video).
+        fourcc (str, optional): Codec of the clips. Defaults to "mp4v".
+        progress (queue.Queue, optional): 1 is put for every written frame.
+            Defaults to None.
+        cancel (threading.Event, optional): Stops saving clips if set.
+            Defaults to None.
+
+    Returns:
+        list: Paths of the saved clips (with at least one frame)
+
+    Raises:
+        ValueError: If a video writer can not be opened
+    """
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    video_capture = VideoCapture(str(video_path), buffer_size=1, cache_mb=0)
+    size = (int(video_capture.width), int(video_capture.height))
+    clip_paths = []
+    try:
+        for start, end in windows:
+            if cancel is not None and cancel.is_set():
+                break
+            ret, frame = video_capture.get_native_frame(start)
+            if not ret:
+                continue
+            clip_path = get_export_path(
+                video_path, video_capture.current_time, output_dir, suffix=".mp4"
+            )
+            fps = video_capture.fps
+            writer = cv2.VideoWriter(
+                str(clip_path), cv2.VideoWriter_fourcc(*fourcc), fps, size
+            )
+            if not writer.isOpened():
+                raise ValueError("Unable to open video writer", str(clip_path))
+            written_frames = 0
+            try:
+                for frame_number in range(start, end + 1):
+                    if frame_number > start:
+                        ret, frame = video_capture.get_native_frame(frame_number)
+                    if not ret or (cancel is not None and cancel.is_set()):
+                        break
+                    writer.write(frame)
+                    written_frames += 1
+                    if progress is not None:
+                        progress.put(1)
+            finally:
+                writer.release()
+            if written_frames:
+                clip_paths.append(str(clip_path))
+    finally:
+        video_capture.release()
+    return clip_paths
+
+
+def export_clips(
+    timestamps,
+    seconds_before=5,
+    seconds_after=5,
+    output_dir=None,
+    processes=None,
+    on_progress=None,
+    cancel_event=None,
+):
+    """Save clips around many frames of one or more videos in parallel.
+
+    Overlapping windows of a video are merged into one clip and each video is
+    decoded in a single forward pass. Videos are processed in parallel by a pool
+    of processes, which bounds the number of concurrent decoders.
+
+    Args:
+        timestamps (iterable): Video paths and frame numbers (starting at 1)
+        seconds_before (float, optional): Length of the clips before each frame.
+            Defaults to 5.
+        seconds_after (float, optional): Length of the clips after each frame.
+            Defaults to 5.
+        output_dir (str or Path, optional): Directory of the clips.
+            Defaults to None (directory of each video).
+        processes (int, optional): Maximum number of concurrent decoders.
+            Defaults to None (number of CPUs).
+        on_progress (callable, optional): Called with number of written frames,
+            total number of frames and throughput in frames/s. Defaults to None.
+        cancel_event (threading.Event, optional): Cancels the export if set.
+            Defaults to None.
+
+    Returns:
+        list: Paths of the saved clips
+    """
+    frames_by_video = group_frames_by_video(timestamps)
+
+    windows_by_video = {}
+    for video_path, frame_numbers in sorted(frames_by_video.items()):
+        # Exact frame count and frame rate (builds missing keyframe indexes once)
+        try:
+            VideoIndex.load_or_build(video_path)
+        except ValueError as e:
+            print(e)
+        video_capture = VideoCapture(video_path, buffer_size=1, cache_mb=0)
+        try:
+            windows_by_video[video_path] = merge_windows(
+                frame_numbers,
+                round(seconds_before * video_capture.fps),
+                round(seconds_after * video_capture.fps),
+                video_capture.total_frames,
+            )
+        finally:
+            video_capture.release()
+    total = sum(
+        end - start + 1
+        for windows in windows_by_video.values()
+        for start, end in windows
+    )
+    if not total:
+        return []
+    processes = min(processes or os.cpu_count() or 1, len(windows_by_video))
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        progress = manager.Queue()
+        cancel = manager.Event()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    save_clips,
+                    video_path,
+                    windows,
+                    output_dir,
+                    progress=progress,
+                    cancel=cancel,
+                )
+                for video_path, windows in windows_by_video.items()
+            ]
+            _report_progress(
+                futures, total, progress, cancel, on_progress, cancel_event
+            )
+            return [path for future in futures for path in future.result()]
@@ -0,0 +1,101 @@
+# OTVideoPlayer: LRU cache of decoded frames
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import threading
+from collections import OrderedDict
+
+
+class FrameCache:
+    """Least recently used cache of decoded frames with a memory budget.
+
+    Frames are evicted in least recently used order as soon as the total size of
+    the cached frames exceeds the budget, so the number of cached frames adapts
+    to the resolution of the frames.
+
+    Args:
+        max_mb (float): Memory budget of the cached frames in MB
+    """
+
+    def __init__(self, max_mb=256):
+        self.max_bytes = int(max_mb * 1024**2)
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a frame from the cache and mark it as most recently used.
+
+        Args:
+            key (tuple): Key of the frame, e.g. frame number and output size
+
+        Returns:
+            np.ndarray: Cached frame or None if not cached
+        """
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        """Add a frame to the cache and evict least recently used frames.
+
+        Cached frames are not copied and must not be modified afterwards.
+
+        Args:
+            key (tuple): Key of the frame, e.g. frame number and output size
+            frame (np.ndarray): Frame to be cached
+        """
+        if frame.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._frames:
+                self.size_bytes -= self._frames.pop(key).nbytes
+            self._frames[key] = frame
+            self.size_bytes += frame.nbytes
+            while self.size_bytes > self.max_bytes:
+                _, evicted_frame = self._frames.popitem(last=False)
+                self.size_bytes -= evicted_frame.nbytes
+
+    def clear(self):
+        """Remove all frames from the cache (statistics are kept)."""
+        with self._lock:
+            self._frames.clear()
+            self.size_bytes = 0
+
+    def get_stats(self):
+        """Get hit and miss statistics and memory usage of the cache.
+
+        Returns:
+            dict: hits, misses, hit rate, number of frames and size in MB
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "frames": len(self._frames),
+                "size_mb": self.size_bytes / 1024**2,
+            }
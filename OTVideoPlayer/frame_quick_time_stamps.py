@@ -18,22 +18,30 @@
 
 
 import datetime as dt
+import functools
 import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, messagebox, simpledialog, ttk
 
-import pandas as pd
 from helpers import EPOCH
+from timestamp_store import (
+    CREATED,
+    CREATOR,
+    EVENT,
+    FRAME,
+    REALTIME,
+    VIDEOPATH,
+    VIDEOTIME,
+    TimestampStore,
+)
+from virtual_treeview import VirtualTreeview
+from window_export import WindowExport
 
-REALTIME = "realtime"
-VIDEOTIME = "videotime"
-FRAME = "frame"
-EVENT = "event"
-VIDEOPATH = "videopath"
-CREATED = "created"
-CREATOR = "creator"
+ALL_EVENTS = "All events"
+
+# Colors of the event markers below the slider of the video player
+MARKER_COLORS = ["red", "blue", "green", "orange", "purple", "brown", "magenta"]
 
-HEADERS = [REALTIME, VIDEOTIME, FRAME, EVENT, VIDEOPATH, CREATED, CREATOR]
 
 class FrameQuickTimeStamps(tk.LabelFrame):
     def __init__(self, buttons_per_row=3, **kwargs):
@@ -41,7 +49,10 @@ class FrameQuickTimeStamps(tk.LabelFrame):
         self.path = None
         self.btns = {}
         self.buttons_per_row = buttons_per_row
-        self.timestamps = []
+        self.timestamps = TimestampStore()
+        self.journal = None
+        self.database = None
+        self.marker_colors = {}
         self.tree_visibility_dict = {
             "video": True,
             "creator": False,
@@ -76,7 +87,12 @@ class FrameQuickTimeStamps(tk.LabelFrame):
         self.label_timestamps_path.pack()
 
         # Treeview
-        self.tree = ttk.Treeview(master=self.frame_tree)
+        self.tree = VirtualTreeview(
+            master=self.frame_tree,
+            get_row_count=lambda: len(self.timestamps),
+            get_row_id=self.get_timestamp_id,
+            format_row=self.format_timestamp,
+        )
         self.tree.bind(
             "<ButtonRelease-3>",
             [self.tree.selection_remove(item) for item in self.tree.selection()],
@@ -109,7 +125,26 @@ class FrameQuickTimeStamps(tk.LabelFrame):
             master=self.frame_tree, orient="vertical", command=self.tree.yview
         )
         self.tree_scrollbar.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=self.tree_scrollbar.set)
+        self.tree.yscrollcommand = self.tree_scrollbar.set
+
+        # Jump to previous or next event (of all or one event type)
+        self.combobox_event = ttk.Combobox(
+            master=self.frame_controls, values=[ALL_EVENTS], state="readonly"
+        )
+        self.combobox_event.set(ALL_EVENTS)
+        self.combobox_event.pack(side="left", padx=5, pady=5)
+        self.button_previous_event = tk.Button(
+            master=self.frame_controls,
+            text="Previous event",
+            command=lambda: self.jump_to_event(-1),
+        )
+        self.button_previous_event.pack(side="left", padx=5, pady=5)
+        self.button_next_event = tk.Button(
+            master=self.frame_controls,
+            text="Next event",
+            command=lambda: self.jump_to_event(1),
+        )
+        self.button_next_event.pack(side="left", padx=5, pady=5)
 
         # Delete selected buttons
         self.button_delete_selected = tk.Button(
@@ -118,14 +153,15 @@ class FrameQuickTimeStamps(tk.LabelFrame):
             command=self.delete_selected_timestamps,
         )
         self.button_delete_selected.pack(
+            side="left",
             padx=5,
             pady=5,
         )
 
     def bind_keyboard_and_mouse_events(self):
         self.master.bind("<Control-s>", self.save)
-        # TODO: Unbind MouseWheel-VideoControls-connectin when mouse is in frame_tree
-        # self.frame_tree.unbind("<MouseWheel>")  # , self.set_delta_frames
+        self.master.bind("<Control-Left>", lambda event: self.jump_to_event(-1))
+        self.master.bind("<Control-Right>", lambda event: self.jump_to_event(1))
 
     def test(self, event):
         print(event.char)
@@ -153,8 +189,11 @@ class FrameQuickTimeStamps(tk.LabelFrame):
         elif label in list(self.btns.keys()):
             messagebox.showinfo("Button already exists", "Please choose another label")
         else:
-            if not self.path:
-                self.path = filedialog.asksaveasfilename(defaultextension=".csv")
+            if not self.path and not self.database:
+                path = filedialog.asksaveasfilename(defaultextension=".csv")
+                if path:
+                    # Create csv file and journal right away
+                    self.save(path=path)
             self.btns[label] = tk.Button(
                 self.frame_buttons,
                 text=label,
@@ -170,6 +209,7 @@ class FrameQuickTimeStamps(tk.LabelFrame):
                 padx=5,
                 pady=5,
             )
+            self.journal_buttons()
 
     def delete_button(self, label=None):
         if len(self.btns) > 0:
@@ -177,37 +217,52 @@ class FrameQuickTimeStamps(tk.LabelFrame):
                 label = list(self.btns.keys())[-1]
             self.btns[label].destroy()
             self.btns.pop(label, None)
+            self.journal_buttons()
 
     def delete_all_buttons(self):
         labels = list(self.btns.keys())
         for label in labels:
             self.btns[label].destroy()
             self.btns.pop(label, None)
+        self.journal_buttons()
+
+    def journal_buttons(self):
+        self.combobox_event.configure(values=[ALL_EVENTS, *self.btns.keys()])
+        if self.combobox_event.get() not in self.btns:
+            self.combobox_event.set(ALL_EVENTS)
+        if self.journal:
+            self.journal.set_buttons(self.btns.keys())
+        if self.database:
+            self.database.set_buttons(self.btns.keys())
+
+    def get_timestamp_id(self, index):
+        return str(self.timestamps.get_id(index))
+
+    def format_timestamp(self, index):
+        timestamp_id = self.timestamps.get_id(index)
+
+        def get(header):
+            return self.timestamps.get(timestamp_id, header)
+
+        def format_time(header):
+            return dt.datetime.utcfromtimestamp(get(header)).strftime(
+                "%d.%m.%Y %H:%M:%S.%f"
+            )[:-3]
+
+        values = (
+            get(CREATED),
+            get(EVENT),
+            format_time(REALTIME),
+            format_time(VIDEOTIME),
+            get(FRAME),
+            Path(get(VIDEOPATH)).name,
+            get(CREATOR),
+        )
+        return format_time(CREATED), values
 
     def update_tree(self):
-        self.tree.delete(*self.tree.get_children())
-        for timestamp in self.timestamps:
-            self.tree.insert(
-                parent="",
-                index="end",
-                text=dt.datetime.utcfromtimestamp(timestamp["created"]).strftime(
-                    "%d.%m.%Y %H:%M:%S.%f"
-                )[:-3],
-                values=(
-                    timestamp["created"],
-                    timestamp["event"],
-                    dt.datetime.utcfromtimestamp(timestamp["realtime"]).strftime(
-                        "%d.%m.%Y %H:%M:%S.%f"
-                    )[:-3],
-                    dt.datetime.utcfromtimestamp(timestamp["videotime"]).strftime(
-                        "%d.%m.%Y %H:%M:%S.%f"
-                    )[:-3],
-                    timestamp["frame"],
-                    Path(timestamp["videopath"]).name,
-                    timestamp["creator"],
-                ),
-            )
-        self.tree.yview_moveto(1)
+        # Only the rows in the visible window are (re)rendered
+        self.tree.refresh(see_end=True)
 
     def add_timestamp(self, label):
         import os
@@ -218,56 +273,209 @@ class FrameQuickTimeStamps(tk.LabelFrame):
             timestamp_video,
             frame,
         ) = self.master.frame_video_player.get_timestamp()
-        self.timestamps.append(
-            {
-                REALTIME: timestamp_real,
-                VIDEOTIME: timestamp_video,
-                FRAME: frame,
-                EVENT: label,
-                VIDEOPATH: videopath,
-                CREATED: (dt.datetime.now() - EPOCH).total_seconds(),
-                CREATOR: os.getlogin(),
-            }
+        timestamp = {
+            REALTIME: timestamp_real,
+            VIDEOTIME: timestamp_video,
+            FRAME: frame,
+            EVENT: label,
+            VIDEOPATH: videopath,
+            CREATED: (dt.datetime.now() - EPOCH).total_seconds(),
+            CREATOR: os.getlogin(),
+        }
+        timestamp_id = self.timestamps.add(timestamp)
+        if self.journal:
+            self.journal.add(timestamp_id, timestamp)
+        self.master.frame_video_player.add_event_marker(
+            timestamp_id, frame, self.get_marker_color(label)
         )
 
         self.update_tree()
 
     def delete_selected_timestamps(self):
-        # Get list of creation times of selected timestamps
-        timestamps_selected_created = [
-            float(self.tree.item(item)["values"][0]) for item in self.tree.selection()
-        ]
-        # Remove timestamps with matching creatiom times
-        self.timestamps = [
-            timestamp
-            for timestamp in self.timestamps
-            if timestamp["created"] not in timestamps_selected_created
-        ]
+        # Delete selected timestamps (also those out of view) by their ids
+        timestamp_ids = [int(row_id) for row_id in self.tree.get_selected_ids()]
+        self.timestamps.delete(timestamp_ids)
+        if self.journal and timestamp_ids:
+            self.journal.delete(timestamp_ids)
+        self.master.frame_video_player.remove_event_markers(timestamp_ids)
+        self.tree.clear_selection()
 
         self.update_tree()
 
     def open(self):
+        from timestamp_csv import load_timestamps
+
         print("Open timestamps csv")
         path = filedialog.askopenfilename(
             title="Please choose a csv file of timestamps (metainfo in 1st line)",
             filetypes=[("CSV", "*.csv")],
         )
         if path:
+            # Keep unsaved changes of the previous csv file in its journal
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+            if self.database:
+                self.database.close()
+                self.database = None
             # Set new path
             self.path = path
             self.stringvar_timestamps_path.set(path)
-            # Read buttons from csv file (first line is comment with button names)
-            with open(path, "r") as f:
-                comment = f.readline()
-            comment = comment.replace("# Buttons: ", "")
-            comment = comment.replace("\n", "")
-            btn_list = comment.split(",")
-            [self.add_button(label=label.rstrip()) for label in btn_list]
-            # Read timestamps
-            timestamps_df = pd.read_csv(path, sep=",", comment="#")
-            self.timestamps = timestamps_df.to_dict("records")
+            # Read timestamps, buttons and unsaved changes of a previous session
+            self.timestamps, labels, journal, changes = load_timestamps(path)
+            if journal.labels is not None:
+                self.delete_all_buttons()
+            [self.add_button(label=label) for label in labels]
+            self.journal = journal
 
             self.update_tree()
+            self.show_event_markers()
+            if changes:
+                messagebox.showinfo(
+                    "Recovered unsaved changes",
+                    f"Recovered {changes} unsaved changes of {Path(path).name}",
+                )
+
+    def open_database(self):
+        from timestamp_database import DATABASE_SUFFIX, TimestampDatabase
+
+        print("Open timestamps database")
+        path = filedialog.asksaveasfilename(
+            title="Please choose or create a database of timestamps",
+            filetypes=[("SQLite", f"*{DATABASE_SUFFIX}")],
+            defaultextension=DATABASE_SUFFIX,
+            confirmoverwrite=False,
+        )
+        if path:
+            # Timestamps are stored in the database instead of a csv file
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+            if self.database:
+                self.database.close()
+            database = TimestampDatabase(path)
+            labels = database.get_buttons()
+            self.path = None
+            self.database = database
+            self.timestamps = database
+            self.stringvar_timestamps_path.set(path)
+            self.delete_all_buttons()
+            [self.add_button(label=label) for label in labels]
+
+            self.update_tree()
+            self.show_event_markers()
+
+    def import_csv(self):
+        if not self.database:
+            messagebox.showinfo("No database", "Please open a database first")
+            return
+        paths = filedialog.askopenfilenames(
+            title="Please choose csv files of timestamps to import",
+            filetypes=[("CSV", "*.csv")],
+        )
+        if paths:
+            count = self.database.import_csv(paths)
+            self.update_tree()
+            self.show_event_markers()
+            messagebox.showinfo(
+                "Imported timestamps",
+                f"Imported {count} timestamps from {len(paths)} csv files",
+            )
+
+    def get_marker_color(self, event):
+        return self.marker_colors.setdefault(
+            event, MARKER_COLORS[len(self.marker_colors) % len(MARKER_COLORS)]
+        )
+
+    def show_event_markers(self):
+        """Mark the timestamps of the current video below the slider."""
+        player = self.master.frame_video_player
+        player.clear_event_markers()
+        for timestamp_id in self.timestamps.get_ids_of_video(player.video_path):
+            player.add_event_marker(
+                timestamp_id,
+                self.timestamps.get(timestamp_id, FRAME),
+                self.get_marker_color(self.timestamps.get(timestamp_id, EVENT)),
+            )
+
+    def jump_to_event(self, direction):
+        """Seek the video to the frame of the previous or next timestamp.
+
+        Only timestamps of the event chosen in the combobox are considered, if
+        any. The frames of the timestamps of each video are kept sorted, so the
+        next one is found by binary search.
+
+        Args:
+            direction (int): -1 for the previous or 1 for the next timestamp
+        """
+        player = self.master.frame_video_player
+        if not player.video_capture:
+            return
+        event = self.combobox_event.get()
+        event = None if event == ALL_EVENTS else event
+        get_frame = (
+            self.timestamps.get_next_frame
+            if direction > 0
+            else self.timestamps.get_previous_frame
+        )
+        frame = get_frame(player.video_path, player.get_target_frame(), event)
+        if frame is not None:
+            player.seek(frame)
+
+    def get_timestamps_to_export(self, from_csv=False):
+        import pandas as pd
+
+        if from_csv:
+            path = filedialog.askopenfilename(
+                title="Please choose a csv file of timestamps (metainfo in 1st line)",
+                filetypes=[("CSV", "*.csv")],
+            )
+            if not path:
+                return []
+            timestamps_df = pd.read_csv(path, sep=",", comment="#")
+            timestamps = list(zip(timestamps_df[VIDEOPATH], timestamps_df[FRAME]))
+        else:
+            timestamps = list(self.timestamps.iter_rows(VIDEOPATH, FRAME))
+        if not timestamps:
+            messagebox.showinfo("No timestamps", "There are no timestamps to export")
+        return timestamps
+
+    def export_snapshots(self, from_csv=False):
+        from export import export_snapshots
+
+        timestamps = self.get_timestamps_to_export(from_csv=from_csv)
+        if not timestamps:
+            return
+        WindowExport(
+            master=self,
+            title="Export snapshots",
+            export=functools.partial(export_snapshots, timestamps),
+        )
+
+    def export_clips(self, from_csv=False):
+        from export import export_clips
+
+        timestamps = self.get_timestamps_to_export(from_csv=from_csv)
+        if not timestamps:
+            return
+        seconds = simpledialog.askfloat(
+            "Clip length",
+            "Seconds before and after each time stamp:",
+            initialvalue=5,
+            minvalue=0,
+        )
+        if seconds is None:
+            return
+        WindowExport(
+            master=self,
+            title="Export clips",
+            export=functools.partial(
+                export_clips,
+                timestamps,
+                seconds_before=seconds,
+                seconds_after=seconds,
+            ),
+        )
 
     def save_as(self):
         print("Save as... timestamps csv")
@@ -278,19 +486,20 @@ class FrameQuickTimeStamps(tk.LabelFrame):
             self.save(path=path)
 
     def save(self, event=None, path=None):
+        from timestamp_csv import save_timestamps
+
         print("Save timestamps csv")
+        if self.database:
+            # Changes are already committed, csv files are exported on request
+            if path:
+                self.database.export_csv(path, self.btns.keys())
+            return
         if not path:
             path = self.path
         try:
-            # Write to csv file (first line is comment with button names)
-            with open(path, "w") as f:
-                btns_str = ",".join(self.btns.keys())
-                f.write(f"# Buttons: {btns_str}\n")
-            if self.timestamps:
-                # Convert timestamps to table and write to csv file using pandas
-                pd.DataFrame(self.timestamps).to_csv(path, index=False, mode="a")
-            else:
-                pd.DataFrame(columns=HEADERS).to_csv(path, index=False, mode="a")
+            self.journal = save_timestamps(
+                path, self.timestamps, self.btns.keys(), self.journal
+            )
             # Update file path
             self.path = path
             self.stringvar_timestamps_path.set(path)
@@ -298,6 +507,13 @@ class FrameQuickTimeStamps(tk.LabelFrame):
             print(e)
             self.save_as()
 
+    def destroy(self):
+        if self.journal:
+            self.journal.close()
+        if self.database:
+            self.database.close()
+        super().destroy()
+
 
 class MenuQuickTimeStamps(tk.Menu):
     def __init__(self, master, **kwargs):
@@ -326,6 +542,42 @@ class MenuQuickTimeStamps(tk.Menu):
             command=lambda: self.master.master.frame_quick_timestamps.save_as(),
         )
 
+        # Database
+        self.add_separator()
+        self.add_command(
+            label="Open database ...",
+            command=self.master.master.frame_quick_timestamps.open_database,
+        )
+        self.add_command(
+            label="Import csv into database ...",
+            command=self.master.master.frame_quick_timestamps.import_csv,
+        )
+
+        # Export
+        self.add_separator()
+        self.add_command(
+            label="Export snapshots ...",
+            command=lambda: self.master.master.frame_quick_timestamps.export_snapshots(
+                from_csv=False
+            ),
+        )
+        self.add_command(
+            label="Export snapshots from csv ...",
+            command=lambda: self.master.master.frame_quick_timestamps.export_snapshots(
+                from_csv=True
+            ),
+        )
+        self.add_command(
+            label="Export clips ...",
+            command=lambda: self.master.master.frame_quick_timestamps.export_clips(),
+        )
+        self.add_command(
+            label="Export clips from csv ...",
+            command=lambda: self.master.master.frame_quick_timestamps.export_clips(
+                from_csv=True
+            ),
+        )
+
         # Buttons
         self.add_separator()
         self.add_command(
@@ -0,0 +1,157 @@
+# OTVideoPlayer: Tk Frame with filmstrip and slider preview of thumbnails
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import tkinter as tk
+
+import PIL.Image
+import PIL.ImageTk
+
+
+class FrameThumbnailStrip(tk.Frame):
+    """Filmstrip of thumbnails and hover preview over the slider of the player.
+
+    Thumbnails are read from the memory-mapped ThumbnailStrip only, so neither
+    the filmstrip nor the preview ever touch a decoder.
+
+    Args:
+        thumbnail_strip (ThumbnailStrip): Thumbnails of the video
+        slider (tk.Scale): Slider of the player to show the hover preview for
+        on_select (callable): Called with the frame number of a clicked thumbnail
+        width (int): Width of the filmstrip
+        refresh_interval (int, optional): Interval in ms to redraw the filmstrip
+            while thumbnails are being built. Defaults to 1000.
+    """
+
+    def __init__(
+        self,
+        thumbnail_strip,
+        slider,
+        on_select,
+        width,
+        refresh_interval=1000,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.thumbnail_strip = thumbnail_strip
+        self.slider = slider
+        self.on_select = on_select
+        self.width = width
+        self.refresh_interval = refresh_interval
+        self.after_id = None
+        self.drawn = 0
+        self.photos = []
+        self.slot_frame_numbers = []
+        self.preview_photo = None
+        self.layout()
+        self.bind_mouse_events()
+        self.refresh()
+
+    def layout(self):
+        # Filmstrip
+        self.canvas = tk.Canvas(
+            master=self,
+            width=self.width,
+            height=self.thumbnail_strip.height,
+            highlightthickness=0,
+        )
+        self.canvas.pack()
+
+        # Hover preview above the slider
+        self.preview = tk.Toplevel(self)
+        self.preview.overrideredirect(True)
+        self.preview.withdraw()
+        self.preview_label = tk.Label(
+            master=self.preview, borderwidth=1, relief="solid"
+        )
+        self.preview_label.pack()
+
+    def bind_mouse_events(self):
+        self.slider.bind("<Motion>", self.show_preview, add="+")
+        self.slider.bind("<Leave>", self.hide_preview, add="+")
+        self.canvas.bind("<ButtonRelease-1>", self.select)
+
+    def refresh(self):
+        self.after_id = None
+        if self.thumbnail_strip.built != self.drawn:
+            self.draw_filmstrip()
+        if not self.thumbnail_strip.is_complete():
+            self.after_id = self.after(self.refresh_interval, self.refresh)
+
+    def set_width(self, width):
+        # Thumbnails are redrawn to fill the new width
+        if width == self.width:
+            return
+        self.width = width
+        self.canvas.configure(width=width)
+        self.draw_filmstrip()
+
+    def draw_filmstrip(self):
+        # Thumbnails evenly spread over the video (as far as built yet)
+        self.drawn = built = self.thumbnail_strip.built
+        self.canvas.delete("all")
+        self.photos = []
+        self.slot_frame_numbers = []
+        if not built:
+            return
+        slots = max(self.width // self.thumbnail_strip.width, 1)
+        count = len(self.thumbnail_strip.thumbnails)
+        for slot in range(slots):
+            index = round(slot * (count - 1) / max(slots - 1, 1))
+            if index >= built:
+                break
+            photo = PIL.ImageTk.PhotoImage(
+                image=PIL.Image.fromarray(self.thumbnail_strip.thumbnails[index])
+            )
+            self.canvas.create_image(
+                slot * self.thumbnail_strip.width, 0, image=photo, anchor=tk.NW
+            )
+            self.photos.append(photo)
+            self.slot_frame_numbers.append(self.thumbnail_strip.get_frame_number(index))
+
+    def select(self, event):
+        slot = event.x // self.thumbnail_strip.width if self.drawn else None
+        if slot is not None and slot < len(self.slot_frame_numbers):
+            self.on_select(self.slot_frame_numbers[slot])
+
+    def show_preview(self, event):
+        # Frame number at the mouse position of the slider
+        frame_number = float(self.slider.tk.call(self.slider._w, "get", event.x, 0))
+        thumbnail = self.thumbnail_strip.get_thumbnail(frame_number)
+        if thumbnail is None:
+            return
+        image = PIL.Image.fromarray(thumbnail)
+        photo = self.preview_photo
+        if photo and (photo.width(), photo.height()) == image.size:
+            self.preview_photo.paste(image)
+        else:
+            self.preview_photo = PIL.ImageTk.PhotoImage(image=image)
+            self.preview_label.configure(image=self.preview_photo)
+        self.preview.geometry(
+            f"+{event.x_root - image.width // 2}"
+            f"+{self.slider.winfo_rooty() - image.height - 8}"
+        )
+        self.preview.deiconify()
+
+    def hide_preview(self, event=None):
+        self.preview.withdraw()
+
+    def destroy(self):
+        if self.after_id:
+            self.after_cancel(self.after_id)
+        super().destroy()
@@ -0,0 +1,149 @@
+# OTVideoPlayer: Timings of the stages of decoding and showing frames
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import csv
+import time
+
+import numpy as np
+
+# Stages of decoding and showing a frame:
+#   seek: Seeking the capture in VideoCapture.get_frame()
+#   decode: Reading a frame from the capture (also in the decoder thread)
+#   resize: Resizing a frame to the canvas size
+#   convert: Converting a frame from BGR to RGB
+#   fetch: Getting a frame (decoded, buffered or cached) in the UI thread
+#   photo: Updating or creating the PhotoImage on the canvas
+#   tick: Running one tick of the playback loop
+#   tick_lag: Delay of a tick of the playback loop behind its schedule (Tk jitter)
+STAGES = ["seek", "decode", "resize", "convert", "fetch", "photo", "tick", "tick_lag"]
+
+
+class FrameTimings:
+    """Durations of the stages of decoding and showing frames.
+
+    Each stage has a ring buffer of the end times and durations of its latest
+    records, preallocated once, so recording only writes two floats. Recording
+    is off until enabled. Records from several threads are not locked, two
+    simultaneous records of the same stage may rarely overwrite each other.
+
+    Args:
+        capacity (int, optional): Number of records kept per stage.
+            Defaults to 4096.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.enabled = False
+        self._rows = {stage: row for row, stage in enumerate(STAGES)}
+        self._times = np.zeros((len(STAGES), capacity))
+        self._durations = np.zeros((len(STAGES), capacity))
+        self._counts = [0] * len(STAGES)
+
+    def record(self, stage, start, end=None):
+        """Record the duration of a stage (if enabled).
+
+        Args:
+            stage (str): Stage (one of STAGES)
+            start (float): time.perf_counter() at the start of the stage
+            end (float, optional): time.perf_counter() at the end of the stage.
+                Defaults to None (now).
+        """
+        if not self.enabled:
+            return
+        if end is None:
+            end = time.perf_counter()
+        row = self._rows[stage]
+        position = self._counts[row] % self.capacity
+        self._times[row, position] = end
+        self._durations[row, position] = end - start
+        self._counts[row] += 1
+
+    def clear(self):
+        self._counts = [0] * len(STAGES)
+
+    def get_durations(self, stage):
+        """Get the recorded durations of a stage (in ring buffer order).
+
+        Args:
+            stage (str): Stage (one of STAGES)
+
+        Returns:
+            np.ndarray: Durations in seconds
+        """
+        row = self._rows[stage]
+        return self._durations[row, : min(self._counts[row], self.capacity)]
+
+    def get_percentiles(self, stage, percentiles=(50, 95, 100)):
+        """Get percentiles of the recorded durations of a stage.
+
+        Args:
+            stage (str): Stage (one of STAGES)
+            percentiles (tuple, optional): Percentiles. Defaults to (50, 95, 100).
+
+        Returns:
+            list: Durations in ms (empty if nothing was recorded)
+        """
+        durations = self.get_durations(stage)
+        if not len(durations):
+            return []
+        return (np.percentile(durations, percentiles) * 1000).tolist()
+
+    def get_rate(self, stage, seconds=1.0):
+        """Get how often a stage ended per second recently, e.g. the shown fps.
+
+        Args:
+            stage (str): Stage (one of STAGES)
+            seconds (float, optional): Time span. Defaults to 1.
+
+        Returns:
+            float: Records per second
+        """
+        row = self._rows[stage]
+        times = self._times[row, : min(self._counts[row], self.capacity)]
+        return np.count_nonzero(times > time.perf_counter() - seconds) / seconds
+
+    def export_csv(self, path):
+        """Write all records ordered by time to a csv file.
+
+        Args:
+            path (str or Path): Path of the csv file
+
+        Returns:
+            int: Number of written records
+        """
+        records = []
+        for stage, row in self._rows.items():
+            count = min(self._counts[row], self.capacity)
+            records.extend(
+                zip(
+                    self._times[row, :count].tolist(),
+                    [stage] * count,
+                    self._durations[row, :count].tolist(),
+                )
+            )
+        records.sort()
+        start = records[0][0] if records else 0
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time_s", "stage", "duration_ms"])
+            writer.writerows(
+                (f"{end - start:.6f}", stage, f"{duration * 1000:.3f}")
+                for end, stage, duration in records
+            )
+        return len(records)
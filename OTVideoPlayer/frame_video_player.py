@@ -18,44 +18,192 @@
 
 
 import datetime
+import time
 import tkinter as tk
-from pathlib import Path
-from tkinter import font, ttk
+from tkinter import filedialog, font, simpledialog, ttk
 from tkinter.messagebox import showinfo
 
-import cv2
-import PIL.Image
-import PIL.ImageTk
+from helpers import _get_datetime_from_string
+from seek_scheduler import SeekScheduler
 
-from helpers import EPOCH
-from video_capture import VideoCapture
+# Aspect ratio of the canvas until the video is opened
+DEFAULT_ASPECT_RATIO = 16 / 9
+
+# Height of the event markers below the slider
+MARKER_HEIGHT = 8
+
+# Refresh interval of the performance overlay in ms
+OVERLAY_INTERVAL = 500
+
+# Zoom factor per mouse wheel step
+ZOOM_STEP = 1.25
+
+# Delay in ms after the last change of the canvas size until frames are resized
+RESIZE_DELAY = 150
 
 
 class FrameVideoPlayer(tk.LabelFrame):
-    def __init__(self, video_path, canvas_height=500, **kwargs):
+    def __init__(
+        self,
+        video_path,
+        canvas_height=500,
+        buffer_size=32,
+        ui_refresh_rate=10,
+        thumbnail_interval=10,
+        max_fps=60,
+        trick_play_speed=16,
+        playlist=False,
+        segments=None,
+        start_time=None,
+        timings_enabled=False,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
 
         self.video_path = video_path
-        self.video_capture = VideoCapture(self.video_path)
-        self.paused = True
-
+        # Play all recording segments of the camera (or the given ones) as one video
+        self.playlist = playlist
+        self.segments = segments
+        # Real time to start playing at (instead of the first frame)
+        self.start_time = start_time
+        # Durations of the stages of showing frames, recorded from the start if
+        # enabled or else while the performance overlay is shown
+        self.timings_enabled = timings_enabled
+        self.overlay_after_id = None
+        self.tick_due = None
+        # Video is opened after the window is shown (see open_video()), playback
+        # state is kept by the engine
+        self.engine = None
+        self.video_capture = None
+        self.buffer_size = buffer_size
+        self.thumbnail_interval = thumbnail_interval
+        self.max_fps = max_fps
+        self.SPEEDS = ["0.25x", "0.5x", "1x", "2x", "4x", "8x", "16x", "32x", "64x"]
+        # From this speed on only keyframes are shown (trick play)
+        self.trick_play_speed = trick_play_speed
+        self.thumbnail_strip = None
+        self.frame_thumbnail_strip = None
+        self.seek_scheduler = None
+
+        # Initial size of the frames, later fitted into the canvas (see fit_video())
         self.canvas_height = canvas_height
-        self.canvas_width = int(
-            self.canvas_height * self.video_capture.width / self.video_capture.height
-        )
+        self.canvas_width = int(self.canvas_height * DEFAULT_ASPECT_RATIO)
+        self.image_offset = (0, 0)
+        self.resize_after_id = None
 
         self.symbol_font_size = 9
         self.symbol_font = font.Font(
             family="Helvetica", size=self.symbol_font_size, weight=font.BOLD
         )
         self.SYMBOL_PLAY_PAUSE = "\u23EF"
+        self.SYMBOL_PLAY_BACKWARD = "\u25C0"
         self.SYMBOL_SNAPSHOT = "\U0001F4F7"
 
         self.after_id = None
+        # Frame numbers of the event markers by id
+        self.event_markers = {}
+        self.slider_position = None
+        self.slider_dragging = False
+        self.photo = None
+        # Canvas position where panning started or was last applied
+        self.pan_position = None
+        # Slider and time label are updated at most this often per second during
+        # playback
+        self.ui_refresh_rate = ui_refresh_rate
+        self.controls_updated = 0
 
         self.layout()
+        self.set_controls_state("disabled")
+        # Idle callbacks run after the pending first paint of the window
+        self.after_idle(self.open_video)
+
+    @property
+    def paused(self):
+        return self.engine.paused if self.engine else True
+
+    @property
+    def backward(self):
+        return self.engine.backward if self.engine else False
+
+    @property
+    def timings(self):
+        return self.engine.timings if self.engine else None
+
+    def open_video(self):
+        # Heavy modules (OpenCV, NumPy, PIL) are only imported now
+        from PIL import Image, ImageTk
+
+        from frame_thumbnail_strip import FrameThumbnailStrip
+        from player_engine import PlayerEngine
+        from thumbnail_strip import ThumbnailStrip
+
+        # Looked up once instead of for every frame shown by show_frame()
+        self.image_from_array = Image.fromarray
+        self.photo_image = ImageTk.PhotoImage
+        self.engine = PlayerEngine(
+            self.video_path,
+            playlist=self.playlist,
+            segments=self.segments,
+            on_frame=self.show_frame,
+            buffer_size=self.buffer_size,
+            max_fps=self.max_fps,
+            trick_play_speed=self.trick_play_speed,
+        )
+        # In playlist mode this is the first segment
+        self.video_path = self.engine.video_path
+        self.video_capture = self.engine.video_capture
+        self.set_speed()
+
+        self.canvas_width = int(
+            self.canvas_height * self.video_capture.width / self.video_capture.height
+        )
+        self.engine.set_size(self.canvas_height, self.canvas_width)
+        self.canvas.configure(width=self.canvas_width)
+        self.slider_frame.configure(to=self.video_capture.total_frames)
+
+        # Filmstrip of thumbnails above the controls (and preview over the slider),
+        # thumbnails are built in the background (not across segments)
+        if not self.playlist:
+            # The keyframe index of the player is reused for building thumbnails
+            self.thumbnail_strip = ThumbnailStrip(
+                self.video_path,
+                interval=self.thumbnail_interval,
+                get_index=self.video_capture.wait_for_index,
+            )
+            self.thumbnail_strip.load_or_build()
+            self.frame_thumbnail_strip = FrameThumbnailStrip(
+                master=self,
+                thumbnail_strip=self.thumbnail_strip,
+                slider=self.slider_frame,
+                on_select=self.seek,
+                width=self.canvas_width,
+            )
+            self.frame_thumbnail_strip.pack(side="bottom", before=self.canvas)
+
+        self.seek_scheduler = SeekScheduler(
+            widget=self,
+            video_capture=self.video_capture,
+            on_frame=self.show_frame,
+            height=self.canvas_height,
+            width=self.canvas_width,
+        )
+        self.set_controls_state("normal")
         self.bind_keyboard_and_mouse_events()
+        if self.timings_enabled:
+            self.enable_timings()
         self.play()
+        if self.start_time:
+            self.seek(self.video_capture.get_frame_of_time(self.start_time))
+        self.event_generate("<<VideoOpened>>")
+
+    def set_controls_state(self, state):
+        for widget in [self.slider_frame, *self.controls.winfo_children()]:
+            if widget is self.frame_slider:
+                continue
+            if widget is self.combobox_speed and state == "normal":
+                widget.configure(state="readonly")
+            else:
+                widget.configure(state=state)
 
     def layout(self):
 
@@ -67,18 +215,30 @@ class FrameVideoPlayer(tk.LabelFrame):
 
         # VIDEO CANVAS
 
-        # Create a canvas that can fit the above video source size
+        # Create a canvas that can fit the above video source size, it follows the
+        # size of the window (packed after the controls, so it shrinks first)
         self.canvas = tk.Canvas(
             self,
             width=self.canvas_width,
             height=self.canvas_height,
+            highlightthickness=0,
         )
-        self.canvas.pack()
-        # self.canvas.config(width=200, height=200)
+        # Single image item, the PhotoImage shown is updated in place for every frame
+        self.canvas_image = self.canvas.create_image(0, 0, anchor=tk.NW)
 
         # VIDEO CONTROLS
         self.controls = tk.Frame(master=self)
-        self.controls.pack()
+        self.controls.pack(side="bottom")
+        self.canvas.pack(fill="both", expand=True)
+
+        # Play backward button
+        self.btn_play_backward = tk.Button(
+            self.controls,
+            text=self.SYMBOL_PLAY_BACKWARD,
+            command=lambda: self.play_pause(backward=True),
+            font=self.symbol_font,
+        )
+        self.btn_play_backward.pack(anchor=tk.CENTER, expand=True, side="left")
 
         # Play/pause button
         self.btn_play_pause = tk.Button(
@@ -134,17 +294,36 @@ class FrameVideoPlayer(tk.LabelFrame):
         )
         self.button_n_frames_backward.pack(anchor="center", expand=True, side="left")
 
-        # Slider
+        # Playback speed
+        self.combobox_speed_var = tk.StringVar()
+        self.combobox_speed_var.set("1x")
+        self.combobox_speed = ttk.Combobox(
+            master=self.controls,
+            values=self.SPEEDS,
+            width=5,
+            state="readonly",
+            textvariable=self.combobox_speed_var,
+        )
+        self.combobox_speed.bind("<<ComboboxSelected>>", self.set_speed)
+        self.combobox_speed.pack(anchor="center", expand=True, side="left")
+
+        # Slider with event markers below
+        self.frame_slider = tk.Frame(master=self.controls)
+        self.frame_slider.pack(anchor=tk.CENTER, expand=True, side="left")
         self.slider_frame_var = tk.IntVar()
         self.slider_frame = tk.Scale(
-            self.controls,
+            self.frame_slider,
             orient="horizontal",
             length=400,
             from_=1,
-            to=self.video_capture.total_frames,
+            to=1,
             command=self.slide,
         )
-        self.slider_frame.pack(anchor=tk.CENTER, expand=True, side="left")
+        self.slider_frame.pack(fill="x")
+        self.canvas_markers = tk.Canvas(
+            self.frame_slider, height=MARKER_HEIGHT, highlightthickness=0
+        )
+        self.canvas_markers.pack(fill="x")
 
         # Current time
         self.label_current_time_var = tk.StringVar()
@@ -166,100 +345,341 @@ class FrameVideoPlayer(tk.LabelFrame):
         self.master.bind("<space>", self.play_pause)
         self.frames_per_mousewheelgrid = 1
         self.master.bind("<MouseWheel>", self.set_delta_frames)
+        self.slider_frame.bind("<ButtonPress-1>", self.set_slider_dragging)
+        self.slider_frame.bind(
+            "<ButtonRelease-1>", lambda event: self.set_slider_dragging(event, False)
+        )
+        self.slider_frame.bind("<Configure>", self.reposition_event_markers)
+        self.master.bind("<Control-g>", self.go_to_time)
+        self.master.bind("<F3>", self.toggle_overlay)
+        self.label_current_time.bind("<Double-Button-1>", self.go_to_time)
+        # Zoom at the mouse position (Ctrl + mouse wheel) and pan by dragging
+        self.canvas.bind("<Control-MouseWheel>", self.zoom)
+        self.canvas.bind("<Control-Button-4>", self.zoom)
+        self.canvas.bind("<Control-Button-5>", self.zoom)
+        self.canvas.bind("<ButtonPress-1>", self.start_pan)
+        self.canvas.bind("<B1-Motion>", self.pan)
+        self.canvas.bind("<ButtonRelease-1>", self.pan)
+        self.master.bind("<Control-0>", self.reset_zoom)
+        self.canvas.bind("<Configure>", self.resize_canvas)
+
+    def set_speed(self, event=None):
+        self.engine.set_speed(float(self.combobox_speed_var.get().rstrip("x")))
+
+    def set_slider_dragging(self, event=None, dragging=True):
+        self.slider_dragging = dragging
 
     def test(self, event):
         print(event)
 
-    def play_pause(self, event=None):
+    def play_pause(self, event=None, backward=False):
         if self.paused:
-            self.paused = False
+            self.seek_scheduler.cancel()
+            self.engine.play(backward=backward)
             self.play()
         else:
-            self.paused = True
+            self.engine.pause()
+            if self.after_id:
+                self.after_cancel(self.after_id)
+                self.after_id = None
+            self.tick_due = None
+            self.update_controls()
+            # Frames during playback are resized with fast interpolation
+            self.seek(self.get_target_frame())
 
     def snapshot(self):
-        # Get a frame from the video source
-        if self.frame.any():
-            video_path = Path(self.video_path)
-            video_time_str = self.video_capture.current_time.strftime(
-                "%Y-%m-%d_%H-%M-%S-%f"
-            )[:-3]
-            snapshot_path_str = str(
-                video_path.with_stem(f"{video_path.stem}_{video_time_str}").with_suffix(
-                    ".jpg"
-                )
-            )
-            cv2.imwrite(
-                filename=snapshot_path_str,
-                img=cv2.cvtColor(self.frame, cv2.COLOR_RGB2BGR),
-            )
-            showinfo(self.master, f"Snapshot saved at: {snapshot_path_str}")
+        # Save the current frame in native resolution
+        snapshot_path = self.engine.snapshot()
+        if snapshot_path:
+            showinfo(self.master, f"Snapshot saved at: {snapshot_path}")
+
+    def play(self):
+        start = time.perf_counter()
+        if self.timings and self.tick_due:
+            self.timings.record("tick_lag", self.tick_due, start)
+        if self.paused:
+            self.display_new_frame()
+            return
+        # Engine shows the frame due according to the playback clock
+        delay = self.engine.tick()
+        self.after_id = self.after(delay, self.play)
+        if self.timings:
+            self.timings.record("tick", start)
+            self.tick_due = time.perf_counter() + delay / 1000
 
-    def play(self, next_show=None, previous_time=None):
-        self.display_new_frame()
+    def slide(self, event=None):
+        frame_number = int(float(self.slider_frame.get()))
+        # Ignore the callback triggered by updating the slider in show_frame()
+        if frame_number == self.slider_position:
+            return
+        self.seek(frame_number, preview=True)
 
-        if not self.paused:
-            current_time = datetime.datetime.now()
-            if previous_time:
-                delay_already = (current_time - previous_time).total_seconds() * 1000
-                delay_wanted = 1000 / self.video_capture.fps
-                delay_open = max(int(delay_wanted - delay_already), 1)
-            else:
-                delay_open = 1
-            self.after_id = self.after(
-                delay_open, lambda: self.play(previous_time=current_time)
-            )
-        elif self.after_id:
-            self.after_cancel(self.after_id)
+    def set_delta_frames(self, event=None, delta_frames: int = None):
+        if not self.video_capture:
+            return
+        if not delta_frames and event:  # if called from MouseWheel
+            delta_frames = int(event.delta / 120 * self.frames_per_mousewheelgrid)
+        pending_target = self.seek_scheduler.get_pending_target()
+        if delta_frames == 0:
+            pass
+        elif delta_frames == 1 and self.paused and not pending_target:
+            self.display_new_frame()
+        elif delta_frames == -1 and self.paused and not pending_target:
+            self.display_previous_frame()
+        elif delta_frames:
+            self.seek(self.get_target_frame() + delta_frames)
+
+    def get_target_frame(self):
+        # Steps and jumps during a burst are relative to the latest requested frame
+        return self.seek_scheduler.get_pending_target() or int(
+            self.video_capture.current_frame
+        )
 
-    def slide(self, event=None):
+    def seek(self, frame_number, preview=False):
         if self.paused:
-            frame_number = int(float(self.slider_frame.get()))
-            self.display_new_frame(frame_number)
+            # Coalesced with other seeks in a burst and decoded by a worker thread
+            self.seek_scheduler.request(frame_number, preview=preview)
+        else:
+            self.engine.seek(frame_number)
+
+    def zoom(self, event):
+        zoom_in = event.num == 4 or event.delta > 0
+        self.engine.zoom_at(
+            self.engine.zoom * (ZOOM_STEP if zoom_in else 1 / ZOOM_STEP),
+            x=(event.x - self.image_offset[0]) / self.canvas_width,
+            y=(event.y - self.image_offset[1]) / self.canvas_height,
+        )
+        self.show_zoomed_frame()
+        # Mouse wheel without Ctrl steps frames (bound to the master)
+        return "break"
+
+    def reset_zoom(self, event=None):
+        self.engine.zoom_at(1.0)
+        self.show_zoomed_frame()
+
+    def start_pan(self, event):
+        self.pan_position = (event.x, event.y)
+
+    def pan(self, event):
+        if not self.engine.roi or not self.pan_position:
+            return
+        # During playback every change restarts the decoder, so the frame is only
+        # moved once the mouse button is released
+        if not self.paused and event.type != tk.EventType.ButtonRelease:
+            return
+        x, y = self.pan_position
+        self.pan_position = (event.x, event.y)
+        self.engine.pan(
+            (event.x - x) / self.canvas_width, (event.y - y) / self.canvas_height
+        )
+        self.show_zoomed_frame()
 
-    def set_delta_frames(self, event=None, delta_frames: int = None):
+    def show_zoomed_frame(self):
+        self.seek_scheduler.roi = self.engine.roi
+        if self.paused:
+            # Current frame is cropped again from the native frame kept by the
+            # video capture (decoded again only if not available anymore)
+            self.seek(self.get_target_frame())
+
+    def resize_canvas(self, event):
+        # Frames are resized once the size settles, during playback every change
+        # restarts the decoder
+        if self.resize_after_id:
+            self.after_cancel(self.resize_after_id)
+        self.resize_after_id = self.after(
+            RESIZE_DELAY, lambda: self.fit_video(event.width, event.height)
+        )
+
+    def fit_video(self, width, height):
+        self.resize_after_id = None
+        # Frames keep the aspect ratio of the video and are centered on the canvas
+        aspect_ratio = self.video_capture.width / self.video_capture.height
+        frame_height = max(min(height, round(width / aspect_ratio)), 1)
+        frame_width = max(min(width, round(frame_height * aspect_ratio)), 1)
+        self.image_offset = ((width - frame_width) // 2, (height - frame_height) // 2)
+        self.canvas.coords(self.canvas_image, *self.image_offset)
+        if self.frame_thumbnail_strip:
+            self.frame_thumbnail_strip.set_width(width)
+        if (frame_height, frame_width) == (self.canvas_height, self.canvas_width):
+            return
+        self.canvas_height = frame_height
+        self.canvas_width = frame_width
+        self.engine.set_size(frame_height, frame_width)
+        self.seek_scheduler.height = frame_height
+        self.seek_scheduler.width = frame_width
         if self.paused:
-            if not delta_frames and event:  # if called from MouseWheel
-                delta_frames = event.delta / 120 * self.frames_per_mousewheelgrid
-            if delta_frames == 0:
-                pass
-            elif delta_frames == 1:
-                self.display_new_frame()
-            elif delta_frames:
-                new_frame = self.video_capture.current_frame + delta_frames
-                self.display_new_frame(new_frame)
+            self.seek(self.get_target_frame())
 
     def display_new_frame(self, frame_number=None):
-        # Get a frame from the video source
-        ret, self.frame = self.video_capture.get_frame(
-            frame_number=frame_number,
-            height=self.canvas_height,
-            width=self.canvas_width,
-        )
+        # Engine hands the frame to show_frame()
+        self.engine.show_frame(frame_number)
+
+    def display_previous_frame(self, frame_number=None):
+        self.engine.show_previous_frame(frame_number)
 
+    def show_frame(self, ret, frame):
         if ret:
-            scale = self.canvas_height / self.video_capture.height
-            self.photo = PIL.ImageTk.PhotoImage(
-                image=PIL.Image.fromarray(self.frame).resize(
-                    (
-                        int(scale * self.video_capture.width),
-                        int(scale * self.video_capture.height),
-                    )
-                )
+            # Frame already has the size of the canvas
+            start = time.perf_counter()
+            self.frame = frame
+            image = self.image_from_array(self.frame)
+            if self.photo and (self.photo.width(), self.photo.height()) == image.size:
+                self.photo.paste(image)
+            else:
+                self.photo = self.photo_image(image=image)
+                self.canvas.itemconfigure(self.canvas_image, image=self.photo)
+            if self.timings:
+                self.timings.record("photo", start)
+            self.update_controls()
+
+    def update_controls(self):
+        now = time.perf_counter()
+        if not self.paused and now - self.controls_updated < 1 / self.ui_refresh_rate:
+            return
+        self.controls_updated = now
+        if self.slider_frame.cget("to") != self.video_capture.total_frames:
+            # Exact frame count is known once the keyframe index is built
+            self.slider_frame.configure(to=self.video_capture.total_frames)
+            self.reposition_event_markers()
+        # Slider is not moved under the mouse while previews are shown
+        if not self.slider_dragging:
+            self.slider_position = int(self.video_capture.current_frame)
+            self.slider_frame.set(self.slider_position)
+        self.label_current_time_var.set(
+            datetime.datetime.strftime(
+                self.video_capture.current_time, "%d.%m.%Y %H:%M:%S.%f"
+            )[:-3]
+        )
+
+    def go_to_time(self, event=None):
+        """Seek to the frame presented at a real time entered by the user."""
+        if not self.video_capture:
+            return
+        text = simpledialog.askstring(
+            "Go to time",
+            "Real time (HH:MM:SS.mmm or dd.mm.yyyy HH:MM:SS.mmm):",
+            initialvalue=self.label_current_time_var.get()[11:],
+            parent=self,
+        )
+        if not text:
+            return
+        try:
+            time = _get_datetime_from_string(
+                text.strip(), self.video_capture.start_time
             )
-            self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
-            self.slider_frame.set(self.video_capture.current_frame)
-            self.label_current_time_var.set(
-                datetime.datetime.strftime(
-                    self.video_capture.current_time, "%d.%m.%Y %H:%M:%S.%f"
-                )[:-3]
+        except ValueError:
+            showinfo("Unknown time format", "Please enter a time like 12:34:56.789")
+            return
+        self.seek(self.video_capture.get_frame_of_time(time))
+
+    def add_event_marker(self, marker_id, frame_number, color="red"):
+        """Draw a marker of an event at its frame below the slider.
+
+        Args:
+            marker_id (int): Id of the marker, e.g. of the timestamp
+            frame_number (int): Number of the frame of the event
+            color (str, optional): Color of the marker. Defaults to "red".
+        """
+        self.event_markers[marker_id] = frame_number
+        x = self.get_slider_x(frame_number)
+        self.canvas_markers.create_line(
+            x, 0, x, MARKER_HEIGHT, fill=color, tags=("marker", f"marker{marker_id}")
+        )
+
+    def remove_event_markers(self, marker_ids):
+        for marker_id in marker_ids:
+            if self.event_markers.pop(marker_id, None) is not None:
+                self.canvas_markers.delete(f"marker{marker_id}")
+
+    def clear_event_markers(self):
+        self.event_markers.clear()
+        self.canvas_markers.delete("marker")
+
+    def reposition_event_markers(self, event=None):
+        # Only needed if the slider is resized or its range changes
+        for marker_id, frame_number in self.event_markers.items():
+            x = self.get_slider_x(frame_number)
+            self.canvas_markers.coords(f"marker{marker_id}", x, 0, x, MARKER_HEIGHT)
+
+    def get_slider_x(self, frame_number):
+        return self.slider_frame.coords(frame_number)[0]
+
+    def enable_timings(self, enabled=True):
+        """Start or stop recording the durations of the stages of showing frames.
+
+        Args:
+            enabled (bool, optional): Record or not. Defaults to True.
+        """
+        self.engine.enable_timings(enabled)
+
+    def toggle_overlay(self, event=None):
+        """Show or hide fps, dropped frames and stage timings over the video."""
+        if not self.video_capture:
+            return
+        if self.overlay_after_id:
+            self.after_cancel(self.overlay_after_id)
+            self.overlay_after_id = None
+            self.canvas.delete("overlay")
+            self.enable_timings(self.timings_enabled)
+        else:
+            self.enable_timings()
+            self.update_overlay()
+
+    def update_overlay(self):
+        from frame_timings import STAGES
+
+        stats = self.engine.clock.get_stats()
+        lines = [
+            f"fps {self.timings.get_rate('photo'):5.1f}  "
+            f"dropped {stats['dropped_frames']}  "
+            f"drift {stats['drift'] * 1000:.0f} ms",
+            f"{'stage':9s}{'p50':>7s}{'p95':>7s}{'max':>7s} ms",
+        ]
+        for stage in STAGES:
+            percentiles = self.timings.get_percentiles(stage)
+            if percentiles:
+                lines.append(
+                    f"{stage:9s}" + "".join(f"{value:7.1f}" for value in percentiles)
+                )
+        self.canvas.delete("overlay")
+        text = self.canvas.create_text(
+            5,
+            5,
+            anchor=tk.NW,
+            text="\n".join(lines),
+            fill="yellow",
+            font="TkFixedFont",
+            tags="overlay",
+        )
+        background = self.canvas.create_rectangle(
+            self.canvas.bbox(text), fill="black", outline="", tags="overlay"
+        )
+        self.canvas.tag_raise(text, background)
+        self.overlay_after_id = self.after(OVERLAY_INTERVAL, self.update_overlay)
+
+    def export_timings(self):
+        if not self.timings:
+            showinfo(
+                "No timings",
+                "Show the performance overlay (F3) to record the timings first",
             )
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export frame timings", defaultextension=".csv"
+        )
+        if path:
+            records = self.timings.export_csv(path)
+            showinfo("Exported timings", f"Exported {records} timings to {path}")
+
+    def destroy(self):
+        if self.overlay_after_id:
+            self.after_cancel(self.overlay_after_id)
+        if self.thumbnail_strip:
+            self.thumbnail_strip.cancel()
+        if self.video_capture:
+            self.seek_scheduler.stop()
+            self.engine.release()
+        super().destroy()
 
     def get_timestamp(self):
-        return (
-            (self.video_capture.current_time - EPOCH).total_seconds(),
-            (
-                self.video_capture.current_time - self.video_capture.start_time
-            ).total_seconds(),
-            int(self.video_capture.current_frame),
-        )
+        return self.engine.get_timestamp()
@@ -18,8 +18,10 @@
 
 
 import datetime as dt
+import hashlib
 import platform
 import re
+from pathlib import Path
 
 EPOCH = dt.datetime.utcfromtimestamp(0)
 """Time from unix epoch in seconds"""
@@ -36,6 +38,9 @@ ON_LINUX = OS == "Linux"
 ON_MAC = OS == "Mac"
 """Wether OS is MacOS or not"""
 
+DATETIME_REGEX = "([0-9]{4,4}-[0-9]{2,2}-[0-9]{2,2}_[0-9]{2,2}-[0-9]{2,2}-[0-9]{2,2})"
+"""Regular expression of "yyyy-mm-dd_hh-mm-ss" in file names"""
+
 
 def _get_datetime_from_filename(
     filename: str, epoch_datetime="1970-01-01_00-00-00"
@@ -51,8 +56,7 @@ def _get_datetime_from_filename(
     Returns:
         dt.datetime: datetime object
     """
-    regex = "([0-9]{4,4}-[0-9]{2,2}-[0-9]{2,2}_[0-9]{2,2}-[0-9]{2,2}-[0-9]{2,2})"
-    match = re.search(regex, filename)
+    match = re.search(DATETIME_REGEX, filename)
     if not match:
         return dt.datetime.strptime(epoch_datetime, "%Y-%m-%d_%H-%M-%S")
 
@@ -63,3 +67,64 @@ def _get_datetime_from_filename(
         return dt.datetime.strptime(datetime_str, "%Y-%m-%d_%H-%M-%S")
     except ValueError:
         return dt.datetime.strptime(epoch_datetime, "%Y-%m-%d_%H-%M-%S")
+
+
+def _get_datetime_from_string(text: str, start_time: dt.datetime) -> dt.datetime:
+    """Get date and time from a time entered by the user.
+    Accepts "dd.mm.yyyy HH:MM:SS.mmm", "yyyy-mm-dd HH:MM:SS.mmm" or "HH:MM:SS.mmm"
+    (milliseconds optional).
+    Times without date are on the day of start_time or, if earlier than
+    start_time, on the next day (e.g. for recordings across midnight).
+
+    Args:
+        text (str): entered time
+        start_time (dt.datetime): start time of the video
+
+    Raises:
+        ValueError: if the text does not match any of the formats
+
+    Returns:
+        dt.datetime: datetime object
+    """
+    for time_format in [
+        "%d.%m.%Y %H:%M:%S.%f",
+        "%d.%m.%Y %H:%M:%S",
+        "%Y-%m-%d %H:%M:%S.%f",
+        "%Y-%m-%d %H:%M:%S",
+    ]:
+        try:
+            return dt.datetime.strptime(text, time_format)
+        except ValueError:
+            pass
+    for time_format in ["%H:%M:%S.%f", "%H:%M:%S"]:
+        try:
+            time = dt.datetime.strptime(text, time_format).time()
+        except ValueError:
+            continue
+        date_time = dt.datetime.combine(start_time.date(), time)
+        if date_time < start_time:
+            date_time += dt.timedelta(days=1)
+        return date_time
+    raise ValueError("Unknown time format", text)
+
+
+def _get_file_fingerprint(path, chunk_size=65536) -> str:
+    """Get a fingerprint identifying the content of a file.
+    Combines the file size with a hash of the first and last chunk of the file,
+    so it is cheap to compute even for large video files.
+
+    Args:
+        path (str or Path): path of the file
+        chunk_size (int): number of bytes hashed at start and end of the file
+
+    Returns:
+        str: fingerprint of the file
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        sha1.update(f.read(chunk_size))
+        f.seek(max(size - chunk_size, 0))
+        sha1.update(f.read(chunk_size))
+    return f"{size}-{sha1.hexdigest()}"
@@ -0,0 +1,131 @@
+# OTVideoPlayer: Playback clock of the video player
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import time
+
+
+class PlaybackClock:
+    """Master clock of the playback deciding which frame is due to be shown.
+
+    The due frame is computed from a monotonic time source relative to the
+    frame and time playback (or the latest seek or speed change) started at, so
+    slow ticks never accumulate into drift: frames behind the clock are dropped
+    instead. Statistics of shown and dropped frames and of the drift between the
+    shown frame and the clock are kept for diagnosis.
+
+    Args:
+        fps (float): Frame rate of the video
+        speed (float, optional): Playback speed multiplier. Defaults to 1.
+        max_fps (float, optional): Maximum number of frames shown per second.
+            Defaults to 60.
+    """
+
+    def __init__(self, fps, speed=1.0, max_fps=60):
+        self.fps = fps
+        self.speed = speed
+        self.max_fps = max_fps
+        self.direction = 1
+        self._start_time = time.perf_counter()
+        self._start_frame = 1
+        self._last_shown_frame = None
+        self.reset_stats()
+
+    def start(self, frame_number, direction=1):
+        """(Re)start the clock with frame_number being due now.
+
+        Args:
+            frame_number (float): Number of the frame due now
+            direction (int, optional): 1 to play forward, -1 to play backward.
+                Defaults to 1.
+        """
+        self.direction = direction
+        self._start_time = time.perf_counter()
+        self._start_frame = frame_number
+        self._last_shown_frame = None
+
+    def set_speed(self, speed):
+        """Change the speed multiplier, continuing at the frame due now.
+
+        Args:
+            speed (float): Playback speed multiplier
+        """
+        self.start(self.get_due_frame(), direction=self.direction)
+        self.speed = speed
+
+    def get_due_frame(self):
+        """Get the number of the frame due to be shown now.
+
+        Returns:
+            float: Number of the frame (fractional between two frames)
+        """
+        elapsed = time.perf_counter() - self._start_time
+        return self._start_frame + self.direction * elapsed * self.fps * self.speed
+
+    def get_delay(self, frame_number):
+        """Get the delay until the frame after frame_number is due.
+
+        The delay is limited by max_fps, frames due in between are dropped.
+
+        Args:
+            frame_number (int): Number of the frame shown last
+
+        Returns:
+            int: Delay in milliseconds (at least 1)
+        """
+        next_frame_number = frame_number + self.direction
+        due_time = self._start_time + abs(next_frame_number - self._start_frame) / (
+            self.fps * self.speed
+        )
+        delay = max(due_time - time.perf_counter(), 1 / self.max_fps)
+        return max(int(delay * 1000), 1)
+
+    def frame_shown(self, frame_number):
+        """Record a shown frame for the statistics.
+
+        Args:
+            frame_number (int): Number of the shown frame
+        """
+        if self._last_shown_frame is not None:
+            self.dropped_frames += max(
+                abs(frame_number - self._last_shown_frame) - 1, 0
+            )
+        self._last_shown_frame = frame_number
+        self.shown_frames += 1
+        self.drift = self.direction * (self.get_due_frame() - frame_number) / self.fps
+        self.max_drift = max(self.max_drift, abs(self.drift))
+
+    def reset_stats(self):
+        self.shown_frames = 0
+        self.dropped_frames = 0
+        self.drift = 0.0
+        self.max_drift = 0.0
+
+    def get_stats(self):
+        """Get statistics of the playback.
+
+        Returns:
+            dict: Shown and dropped frames, current and maximum drift of the
+                shown frame behind the clock in seconds
+        """
+        return {
+            "shown_frames": self.shown_frames,
+            "dropped_frames": self.dropped_frames,
+            "drift": self.drift,
+            "max_drift": self.max_drift,
+        }
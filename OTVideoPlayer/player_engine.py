@@ -0,0 +1,440 @@
+# OTVideoPlayer: Playback engine of the video player without user interface
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import math
+import time
+
+from helpers import EPOCH
+from playback_clock import PlaybackClock
+from segmented_video_capture import SegmentedVideoCapture, find_segments
+from video_capture import VideoCapture
+
+MAX_ZOOM = 16
+
+
+class PlayerEngine:
+    """Playback state of a video (current frame and time, stepping, seeking and
+    playing by the PlaybackClock) without any user interface.
+
+    Frames are resized to the output size (with fast interpolation while
+    playing) and every shown frame is handed to on_frame. Without a user
+    interface, frames can be iterated with frames() or played in real time with
+    run(). A user interface calls tick() from its own event loop instead (see
+    FrameVideoPlayer).
+
+    Args:
+        video_path (str or Path): Path of the video file
+        playlist (bool, optional): Play all recording segments of the camera as
+            one video. Defaults to False.
+        segments (list, optional): Paths of the recording segments played in
+            playlist mode. Defaults to None (all segments of the camera).
+        height (int, optional): Height of the frames. Defaults to None (native or
+            by the aspect ratio of the video from width).
+        width (int, optional): Width of the frames. Defaults to None (native or
+            by the aspect ratio of the video from height).
+        on_frame (callable, optional): Called with ret and frame of every shown
+            frame. Defaults to None.
+        buffer_size (int, optional): Size of the frame buffer. Defaults to 32.
+        max_fps (float, optional): Maximum number of frames shown per second.
+            Defaults to 60.
+        trick_play_speed (float, optional): From this speed on only keyframes are
+            shown. Defaults to 16.
+    """
+
+    def __init__(
+        self,
+        video_path,
+        playlist=False,
+        segments=None,
+        height=None,
+        width=None,
+        on_frame=None,
+        buffer_size=32,
+        max_fps=60,
+        trick_play_speed=16,
+    ):
+        if playlist:
+            segments = segments or find_segments(video_path)
+            # Frame numbers of timestamps count from the start of the first segment
+            self.video_path = str(segments[0])
+            self.video_capture = SegmentedVideoCapture(
+                segments, buffer_size=buffer_size
+            )
+        else:
+            self.video_path = str(video_path)
+            self.video_capture = VideoCapture(self.video_path, buffer_size=buffer_size)
+        # Size keeps the aspect ratio of the video if only one side is given
+        aspect_ratio = self.video_capture.width / self.video_capture.height
+        if height and not width:
+            width = height * aspect_ratio
+        elif width and not height:
+            height = width / aspect_ratio
+        self.height = int(height or self.video_capture.height)
+        self.width = int(width or self.video_capture.width)
+        # Region of interest x, y, width and height in native pixels, cropped
+        # from the frames before resizing (None shows the whole frame)
+        self.zoom = 1.0
+        self.roi = None
+        self.on_frame = on_frame
+        self.trick_play_speed = trick_play_speed
+        self.paused = True
+        self.backward = False
+        self.clock = PlaybackClock(fps=self.video_capture.fps, max_fps=max_fps)
+        self.timings = None
+
+    @property
+    def current_frame(self):
+        return int(self.video_capture.current_frame)
+
+    @property
+    def current_time(self):
+        return self.video_capture.current_time
+
+    @property
+    def total_frames(self):
+        return int(self.video_capture.total_frames)
+
+    def set_size(self, height, width):
+        """Change the size of the frames.
+
+        Args:
+            height (int): Height of the frames
+            width (int): Width of the frames
+        """
+        self.height = int(height)
+        self.width = int(width)
+        if not self.paused:
+            # Frames decoded ahead have the former size
+            self.video_capture.stop_decoder()
+            self.update_decoder()
+
+    def set_roi(self, roi):
+        """Show only a region of interest of the frames (kept until changed).
+
+        Args:
+            roi (tuple): x, y, width and height in native pixels or None for the
+                whole frame
+        """
+        if roi == self.roi:
+            return
+        self.roi = roi
+        if not self.paused:
+            # Frames decoded ahead have the former region
+            self.video_capture.stop_decoder()
+            self.update_decoder()
+
+    def zoom_at(self, zoom, x=0.5, y=0.5):
+        """Zoom keeping a point of the shown frame in place, e.g. under the mouse.
+
+        The region of interest keeps the aspect ratio of the video.
+
+        Args:
+            zoom (float): Zoom factor, 1 shows the whole frame
+            x (float, optional): Horizontal position of the point as fraction of
+                the shown frame. Defaults to 0.5.
+            y (float, optional): Vertical position of the point as fraction of
+                the shown frame. Defaults to 0.5.
+        """
+        native_width = int(self.video_capture.width)
+        native_height = int(self.video_capture.height)
+        whole_frame = (0, 0, native_width, native_height)
+        roi_x, roi_y, roi_width, roi_height = self.roi or whole_frame
+        point_x = roi_x + x * roi_width
+        point_y = roi_y + y * roi_height
+        self.zoom = min(max(zoom, 1.0), MAX_ZOOM)
+        roi_width = native_width / self.zoom
+        roi_height = native_height / self.zoom
+        self._set_roi(point_x - x * roi_width, point_y - y * roi_height, roi_width)
+
+    def pan(self, delta_x, delta_y):
+        """Move the content of a zoomed frame.
+
+        Args:
+            delta_x (float): Horizontal shift as fraction of the shown frame
+            delta_y (float): Vertical shift as fraction of the shown frame
+        """
+        if not self.roi:
+            return
+        roi_x, roi_y, roi_width, roi_height = self.roi
+        self._set_roi(
+            roi_x - delta_x * roi_width, roi_y - delta_y * roi_height, roi_width
+        )
+
+    def _set_roi(self, x, y, width):
+        native_width = int(self.video_capture.width)
+        native_height = int(self.video_capture.height)
+        width = round(width)
+        height = round(width * native_height / native_width)
+        if width >= native_width or height >= native_height:
+            self.zoom = 1.0
+            self.set_roi(None)
+            return
+        # Region stays inside the frame
+        x = min(max(round(x), 0), native_width - width)
+        y = min(max(round(y), 0), native_height - height)
+        self.set_roi((x, y, width, height))
+
+    def set_speed(self, speed):
+        self.clock.set_speed(speed)
+        self.update_decoder()
+
+    def enable_timings(self, enabled=True):
+        """Start or stop recording the durations of the stages of showing frames.
+
+        Args:
+            enabled (bool, optional): Record or not. Defaults to True.
+        """
+        from frame_timings import FrameTimings
+
+        if self.timings is None:
+            self.timings = FrameTimings()
+            self.video_capture.set_timings(self.timings)
+        self.timings.enabled = enabled
+
+    def is_trick_play(self):
+        # Keyframe index is needed to decode keyframes only
+        return (
+            self.clock.speed >= self.trick_play_speed
+            and self.video_capture.index is not None
+        )
+
+    def update_decoder(self):
+        # Decoder thread only runs when playing forward through all frames
+        if self.paused or self.backward or self.is_trick_play():
+            self.video_capture.stop_decoder()
+        else:
+            self.video_capture.start_decoder(
+                height=self.height, width=self.width, roi=self.roi, fast=True
+            )
+
+    def play(self, backward=False):
+        """Start playing at the current frame (call tick() until paused).
+
+        Args:
+            backward (bool, optional): Play backward. Defaults to False.
+        """
+        self.paused = False
+        self.backward = backward
+        self.clock.start(self.current_frame, direction=-1 if backward else 1)
+        self.update_decoder()
+
+    def pause(self):
+        self.paused = True
+        self.update_decoder()
+
+    def tick(self):
+        """Show the frame due according to the playback clock.
+
+        Frames behind the clock are dropped (and skipped by the decoder thread
+        without decoding).
+
+        Returns:
+            int: Delay in ms until the next tick or None if paused
+        """
+        if self.paused:
+            return None
+        due_frame = self.clock.get_due_frame()
+        current_frame = self.current_frame
+        if self.is_trick_play():
+            # Keyframe index may have become ready while the decoder was running
+            self.video_capture.stop_decoder()
+            self.show_keyframe(due_frame)
+        elif self.backward and math.ceil(due_frame) < current_frame:
+            self.show_previous_frame(math.ceil(due_frame))
+        elif not self.backward and int(due_frame) > current_frame:
+            if int(due_frame) > current_frame + 1:
+                self.video_capture.skip_to(int(due_frame))
+            self.show_buffered_frame(int(due_frame))
+        if self.current_frame != current_frame:
+            self.clock.frame_shown(self.current_frame)
+        return self.clock.get_delay(self.current_frame)
+
+    def run(self, end=None, backward=False):
+        """Play in real time without a user interface until the end.
+
+        Args:
+            end (int, optional): Number of the last frame. Defaults to None (end
+                of the video, or first frame when playing backward).
+            backward (bool, optional): Play backward. Defaults to False.
+        """
+        end = min(end or (1 if backward else self.total_frames), self.total_frames)
+        self.play(backward=backward)
+        try:
+            while not self.paused:
+                delay = self.tick()
+                due_frame = self.clock.get_due_frame()
+                if backward and (self.current_frame <= end or due_frame < end - 1):
+                    break
+                # Also stops if frames stall a second after the end was due
+                if not backward and (
+                    self.current_frame >= end or due_frame > end + self.clock.fps
+                ):
+                    break
+                time.sleep(delay / 1000)
+        finally:
+            self.pause()
+
+    def frames(self, start=1, end=None, step=1):
+        """Iterate over frames without playing in real time.
+
+        Args:
+            start (int, optional): Number of the first frame. Defaults to 1.
+            end (int, optional): Number of the last frame. Defaults to None (end
+                of the video).
+            step (int, optional): Step between the frames. Defaults to 1.
+
+        Yields:
+            tuple: Number, real time and frame (RGB)
+        """
+        end = min(end or self.total_frames, self.total_frames)
+        for frame_number in range(start, end + 1, step):
+            ret, frame = self.show_frame(frame_number)
+            if not ret:
+                return
+            yield frame_number, self.current_time, frame
+
+    def seek(self, frame_number):
+        """Show frame_number now (paused) or continue playing at it.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+        """
+        if self.paused or self.backward or self.is_trick_play():
+            self.show_frame(frame_number)
+            if not self.paused:
+                self.clock.start(frame_number, direction=self.clock.direction)
+        else:
+            # Decoder thread continues at the new position with an empty buffer
+            self.video_capture.seek(frame_number)
+            self.clock.start(frame_number)
+
+    def seek_time(self, time):
+        """Seek to the frame presented at a real time.
+
+        Args:
+            time (datetime.datetime): Real time
+        """
+        self.seek(self.video_capture.get_frame_of_time(time))
+
+    def step(self, delta_frames):
+        """Step forward or backward by a number of frames.
+
+        Args:
+            delta_frames (int): Number of frames (negative steps backward)
+        """
+        if delta_frames == 1:
+            self.show_frame()
+        elif delta_frames == -1:
+            self.show_previous_frame()
+        elif delta_frames:
+            self.seek(self.current_frame + delta_frames)
+
+    def show_frame(self, frame_number=None):
+        # Get a frame from the video source (next frame by default)
+        start = time.perf_counter()
+        ret, frame = self.video_capture.get_frame(
+            frame_number=frame_number,
+            height=self.height,
+            width=self.width,
+            roi=self.roi,
+            fast=not self.paused,
+        )
+        if self.timings:
+            self.timings.record("fetch", start)
+        return self._emit(ret, frame)
+
+    def show_keyframe(self, frame_number):
+        # Show the nearest keyframe at or before frame_number (trick play), the
+        # frames in between are never decoded
+        keyframe_number = self.video_capture.get_keyframe_number(
+            max(int(frame_number), 1)
+        )
+        if keyframe_number and keyframe_number != self.current_frame:
+            return self.show_frame(keyframe_number)
+        return (False, None)
+
+    def show_buffered_frame(self, frame_number=None):
+        # Get the latest frame up to frame_number decoded ahead by the decoder thread
+        start = time.perf_counter()
+        ret, frame = self.video_capture.read_buffered(frame_number)
+        if self.timings and ret:
+            self.timings.record("fetch", start)
+        return self._emit(ret, frame)
+
+    def show_previous_frame(self, frame_number=None):
+        # Get the previous frame (or frames down to frame_number) from the segment
+        # decoded for backward reading
+        start = time.perf_counter()
+        ret, frame = self.video_capture.get_previous_frame(
+            height=self.height, width=self.width, roi=self.roi, fast=not self.paused
+        )
+        while ret and frame_number is not None and self.current_frame > frame_number:
+            ret_previous, frame_previous = self.video_capture.get_previous_frame(
+                height=self.height,
+                width=self.width,
+                roi=self.roi,
+                fast=not self.paused,
+            )
+            if not ret_previous:
+                break
+            ret, frame = ret_previous, frame_previous
+        if self.timings:
+            self.timings.record("fetch", start)
+        return self._emit(ret, frame)
+
+    def _emit(self, ret, frame):
+        if ret and self.on_frame:
+            self.on_frame(ret, frame)
+        return ret, frame
+
+    def get_timestamp(self):
+        """Get real time, video time and number of the current frame.
+
+        Returns:
+            tuple: Seconds since epoch, seconds since the start of the video and
+                number of the frame
+        """
+        return (
+            (self.current_time - EPOCH).total_seconds(),
+            (self.current_time - self.video_capture.start_time).total_seconds(),
+            self.current_frame,
+        )
+
+    def snapshot(self, output_dir=None):
+        """Save the current frame in native resolution.
+
+        The frame is read by a separate capture, so playback is not disturbed.
+
+        Args:
+            output_dir (str or Path, optional): Directory of the snapshot.
+                Defaults to None (directory of the video).
+
+        Returns:
+            str: Path of the snapshot or None if it could not be saved
+        """
+        from export import save_snapshots
+
+        video_path, frame_number = self.video_capture.get_source(self.current_frame)
+        snapshot_paths = save_snapshots(
+            video_path, [frame_number], output_dir, index=self.video_capture.index
+        )
+        return snapshot_paths[0] if snapshot_paths else None
+
+    def release(self):
+        self.video_capture.release()
@@ -0,0 +1,208 @@
+# OTVideoPlayer: Real-time index of the recordings in a directory
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import datetime
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from helpers import DATETIME_REGEX, EPOCH, _get_datetime_from_filename
+
+RECORDING_INDEX_NAME = "recordings.otindex.npz"
+
+VIDEO_SUFFIXES = [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".h264"]
+
+
+def probe_duration(video_path):
+    """Get the duration of a video from its container without decoding it.
+
+    Args:
+        video_path (str or Path): Path of the video file
+
+    Returns:
+        float: Duration in seconds (0 if the video can not be read)
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+    finally:
+        capture.release()
+    if not fps or frame_count <= 0:
+        return 0.0
+    return frame_count / fps
+
+
+class RecordingIndex:
+    """Real times covered by the recordings in a directory and its subdirectories.
+
+    Start times are read from the file names ("yyyy-mm-dd_hh-mm-ss"), durations
+    from the containers. The intervals are sorted by start time and cached in a
+    file in the directory. Updating the index only probes recordings that are new
+    or changed (by size and modification time), in parallel.
+
+    Args:
+        directory (str or Path): Directory of the recordings
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / RECORDING_INDEX_NAME
+        # Paths relative to the directory, sorted by start time
+        self.paths = np.array([], dtype=str)
+        self.sizes = np.array([], dtype=np.int64)
+        self.mtimes = np.array([], dtype=np.int64)
+        # Real times in seconds since epoch
+        self.starts = np.array([], dtype=np.float64)
+        self.ends = np.array([], dtype=np.float64)
+        self.max_duration = 0.0
+        self.load()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self._set(
+                    data["paths"],
+                    data["sizes"],
+                    data["mtimes"],
+                    data["starts"],
+                    data["ends"],
+                )
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    paths=self.paths,
+                    sizes=self.sizes,
+                    mtimes=self.mtimes,
+                    starts=self.starts,
+                    ends=self.ends,
+                )
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(e)
+
+    def update(self, max_workers=None):
+        """Scan the directory, probe new or changed recordings and save the index.
+
+        Args:
+            max_workers (int, optional): Number of recordings probed in parallel.
+                Defaults to None (chosen by ThreadPoolExecutor).
+
+        Returns:
+            int: Number of probed recordings
+        """
+        known = {
+            path: (size, mtime, start, end)
+            for path, size, mtime, start, end in zip(
+                self.paths.tolist(),
+                self.sizes.tolist(),
+                self.mtimes.tolist(),
+                self.starts.tolist(),
+                self.ends.tolist(),
+            )
+        }
+        recordings = {}
+        to_probe = []
+        for video_path in self.directory.rglob("*"):
+            if video_path.suffix.lower() not in VIDEO_SUFFIXES:
+                continue
+            if not re.search(DATETIME_REGEX, video_path.name):
+                continue
+            stat = video_path.stat()
+            path = video_path.relative_to(self.directory).as_posix()
+            entry = known.get(path)
+            if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                recordings[path] = entry
+            else:
+                recordings[path] = (stat.st_size, stat.st_mtime_ns)
+                to_probe.append(path)
+
+        # OpenCV releases the GIL while opening the containers
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            durations = pool.map(
+                probe_duration, (self.directory / path for path in to_probe)
+            )
+            for path, duration in zip(to_probe, durations):
+                start = (
+                    _get_datetime_from_filename(Path(path).name) - EPOCH
+                ).total_seconds()
+                recordings[path] += (start, start + duration)
+
+        if to_probe or len(recordings) != len(known):
+            paths = list(recordings)
+            columns = list(zip(*(recordings[path] for path in paths))) or [()] * 4
+            self._set(paths, *columns)
+            self.save()
+        return len(to_probe)
+
+    def get_start_time(self):
+        """Get the start time of the first recording.
+
+        Returns:
+            datetime.datetime: Start time or None if there are no recordings
+        """
+        if not len(self.starts):
+            return None
+        return EPOCH + datetime.timedelta(seconds=float(self.starts[0]))
+
+    def find(self, time, site=None):
+        """Get the recordings covering a real time.
+
+        Args:
+            time (datetime.datetime): Real time
+            site (str, optional): Part of the path of the recordings, e.g. the
+                name of the directory or the prefix of the files of a site.
+                Defaults to None (all sites).
+
+        Returns:
+            list: Paths of the recordings sorted by start time
+        """
+        seconds = (time - EPOCH).total_seconds()
+        # Only recordings starting at most the longest duration before can overlap
+        first = np.searchsorted(self.starts, seconds - self.max_duration, side="left")
+        last = np.searchsorted(self.starts, seconds, side="right")
+        return [
+            self.directory / self.paths[position]
+            for position in range(first, last)
+            if self.ends[position] > seconds
+            and (site is None or site in self.paths[position])
+        ]
+
+    def _set(self, paths, sizes, mtimes, starts, ends):
+        starts = np.asarray(starts, dtype=np.float64)
+        order = np.argsort(starts, kind="stable")
+        self.paths = np.asarray(paths, dtype=str)[order]
+        self.sizes = np.asarray(sizes, dtype=np.int64)[order]
+        self.mtimes = np.asarray(mtimes, dtype=np.int64)[order]
+        self.starts = starts[order]
+        self.ends = np.asarray(ends, dtype=np.float64)[order]
+        self.max_duration = float(np.max(self.ends - self.starts, initial=0.0))
@@ -0,0 +1,175 @@
+# OTVideoPlayer: Scheduler coalescing seeks of the video player
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import threading
+
+
+class SeekScheduler:
+    """Coalesces bursts of seeks (slider drags, mouse wheel, step buttons).
+
+    Only the latest requested frame is kept, seeks are done by a worker thread
+    and a seek still decoding towards an outdated frame is aborted. Previews show
+    the nearest keyframe (cheap to decode and resized with fast interpolation)
+    and are followed by the exact frame as soon as no further seek has been
+    requested for settle_delay milliseconds.
+    Decoded frames are handed to on_frame in the Tk main loop.
+
+    Args:
+        widget (tk.Widget): Widget used to schedule callbacks in the Tk main loop
+        video_capture (VideoCapture): Video capture to seek in
+        on_frame (callable): Called with ret and frame of every finished seek
+        height (int): Height of the frames (can be changed, e.g. when resizing)
+        width (int): Width of the frames (can be changed, e.g. when resizing)
+        settle_delay (int, optional): Delay in ms after the last preview until the
+            exact frame is decoded. Defaults to 150.
+        poll_interval (int, optional): Interval in ms to check for decoded frames
+            while seeks are pending. Defaults to 10.
+    """
+
+    def __init__(
+        self,
+        widget,
+        video_capture,
+        on_frame,
+        height,
+        width,
+        settle_delay=150,
+        poll_interval=10,
+    ):
+        self.widget = widget
+        self.video_capture = video_capture
+        self.on_frame = on_frame
+        self.height = height
+        self.width = width
+        # Region of interest of zoomed frames (see VideoCapture.get_frame())
+        self.roi = None
+        self.settle_delay = settle_delay
+        self.poll_interval = poll_interval
+
+        self.target = None
+        self._settle_id = None
+        self._poll_id = None
+        self._generation = 0
+        self._pending = None
+        self._result = None
+        self._busy = False
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def request(self, frame_number, preview=False):
+        """Seek to frame_number, replacing all pending seeks.
+
+        Args:
+            frame_number (int): Number of the frame to seek to (starting at 1)
+            preview (bool, optional): Show the nearest keyframe first and the exact
+                frame once requests settle. Defaults to False.
+        """
+        self.target = frame_number
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, frame_number, preview)
+            self._condition.notify()
+        if self._settle_id:
+            self.widget.after_cancel(self._settle_id)
+            self._settle_id = None
+        if preview:
+            self._settle_id = self.widget.after(
+                self.settle_delay, lambda: self._settle(frame_number)
+            )
+        if not self._poll_id:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+
+    def get_pending_target(self):
+        """Get the frame number of the latest seek, if not finished yet.
+
+        Returns:
+            int: Number of the frame or None if no seek is pending
+        """
+        return self.target if self.is_pending() else None
+
+    def is_pending(self):
+        with self._condition:
+            return bool(self._settle_id or self._pending or self._busy or self._result)
+
+    def cancel(self):
+        """Cancel all pending seeks, frames of running seeks are discarded."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._result = None
+        self.target = None
+        for after_id in (self._settle_id, self._poll_id):
+            if after_id:
+                self.widget.after_cancel(after_id)
+        self._settle_id = None
+        self._poll_id = None
+
+    def stop(self):
+        """Cancel all pending seeks and stop the worker thread."""
+        self.cancel()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _settle(self, frame_number):
+        self._settle_id = None
+        self.request(frame_number)
+
+    def _is_outdated(self, generation):
+        return generation != self._generation
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, frame_number, preview = self._pending
+                self._pending = None
+                self._busy = True
+            if preview:
+                frame_number = (
+                    self.video_capture.get_keyframe_number(frame_number) or frame_number
+                )
+            ret, frame = self.video_capture.get_frame(
+                frame_number=frame_number,
+                height=self.height,
+                width=self.width,
+                roi=self.roi,
+                fast=preview,
+                abort=lambda: self._is_outdated(generation),
+            )
+            with self._condition:
+                if not self._is_outdated(generation):
+                    self._result = (generation, ret, frame)
+                self._busy = False
+
+    def _poll(self):
+        self._poll_id = None
+        with self._condition:
+            result, self._result = self._result, None
+            if result and self._is_outdated(result[0]):
+                result = None
+        if result:
+            self.on_frame(*result[1:])
+        if self.is_pending():
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
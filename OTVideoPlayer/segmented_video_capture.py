@@ -0,0 +1,504 @@
+# OTVideoPlayer: Consecutive recording segments played as one video
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import bisect
+import datetime
+import functools
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from pathlib import Path
+
+import cv2
+
+from helpers import DATETIME_REGEX, _get_datetime_from_filename, _get_file_fingerprint
+from video_capture import VideoCapture
+from video_index import VideoIndex
+
+
+def find_segments(video_path):
+    """Get all recording segments of the camera a video file belongs to.
+
+    Segments are the files in the same directory whose names only differ in
+    "yyyy-mm-dd_hh-mm-ss", sorted by that start time.
+
+    Args:
+        video_path (str or Path): Path of one of the segments
+
+    Returns:
+        list: Paths of the segments
+    """
+    video_path = Path(video_path)
+    match = re.search(DATETIME_REGEX, video_path.name)
+    if not match:
+        return [video_path]
+    pattern = re.compile(
+        re.escape(video_path.name[: match.start()])
+        + DATETIME_REGEX
+        + re.escape(video_path.name[match.end() :])
+        + "$"
+    )
+    segments = [
+        path for path in video_path.parent.iterdir() if pattern.match(path.name)
+    ]
+    return sorted(segments, key=lambda path: _get_datetime_from_filename(path.name))
+
+
+def find_segments_around(video_path, count):
+    """Get the recording segments next to a video file.
+
+    Args:
+        video_path (str or Path): Path of one of the segments
+        count (int): Number of segments before and after the video file
+
+    Returns:
+        list: Paths of the video file and up to count segments before and after
+    """
+    video_path = Path(video_path)
+    segments = find_segments(video_path)
+    if video_path not in segments:
+        return [video_path]
+    position = segments.index(video_path)
+    return segments[max(position - count, 0) : position + count + 1]
+
+
+def get_frame_count(video_path, build_index=True):
+    """Get the number of frames of a video without decoding it.
+
+    The count is exact if the keyframe index of the video exists or is built,
+    otherwise it is the (possibly inexact) count of the container.
+
+    Args:
+        video_path (str or Path): Path of the video file
+        build_index (bool, optional): Build the keyframe index if it does not
+            exist yet (reads all packets of the video). Defaults to True.
+
+    Returns:
+        int: Number of frames
+    """
+    try:
+        if build_index:
+            index = VideoIndex.load_or_build(video_path)
+        else:
+            index = VideoIndex.load(video_path, _get_file_fingerprint(video_path))
+    except ValueError as e:
+        print(e)
+        index = None
+    if index and index.total_frames:
+        return int(index.total_frames)
+    capture = cv2.VideoCapture(str(video_path))
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return frame_count
+
+
+def get_segment_frame(video_path, frame_number):
+    """Get the segment and its frame of a frame number counted across segments.
+
+    Frame numbers of timestamps taken in playlist mode count from the start of
+    the first segment onward.
+
+    Args:
+        video_path (str or Path): Path of the segment the frames are counted from
+        frame_number (int): Number of the frame (starting at 1)
+
+    Returns:
+        tuple: Path of the segment and number of the frame in it
+    """
+    frame_count = get_frame_count(video_path)
+    if frame_number <= frame_count:
+        return video_path, frame_number
+    segments = find_segments(video_path)
+    position = segments.index(Path(video_path))
+    for segment in segments[position + 1 :]:
+        frame_number -= frame_count
+        frame_count = get_frame_count(segment)
+        if frame_number <= frame_count:
+            return str(segment), frame_number
+    return video_path, frame_number
+
+
+class SegmentedVideoCapture:
+    """Consecutive recording segments played like one VideoCapture.
+
+    Frame numbers count across all segments, times are the real times of the
+    segments. Only the segments next to the playhead are kept open. During
+    playback the next segment is opened and decodes its first frames in the
+    background before the current segment ends, so the switch does not stall.
+
+    Segments without keyframe index are counted by their container at first.
+    Their indexes are built by a background thread, nearest to the current
+    segment first, and the exact counts replace the estimated ones.
+
+    Args:
+        video_paths (list): Paths of the segments in order
+        buffer_size (int, optional): Size of the frame buffer of each segment.
+            Defaults to 32.
+        cache_mb (int, optional): Frame cache size shared by the open segments.
+            Defaults to 256.
+        keep_segments (int, optional): Number of segments kept open before and
+            after the current one. Defaults to 1.
+        preload_seconds (float, optional): Time before the end of a segment at
+            which the next one is opened. Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        video_paths,
+        buffer_size=32,
+        cache_mb=256,
+        keep_segments=1,
+        preload_seconds=2,
+    ):
+        self.video_paths = [str(video_path) for video_path in video_paths]
+        self.buffer_size = buffer_size
+        self.cache_mb = cache_mb // (2 * keep_segments + 1)
+        self.keep_segments = keep_segments
+        self.preload_seconds = preload_seconds
+
+        # Frame counts of all segments are probed in parallel (without decoding),
+        # exact from existing keyframe indexes or estimated by the container
+        with ThreadPoolExecutor() as pool:
+            self.frame_counts = list(
+                pool.map(
+                    functools.partial(get_frame_count, build_index=False),
+                    self.video_paths,
+                )
+            )
+        # Frames before each segment
+        self.offsets = [0, *accumulate(self.frame_counts)]
+        self.total_frames = self.offsets[-1]
+        self.start_times = [
+            _get_datetime_from_filename(Path(video_path).name)
+            for video_path in self.video_paths
+        ]
+
+        self._lock = threading.RLock()
+        self._segments = {}
+        self._segment = 0
+        self._decoder_args = None
+        self._preloading = False
+        self._released = threading.Event()
+        self.timings = None
+
+        first_segment = self._open(0)
+        self.width = first_segment.width
+        self.height = first_segment.height
+        self.fps = first_segment.fps
+        self.start_time = first_segment.start_time
+        self._update_current()
+
+        self._index_builder = threading.Thread(target=self._build_indexes, daemon=True)
+        self._index_builder.start()
+
+    @property
+    def video_path(self):
+        return self.video_paths[self._segment]
+
+    @property
+    def index(self):
+        return self._segments[self._segment].index
+
+    def wait_for_indexes(self, timeout=None):
+        """Wait until the keyframe indexes of all segments are loaded or built.
+
+        Args:
+            timeout (float, optional): Timeout in seconds. Defaults to None.
+        """
+        self._index_builder.join(timeout)
+
+    def set_timings(self, timings):
+        with self._lock:
+            self.timings = timings
+            for video_capture in self._segments.values():
+                video_capture.set_timings(timings)
+
+    def get_time_of_frame(self, frame_number):
+        """Get the real time of a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            datetime.datetime: Time of the frame
+        """
+        segment, local_frame_number = self._locate(frame_number)
+        video_capture = self._segments.get(segment)
+        if video_capture:
+            return video_capture.get_time_of_frame(local_frame_number)
+        return self.start_times[segment] + datetime.timedelta(
+            seconds=(local_frame_number - 1) / self.fps
+        )
+
+    def get_frame_of_time(self, time):
+        """Get the frame presented at a real time.
+
+        Args:
+            time (datetime.datetime): Real time
+
+        Returns:
+            int: Number of the frame (starting at 1), clamped to the segments.
+                Times between segments are clamped to the end of the segment before.
+        """
+        segment = max(bisect.bisect_right(self.start_times, time) - 1, 0)
+        with self._lock:
+            local_frame_number = self._open(segment).get_frame_of_time(time)
+        return self.offsets[segment] + local_frame_number
+
+    def get_source(self, frame_number):
+        """Get the video file and the frame number in it of a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            tuple: Path of the segment and number of the frame in it
+        """
+        segment, local_frame_number = self._locate(frame_number)
+        return self.video_paths[segment], local_frame_number
+
+    def get_frame(
+        self,
+        frame_number=None,
+        height=None,
+        width=None,
+        roi=None,
+        fast=False,
+        abort=None,
+    ):
+        with self._lock:
+            if not frame_number:
+                frame_number = self.current_frame + 1
+            segment, local_frame_number = self._locate(frame_number)
+            ret, frame = self._activate(segment).get_frame(
+                local_frame_number,
+                height=height,
+                width=width,
+                roi=roi,
+                fast=fast,
+                abort=abort,
+            )
+            self._update_current()
+        return (ret, frame)
+
+    def get_previous_frame(self, height=None, width=None, roi=None, fast=False):
+        with self._lock:
+            video_capture = self._segments[self._segment]
+            if video_capture.current_frame <= 1:
+                # Continue with the last frame of the segment before
+                if self.current_frame <= 1:
+                    return (False, None)
+                return self.get_frame(
+                    self.current_frame - 1,
+                    height=height,
+                    width=width,
+                    roi=roi,
+                    fast=fast,
+                )
+            ret, frame = video_capture.get_previous_frame(
+                height=height, width=width, roi=roi, fast=fast
+            )
+            self._update_current()
+        return (ret, frame)
+
+    def get_keyframe_number(self, frame_number):
+        with self._lock:
+            segment, local_frame_number = self._locate(frame_number)
+            keyframe_number = self._open(segment).get_keyframe_number(
+                local_frame_number
+            )
+        if keyframe_number is None:
+            return None
+        return self.offsets[segment] + keyframe_number
+
+    def seek(self, frame_number, abort=None):
+        with self._lock:
+            segment, local_frame_number = self._locate(frame_number)
+            video_capture = self._activate(segment, start_decoder=False)
+            ret = video_capture.seek(local_frame_number, abort=abort)
+            # Frame before the new position is the current one (see start_decoder)
+            video_capture.get_current_time()
+            if self._decoder_args:
+                video_capture.start_decoder(*self._decoder_args)
+            self._update_current()
+        return ret
+
+    def start_decoder(self, height=None, width=None, roi=None, fast=False):
+        with self._lock:
+            # Segments share the resolution, so also the region of interest
+            self._decoder_args = (height, width, roi, fast)
+            self._segments[self._segment].start_decoder(*self._decoder_args)
+
+    def stop_decoder(self):
+        with self._lock:
+            self._decoder_args = None
+            for video_capture in self._segments.values():
+                video_capture.stop_decoder()
+
+    def skip_to(self, frame_number):
+        # Beyond the current segment the decoder skips to its end
+        self._segments[self._segment].skip_to(
+            frame_number - self.offsets[self._segment]
+        )
+
+    def read_buffered(self, frame_number=None):
+        with self._lock:
+            segment = self._segment
+            video_capture = self._segments[segment]
+            local_frame_number = (
+                None if frame_number is None else frame_number - self.offsets[segment]
+            )
+            ret, frame = video_capture.read_buffered(local_frame_number)
+            if (
+                not ret
+                and video_capture.decoder_at_end
+                and segment + 1 < len(self.video_paths)
+                and (
+                    local_frame_number is None
+                    or local_frame_number > video_capture.current_frame
+                )
+            ):
+                # Switch to the next segment, which is decoding ahead already
+                video_capture = self._activate(segment + 1)
+                ret, frame = video_capture.read_buffered(
+                    None
+                    if frame_number is None
+                    else frame_number - self.offsets[segment + 1]
+                )
+            self._update_current()
+            self._preload_next_segment()
+        return (ret, frame)
+
+    def release(self):
+        self._released.set()
+        with self._lock:
+            self._decoder_args = None
+            for video_capture in self._segments.values():
+                video_capture.release()
+            self._segments.clear()
+
+    def _build_indexes(self):
+        pending = set(range(len(self.video_paths)))
+        while pending and not self._released.is_set():
+            with self._lock:
+                segment = min(pending, key=lambda other: abs(other - self._segment))
+                video_capture = self._segments.get(segment)
+            pending.discard(segment)
+            try:
+                if video_capture:
+                    # Open segments load or build their index themselves
+                    index = video_capture.wait_for_index()
+                else:
+                    index = VideoIndex.load_or_build(self.video_paths[segment])
+            except ValueError as e:
+                print(e)
+                continue
+            if index and index.total_frames:
+                self._set_frame_count(segment, int(index.total_frames))
+
+    def _set_frame_count(self, segment, frame_count):
+        with self._lock:
+            if self.frame_counts[segment] == frame_count:
+                return
+            self.frame_counts[segment] = frame_count
+            self.offsets = [0, *accumulate(self.frame_counts)]
+            self.total_frames = self.offsets[-1]
+            if self._segments:
+                self._update_current()
+
+    def _locate(self, frame_number):
+        frame_number = min(max(int(frame_number), 1), max(self.total_frames, 1))
+        segment = bisect.bisect_left(self.offsets, frame_number, 1) - 1
+        segment = min(segment, len(self.video_paths) - 1)
+        return segment, frame_number - self.offsets[segment]
+
+    def _open(self, segment):
+        with self._lock:
+            if segment not in self._segments:
+                self._segments[segment] = VideoCapture(
+                    self.video_paths[segment],
+                    buffer_size=self.buffer_size,
+                    cache_mb=self.cache_mb,
+                )
+                self._segments[segment].set_timings(self.timings)
+            return self._segments[segment]
+
+    def _activate(self, segment, start_decoder=True):
+        if segment != self._segment:
+            self._segments[self._segment].stop_decoder()
+            self._segment = segment
+            self._close_far_segments()
+        video_capture = self._open(segment)
+        if start_decoder and self._decoder_args:
+            video_capture.start_decoder(*self._decoder_args)
+        return video_capture
+
+    def _close_far_segments(self):
+        for segment in list(self._segments):
+            if abs(segment - self._segment) > self.keep_segments:
+                self._segments.pop(segment).release()
+
+    def _update_current(self):
+        video_capture = self._segments[self._segment]
+        self.current_frame = self.offsets[self._segment] + video_capture.current_frame
+        self.current_time = video_capture.current_time
+
+    def _preload_next_segment(self):
+        next_segment = self._segment + 1
+        remaining_frames = (
+            self.frame_counts[self._segment]
+            - self._segments[self._segment].current_frame
+        )
+        if (
+            self._decoder_args
+            and not self._preloading
+            and next_segment < len(self.video_paths)
+            and next_segment not in self._segments
+            and remaining_frames < self.preload_seconds * self.fps
+        ):
+            self._preloading = True
+            threading.Thread(
+                target=self._preload, args=(next_segment,), daemon=True
+            ).start()
+
+    def _preload(self, segment):
+        try:
+            # Opening (and loading the keyframe index) happens outside of the lock
+            video_capture = VideoCapture(
+                self.video_paths[segment],
+                buffer_size=self.buffer_size,
+                cache_mb=self.cache_mb,
+            )
+            with self._lock:
+                if (
+                    segment in self._segments
+                    or abs(segment - self._segment) > self.keep_segments
+                ):
+                    video_capture.release()
+                    return
+                self._segments[segment] = video_capture
+                video_capture.set_timings(self.timings)
+                if self._decoder_args:
+                    # Decodes the first frames into its buffer before the switch
+                    video_capture.start_decoder(*self._decoder_args)
+        finally:
+            # Also if opening failed, the segment is opened again when switching
+            with self._lock:
+                self._preloading = False
@@ -0,0 +1,219 @@
+# OTVideoPlayer: Memory-mapped thumbnails of a video for timeline previews
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from helpers import _get_file_fingerprint
+from video_capture import VideoCapture
+from video_index import VideoIndex
+
+THUMBNAILS_SUFFIX = ".otthumbs.npy"
+METADATA_SUFFIX = ".otthumbs.json"
+
+
+class ThumbnailStrip:
+    """Downscaled thumbnails sampled from a video at a fixed interval.
+
+    Thumbnails are stored in a memory-mapped NumPy file next to the video, so
+    they load instantly on reopen, take almost no RAM and can be read without
+    touching any decoder. Missing thumbnails are built by a background thread
+    with its own VideoCapture, an interrupted build is continued.
+
+    Args:
+        video_path (str or Path): Path of the video file
+        interval (float, optional): Interval between thumbnails in seconds.
+            Defaults to 10.
+        height (int, optional): Height of the thumbnails. Defaults to 72.
+        get_index (callable, optional): Returns the keyframe index of the video
+            (e.g. the one of the player, may block until it is built). Defaults to
+            None (loaded from the sidecar file or built).
+    """
+
+    def __init__(self, video_path, interval=10, height=72, get_index=None):
+        self.video_path = Path(video_path)
+        self.interval = interval
+        self.height = height
+        self.get_index = get_index
+        self.width = None
+        self.interval_frames = None
+        self.thumbnails = None
+        self.built = 0
+        self._cancel = threading.Event()
+        self._builder = None
+
+    def load_or_build(self):
+        """Load the thumbnails and build missing ones in a background thread."""
+        self._builder = threading.Thread(target=self._load_or_build, daemon=True)
+        self._builder.start()
+
+    def cancel(self):
+        """Stop building thumbnails (already built ones are kept)."""
+        self._cancel.set()
+
+    def is_complete(self):
+        return self.thumbnails is not None and self.built == len(self.thumbnails)
+
+    def get_thumbnail(self, frame_number):
+        """Get the thumbnail nearest to a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            np.ndarray: RGB thumbnail or None if not built yet
+        """
+        if not self.built:
+            return None
+        index = round((frame_number - 1) / self.interval_frames)
+        return self.thumbnails[min(max(index, 0), self.built - 1)]
+
+    def get_frame_number(self, index):
+        """Get the number of the frame a thumbnail has been sampled from.
+
+        Args:
+            index (int): Index of the thumbnail
+
+        Returns:
+            int: Number of the frame (starting at 1)
+        """
+        return index * self.interval_frames + 1
+
+    def _load_or_build(self):
+        fingerprint = _get_file_fingerprint(self.video_path)
+        if self._load(fingerprint) and self.is_complete():
+            return
+        if self._cancel.is_set():
+            return
+        try:
+            video_capture = self._open_video_capture()
+        except ValueError as e:
+            print(e)
+            return
+        try:
+            if self.thumbnails is None:
+                self._create(fingerprint, video_capture)
+            self._build(fingerprint, video_capture)
+        finally:
+            video_capture.release()
+
+    def _load(self, fingerprint):
+        try:
+            with open(get_metadata_path(self.video_path), "r") as f:
+                metadata = json.load(f)
+            if (
+                metadata["fingerprint"] != fingerprint
+                or metadata["interval"] != self.interval
+                or metadata["height"] != self.height
+            ):
+                return False
+            mode = "r" if metadata["built"] == metadata["count"] else "r+"
+            thumbnails = np.load(get_thumbnails_path(self.video_path), mmap_mode=mode)
+        except (OSError, KeyError, ValueError):
+            return False
+        self.width = metadata["width"]
+        self.interval_frames = metadata["interval_frames"]
+        self.built = metadata["built"]
+        self.thumbnails = thumbnails[: metadata["count"]]
+        return True
+
+    def _open_video_capture(self):
+        video_capture = VideoCapture(
+            str(self.video_path), buffer_size=1, cache_mb=0, use_index=False
+        )
+        try:
+            if self.get_index:
+                index = self.get_index()
+            else:
+                index = VideoIndex.load_or_build(self.video_path)
+        except ValueError as e:
+            print(e)
+            index = None
+        if index is not None:
+            video_capture.set_index(index)
+        return video_capture
+
+    def _create(self, fingerprint, video_capture):
+        self.width = round(self.height * video_capture.width / video_capture.height)
+        self.interval_frames = max(round(self.interval * video_capture.fps), 1)
+        count = int(np.ceil(video_capture.total_frames / self.interval_frames))
+        self.thumbnails = np.lib.format.open_memmap(
+            get_thumbnails_path(self.video_path),
+            mode="w+",
+            dtype=np.uint8,
+            shape=(count, self.height, self.width, 3),
+        )
+        self.built = 0
+        self._save_metadata(fingerprint)
+
+    def _build(self, fingerprint, video_capture):
+        for index in range(self.built, len(self.thumbnails)):
+            if self._cancel.is_set():
+                break
+            ret, frame = video_capture.get_frame(
+                frame_number=self.get_frame_number(index),
+                height=self.height,
+                width=self.width,
+            )
+            if not ret:
+                # Frame count of the container was too high
+                self.thumbnails = self.thumbnails[: self.built]
+                break
+            self.thumbnails[index] = frame
+            self.built = index + 1
+            if self.built % 100 == 0:
+                self.thumbnails.flush()
+                self._save_metadata(fingerprint)
+        self.thumbnails.flush()
+        self._save_metadata(fingerprint)
+
+    def _save_metadata(self, fingerprint):
+        metadata_path = get_metadata_path(self.video_path)
+        temp_path = metadata_path.with_name(f"{metadata_path.name}.tmp")
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(
+                    {
+                        "fingerprint": fingerprint,
+                        "interval": self.interval,
+                        "interval_frames": self.interval_frames,
+                        "height": self.height,
+                        "width": self.width,
+                        "count": len(self.thumbnails),
+                        "built": self.built,
+                    },
+                    f,
+                )
+            os.replace(temp_path, metadata_path)
+        except OSError as e:
+            print(e)
+
+
+def get_thumbnails_path(video_path):
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + THUMBNAILS_SUFFIX)
+
+
+def get_metadata_path(video_path):
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + METADATA_SUFFIX)
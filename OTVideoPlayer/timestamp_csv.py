@@ -0,0 +1,118 @@
+# OTVideoPlayer: Loading and saving QuickTimeStamps csv files with their journal
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pathlib import Path
+
+import pandas as pd
+
+from timestamp_journal import TimestampJournal, get_journal_path
+from timestamp_store import HEADERS, TimestampStore
+
+BUTTONS_COMMENT = "# Buttons: "
+
+
+def read_buttons(path):
+    """Read the labels of the buttons from the comments of a csv file.
+
+    The first line of a csv file is a comment with the labels of the buttons.
+    Saves that only append to the csv file append another comment, if the
+    buttons changed, so the last comment is the current one.
+
+    Args:
+        path (str or Path): Path of the csv file
+
+    Returns:
+        list: Labels of the buttons
+    """
+    data = Path(path).read_bytes()
+    start = data.rfind(b"\n" + BUTTONS_COMMENT.encode()) + 1
+    if not start and not data.startswith(BUTTONS_COMMENT.encode()):
+        return []
+    end = data.find(b"\n", start)
+    comment = data[start : end if end >= 0 else len(data)].decode()
+    labels = comment[len(BUTTONS_COMMENT) :].split(",")
+    return [label.rstrip() for label in labels if label.strip()]
+
+
+def load_timestamps(path):
+    """Load the timestamps of a csv file and replay the changes of its journal.
+
+    Args:
+        path (str or Path): Path of the csv file
+
+    Returns:
+        tuple: TimestampStore, labels of the buttons, TimestampJournal of the csv
+            file and number of replayed changes
+    """
+    labels = read_buttons(path)
+    timestamps = TimestampStore()
+    timestamps.extend(pd.read_csv(path, sep=",", comment="#"))
+    # Recover unsaved changes of a previous session that crashed
+    journal = TimestampJournal(path)
+    changes, journal_labels = journal.replay(timestamps)
+    if journal_labels is not None:
+        labels = journal_labels
+    return timestamps, labels, journal, changes
+
+
+def save_timestamps(path, timestamps, labels, journal=None):
+    """Save timestamps to a csv file and compact its journal.
+
+    If timestamps were only added (or buttons changed) since the last save of the
+    same csv file, these changes are appended. Otherwise the csv file is rewritten
+    with the labels of the buttons as comment in the first line.
+
+    Args:
+        path (str or Path): Path of the csv file
+        timestamps (TimestampStore): Timestamps to save
+        labels (iterable): Labels of the buttons
+        journal (TimestampJournal, optional): Journal of the timestamps since the
+            last save. Defaults to None.
+
+    Returns:
+        TimestampJournal: Journal of the csv file
+    """
+    path = Path(path)
+    same_file = journal is not None and journal.path == get_journal_path(path)
+    if same_file and journal.can_append() and path.exists():
+        # Only append the changes since the last save
+        if journal.labels is not None:
+            with open(path, "a") as f:
+                f.write(f"{BUTTONS_COMMENT}{','.join(journal.labels)}\n")
+        if journal.added_ids:
+            pd.DataFrame(
+                timestamps.to_columns(journal.added_ids), columns=HEADERS
+            ).to_csv(path, index=False, header=False, mode="a")
+    else:
+        # Write to csv file (first line is comment with button names)
+        with open(path, "w") as f:
+            f.write(f"{BUTTONS_COMMENT}{','.join(labels)}\n")
+        pd.DataFrame(timestamps.to_columns(), columns=HEADERS).to_csv(
+            path, index=False, mode="a"
+        )
+    # Saved changes are removed from the journal of the csv file
+    # (rows of the csv file are the timestamps in order of insertion)
+    if same_file:
+        journal.compact()
+        return journal
+    if journal is not None:
+        journal.close(remove=True)
+    journal = TimestampJournal(path)
+    journal.compact(timestamps.get_ids())
+    return journal
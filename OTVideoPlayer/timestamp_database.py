@@ -0,0 +1,379 @@
+# OTVideoPlayer: SQLite database of QuickTimeStamps of many csv files
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import sqlite3
+from array import array
+from bisect import bisect_left
+from itertools import filterfalse
+
+import pandas as pd
+
+from timestamp_store import (
+    CREATED,
+    CREATOR,
+    EVENT,
+    FRAME,
+    HEADERS,
+    REALTIME,
+    VIDEOPATH,
+    VIDEOTIME,
+)
+
+DATABASE_SUFFIX = ".sqlite"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS timestamps (
+    id INTEGER PRIMARY KEY,
+    {REALTIME} REAL,
+    {VIDEOTIME} REAL,
+    {FRAME} INTEGER,
+    {EVENT} TEXT,
+    {VIDEOPATH} TEXT,
+    {CREATED} REAL,
+    {CREATOR} TEXT
+);
+CREATE INDEX IF NOT EXISTS timestamps_{VIDEOPATH} ON timestamps ({VIDEOPATH}, {FRAME});
+CREATE INDEX IF NOT EXISTS timestamps_{EVENT} ON timestamps ({EVENT}, {REALTIME});
+CREATE INDEX IF NOT EXISTS timestamps_{REALTIME} ON timestamps ({REALTIME});
+CREATE INDEX IF NOT EXISTS timestamps_{FRAME} ON timestamps ({FRAME});
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS = ", ".join(HEADERS)
+
+# Ids bound per statement, below the limit of older SQLite versions (999)
+MAX_PARAMETERS = 900
+
+
+class TimestampDatabase:
+    """SQLite database of timestamps with the same interface as TimestampStore.
+
+    The database runs in WAL mode, so every change is committed right away
+    without rewriting any file, and it is indexed by video path, event (and
+    real time), real time and frame. Ids of the timestamps are the row ids of
+    the database. Only the ids are held in memory, to look up the rows of the
+    visible window of the table by position.
+
+    Args:
+        path (str or Path): Path of the database file (created if missing)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # Keep the pages of the indexes in memory during bulk inserts (64 MB)
+        self.connection.execute("PRAGMA cache_size=-65536")
+        self.connection.executescript(SCHEMA)
+        self.ids = array(
+            "q", (row[0] for row in self.connection.execute(_select("id")))
+        )
+        self._row_id = None
+        self._row = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, timestamp_id):
+        index = bisect_left(self.ids, timestamp_id)
+        return index < len(self.ids) and self.ids[index] == timestamp_id
+
+    def add(self, timestamp):
+        """Add a timestamp.
+
+        Args:
+            timestamp (dict): Values of the timestamp by header
+
+        Returns:
+            int: Id of the timestamp
+        """
+        return self.extend({header: [timestamp.get(header)] for header in HEADERS})[0]
+
+    def extend(self, columns):
+        """Add many timestamps in one transaction, e.g. all columns of a csv file.
+
+        Args:
+            columns (mapping): Sequences of values by header (e.g. a DataFrame).
+                Missing headers are filled with None.
+
+        Returns:
+            list: Ids of the added timestamps
+        """
+        count = len(columns[CREATED])
+        values = [
+            _to_list(columns[header]) if header in columns else [None] * count
+            for header in HEADERS
+        ]
+        last_id = self.ids[-1] if self.ids else 0
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO timestamps ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip(*values),
+            )
+        new_ids = [
+            row[0]
+            for row in self.connection.execute(
+                _select("id", "WHERE id > ?"), (last_id,)
+            )
+        ]
+        self.ids.extend(new_ids)
+        return new_ids
+
+    def delete(self, timestamp_ids):
+        """Delete timestamps.
+
+        Args:
+            timestamp_ids (iterable): Ids of the timestamps (unknown ids are ignored)
+        """
+        timestamp_ids = set(timestamp_ids)
+        if not timestamp_ids:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM timestamps WHERE id = ?",
+                ((timestamp_id,) for timestamp_id in timestamp_ids),
+            )
+        # Ids are filtered in one pass instead of shifting them for every id
+        self.ids = array("q", filterfalse(timestamp_ids.__contains__, self.ids))
+        self._row_id = None
+
+    def get_id(self, index):
+        return self.ids[index]
+
+    def get(self, timestamp_id, header):
+        """Get a value of a timestamp (the last read row is cached).
+
+        Args:
+            timestamp_id (int): Id of the timestamp
+            header (str): Header of the value (one of HEADERS)
+
+        Returns:
+            Value of the timestamp
+        """
+        if timestamp_id != self._row_id:
+            self._row = self.connection.execute(
+                _select(COLUMNS, "WHERE id = ?"), (timestamp_id,)
+            ).fetchone()
+            self._row_id = timestamp_id
+        return self._row[HEADERS.index(header)]
+
+    def get_ids_of_event(self, event):
+        return [
+            row[0]
+            for row in self.connection.execute(
+                _select("id", f"WHERE {EVENT} = ?"), (event,)
+            )
+        ]
+
+    def get_ids_of_frame(self, frame):
+        return {
+            row[0]
+            for row in self.connection.execute(
+                _select("id", f"WHERE {FRAME} = ?"), (frame,)
+            )
+        }
+
+    def get_ids_of_video(self, videopath):
+        return [
+            row[0]
+            for row in self.connection.execute(
+                _select("id", f"WHERE {VIDEOPATH} = ?"), (videopath,)
+            )
+        ]
+
+    def get_next_frame(self, videopath, frame, event=None):
+        return self._get_frame("MIN", ">", videopath, frame, event)
+
+    def get_previous_frame(self, videopath, frame, event=None):
+        return self._get_frame("MAX", "<", videopath, frame, event)
+
+    def _get_frame(self, aggregate, operator, videopath, frame, event):
+        # Served by the index on video path and frame (or event)
+        condition = f"{VIDEOPATH} = ? AND {FRAME} {operator} ?"
+        parameters = [videopath, frame]
+        if event is not None:
+            condition += f" AND {EVENT} = ?"
+            parameters.append(event)
+        return self.connection.execute(
+            f"SELECT {aggregate}({FRAME}) FROM timestamps WHERE {condition}",
+            parameters,
+        ).fetchone()[0]
+
+    def iter_rows(self, *headers):
+        """Iterate over values of all timestamps in order of insertion.
+
+        Args:
+            *headers (str): Headers of the values. Defaults to all HEADERS.
+
+        Yields:
+            tuple: Values of a timestamp
+        """
+        yield from self.connection.execute(_select(", ".join(headers or HEADERS)))
+
+    def to_columns(self, timestamp_ids=None):
+        """Get the values of timestamps by header, e.g. to create a DataFrame.
+
+        Args:
+            timestamp_ids (list, optional): Ids of the timestamps.
+                Defaults to None (all timestamps in order of insertion).
+
+        Returns:
+            dict: Lists of values by header
+        """
+        if timestamp_ids is None:
+            rows = self.connection.execute(_select(COLUMNS)).fetchall()
+        else:
+            # Rows are selected in chunks of ids and returned in order of the ids
+            timestamp_ids = list(timestamp_ids)
+            rows_by_id = {}
+            for start in range(0, len(timestamp_ids), MAX_PARAMETERS):
+                chunk = timestamp_ids[start : start + MAX_PARAMETERS]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in self.connection.execute(
+                    _select(f"id, {COLUMNS}", f"WHERE id IN ({placeholders})"), chunk
+                ):
+                    rows_by_id[row[0]] = row[1:]
+            rows = [
+                rows_by_id[timestamp_id]
+                for timestamp_id in timestamp_ids
+                if timestamp_id in rows_by_id
+            ]
+        return _rows_to_columns(rows)
+
+    def query(
+        self, event=None, videopath=None, videopath_pattern=None, start=None, end=None
+    ):
+        """Get the timestamps matching all given conditions using the indexes.
+
+        Args:
+            event (str, optional): Event of the timestamps. Defaults to None.
+            videopath (str, optional): Video path of the timestamps.
+                Defaults to None.
+            videopath_pattern (str, optional): Pattern of the video paths with the
+                wildcards % and _, e.g. "%/site_X/%" (not served by the index).
+                Defaults to None.
+            start (float, optional): Earliest real time in seconds since epoch.
+                Defaults to None.
+            end (float, optional): Latest real time in seconds since epoch.
+                Defaults to None.
+
+        Returns:
+            dict: Lists of values by header, ordered by real time
+        """
+        conditions = []
+        parameters = []
+        if event is not None:
+            conditions.append(f"{EVENT} = ?")
+            parameters.append(event)
+        if videopath is not None:
+            conditions.append(f"{VIDEOPATH} = ?")
+            parameters.append(videopath)
+        if videopath_pattern is not None:
+            conditions.append(f"{VIDEOPATH} LIKE ?")
+            parameters.append(videopath_pattern)
+        if start is not None:
+            conditions.append(f"{REALTIME} >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append(f"{REALTIME} <= ?")
+            parameters.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            f"SELECT {COLUMNS} FROM timestamps {where} ORDER BY {REALTIME}",
+            parameters,
+        ).fetchall()
+        return _rows_to_columns(rows)
+
+    def import_csv(self, paths, chunksize=100000):
+        """Import QuickTimeStamps csv files in chunks.
+
+        Args:
+            paths (list): Paths of the csv files
+            chunksize (int, optional): Number of rows per transaction.
+                Defaults to 100000.
+
+        Returns:
+            int: Number of imported timestamps
+        """
+        # Building the indexes once afterwards is much faster than updating them
+        self._drop_indexes()
+        count = 0
+        try:
+            for path in paths:
+                for chunk in pd.read_csv(
+                    path, sep=",", comment="#", chunksize=chunksize
+                ):
+                    count += len(self.extend(chunk))
+        finally:
+            self.connection.executescript(SCHEMA)
+        return count
+
+    def export_csv(self, path, buttons=(), **conditions):
+        """Export timestamps as QuickTimeStamps csv file.
+
+        Args:
+            path (str or Path): Path of the csv file
+            buttons (iterable, optional): Labels of the buttons for the comment in
+                the first line. Defaults to ().
+            **conditions: Conditions of query(). Defaults to all timestamps.
+        """
+        columns = self.query(**conditions) if conditions else self.to_columns()
+        with open(path, "w") as f:
+            f.write(f"# Buttons: {','.join(buttons)}\n")
+        pd.DataFrame(columns, columns=HEADERS).to_csv(path, index=False, mode="a")
+
+    def get_buttons(self):
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE key = 'buttons'"
+        ).fetchone()
+        return row[0].split(",") if row and row[0] else []
+
+    def set_buttons(self, labels):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO settings VALUES ('buttons', ?)",
+                (",".join(labels),),
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def _drop_indexes(self):
+        indexes = self.connection.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'timestamps' AND sql IS NOT NULL"
+        ).fetchall()
+        with self.connection:
+            for (name,) in indexes:
+                self.connection.execute(f"DROP INDEX {name}")
+
+
+def _select(columns, condition=""):
+    return f"SELECT {columns} FROM timestamps {condition} ORDER BY id"
+
+
+def _to_list(values):
+    # Values of DataFrames as Python types sqlite3 can bind
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def _rows_to_columns(rows):
+    columns = list(zip(*rows)) if rows else [()] * len(HEADERS)
+    return {header: list(column) for header, column in zip(HEADERS, columns)}
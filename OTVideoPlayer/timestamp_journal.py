@@ -0,0 +1,263 @@
+# OTVideoPlayer: Crash-safe append-only journal of unsaved QuickTimeStamps
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import os
+import queue
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import chain, filterfalse
+from pathlib import Path
+
+JOURNAL_SUFFIX = ".otjournal"
+FLUSH_TIMEOUT = 10
+
+ADD = "add"
+DELETE = "delete"
+BUTTONS = "buttons"
+
+
+def get_journal_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + JOURNAL_SUFFIX)
+
+
+class TimestampJournal:
+    """Append-only journal of the changes to timestamps since the last save.
+
+    Every change is written as one json line by a background thread, which
+    fsyncs once per batch of changes that queued up in the meantime. Saving
+    compacts the journal into the csv file, opening the csv file replays it, so
+    a crash loses at most the changes of the last batch.
+
+    Timestamps are journaled by their row: saved timestamps by their row in the
+    csv file and added ones by their row after appending them, in order of
+    addition. Rows do not change until the next save, unlike the ids of the
+    TimestampStore, which are only equal to the rows right after opening.
+    Deleted ids and changed buttons are tracked as well, so that saving does not
+    need to look up all timestamps of the TimestampStore.
+
+    Args:
+        csv_path (str or Path): Path of the csv file of the timestamps
+    """
+
+    def __init__(self, csv_path):
+        self.path = get_journal_path(csv_path)
+        # Ids of the saved timestamps by their row in the csv file
+        self.saved_ids = array("q")
+        self.added_ids = []
+        self.deleted_ids = set()
+        # Labels of the buttons if they changed since the last save
+        self.labels = None
+        self.only_appended = True
+        self._error = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def add(self, timestamp_id, timestamp):
+        """Journal a new timestamp.
+
+        Args:
+            timestamp_id (int): Id of the timestamp in the TimestampStore
+            timestamp (dict): Values of the timestamp by header
+        """
+        row = len(self.saved_ids) + len(self.added_ids)
+        self.added_ids.append(timestamp_id)
+        self._append({"op": ADD, "row": row, "values": timestamp})
+
+    def delete(self, timestamp_ids):
+        """Journal deleted timestamps.
+
+        Args:
+            timestamp_ids (iterable): Ids of the timestamps in the TimestampStore
+        """
+        rows = {}
+        for timestamp_id in timestamp_ids:
+            row = self._get_row(timestamp_id)
+            if row is not None:
+                rows[timestamp_id] = row
+        self.deleted_ids.update(rows)
+        self._append({"op": DELETE, "rows": list(rows.values())})
+
+    def _get_row(self, timestamp_id):
+        # Ids of saved and of added timestamps are both ascending
+        for offset, ids in [(0, self.saved_ids), (len(self.saved_ids), self.added_ids)]:
+            index = bisect_left(ids, timestamp_id)
+            if index < len(ids) and ids[index] == timestamp_id:
+                return offset + index
+        return None
+
+    def set_buttons(self, labels):
+        self.labels = list(labels)
+        self._append({"op": BUTTONS, "labels": self.labels})
+
+    def can_append(self):
+        """Check if saving may append the added timestamps to the csv file.
+
+        Returns:
+            bool: True if timestamps were only added (or buttons changed) since
+                the last save
+        """
+        return self.only_appended
+
+    def replay(self, timestamp_store):
+        """Apply the changes of the journal to freshly loaded timestamps.
+
+        Args:
+            timestamp_store (TimestampStore): Timestamps loaded from the csv file
+
+        Returns:
+            tuple: Number of replayed changes and labels of the buttons
+                (None if they did not change)
+        """
+        self.saved_ids = array("q", timestamp_store.get_ids())
+        self.added_ids = []
+        self.deleted_ids = set()
+        self.labels = None
+        changes = 0
+        valid_size = 0
+        for line in self.path.read_bytes().splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Incomplete last line of a crash
+            if not line.endswith(b"\n"):
+                break
+            if entry["op"] == ADD:
+                # Rows of added timestamps follow the saved ones in order
+                self.added_ids.append(timestamp_store.add(entry["values"]))
+            elif entry["op"] == DELETE:
+                timestamp_ids = [
+                    timestamp_id
+                    for timestamp_id in map(self._get_id, entry["rows"])
+                    if timestamp_id is not None
+                ]
+                timestamp_store.delete(timestamp_ids)
+                self.deleted_ids.update(timestamp_ids)
+            elif entry["op"] == BUTTONS:
+                self.labels = entry["labels"]
+            self._track(entry)
+            changes += 1
+            valid_size += len(line)
+        # New changes must not be appended to an incomplete line
+        with self._lock:
+            self._file.truncate(valid_size)
+        return changes, self.labels
+
+    def _get_id(self, row):
+        if row < len(self.saved_ids):
+            return self.saved_ids[row]
+        row -= len(self.saved_ids)
+        return self.added_ids[row] if row < len(self.added_ids) else None
+
+    def compact(self, saved_ids=None):
+        """Empty the journal after its changes were saved to the csv file.
+
+        Args:
+            saved_ids (iterable, optional): Ids of the saved timestamps in order of
+                their rows in the csv file. Defaults to the journaled ids without
+                the deleted ones.
+        """
+        self.flush()
+        with self._lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        if saved_ids is None:
+            saved_ids = chain(self.saved_ids, self.added_ids)
+            saved_ids = filterfalse(self.deleted_ids.__contains__, saved_ids)
+        self.saved_ids = array("q", saved_ids)
+        self.added_ids = []
+        self.deleted_ids = set()
+        self.labels = None
+        self.only_appended = True
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Block until all changes are written to disk.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the writer thread.
+                Defaults to FLUSH_TIMEOUT.
+
+        Raises:
+            OSError: If the writer thread failed or did not finish in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and not self._error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Journal not written in time", str(self.path))
+                self._queue.all_tasks_done.wait(remaining)
+        if self._error:
+            raise self._error
+
+    def close(self, remove=False):
+        """Write all changes and stop the writer thread.
+
+        Args:
+            remove (bool, optional): Remove the journal file. Defaults to False.
+        """
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    def _append(self, entry):
+        self._track(entry)
+        self._queue.put(json.dumps(entry, default=lambda value: value.item()))
+
+    def _track(self, entry):
+        if entry["op"] == DELETE:
+            self.only_appended = False
+
+    def _write(self):
+        try:
+            self._write_batches()
+        except Exception as e:
+            print(e)
+            # Wake up flush, which raises the error instead of waiting
+            with self._queue.all_tasks_done:
+                self._error = e
+                self._queue.all_tasks_done.notify_all()
+
+    def _write_batches(self):
+        while True:
+            lines = [self._queue.get()]
+            # Batch everything that queued up during the last fsync
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            with self._lock:
+                self._file.writelines(line + "\n" for line in lines if line is not None)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            for _ in lines:
+                self._queue.task_done()
+            if stop:
+                return
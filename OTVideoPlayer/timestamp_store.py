@@ -0,0 +1,342 @@
+# OTVideoPlayer: Column-oriented store of QuickTimeStamps with stable ids
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from itertools import compress
+
+REALTIME = "realtime"
+VIDEOTIME = "videotime"
+FRAME = "frame"
+EVENT = "event"
+VIDEOPATH = "videopath"
+CREATED = "created"
+CREATOR = "creator"
+
+HEADERS = [REALTIME, VIDEOTIME, FRAME, EVENT, VIDEOPATH, CREATED, CREATOR]
+
+# Typecodes of compact numeric columns (other columns hold interned strings)
+TYPECODES = {REALTIME: "d", VIDEOTIME: "d", FRAME: "q", CREATED: "d"}
+
+
+class TimestampStore:
+    """Column-oriented store of timestamps with stable integer ids.
+
+    The id of a timestamp is its row in the columns and is never reused.
+    Deleted rows are only marked as deleted, so ids stay valid and deleting
+    does not move any column data. The sorted indexes drop deleted rows in one
+    pass when they are read next (mark and compact), so deleting m timestamps
+    costs O(m) plus one O(n) pass instead of O(n) per timestamp. Numeric columns
+    are stored in arrays and repeated strings (events, video paths, creators)
+    are interned.
+
+    Indexes:
+        ids: Ids of all timestamps in order of insertion
+        ids_by_event: Ids of all timestamps of an event in order of insertion
+        ids_by_frame: Ids of all timestamps at a frame number
+        ids_by_video: Ids of all timestamps of a video in order of insertion
+        frames_by_video: Sorted frame numbers of all timestamps of a video
+        frames_by_video_event: Sorted frame numbers by video and event
+    """
+
+    __slots__ = (
+        "columns",
+        "alive",
+        "count",
+        "ids",
+        "ids_by_event",
+        "ids_by_frame",
+        "ids_by_video",
+        "frames_by_video",
+        "frames_by_video_event",
+        "_deleted_ids",
+        "_deleted_frames",
+    )
+
+    def __init__(self):
+        self.columns = {
+            header: array(TYPECODES[header]) if header in TYPECODES else []
+            for header in HEADERS
+        }
+        # 1 for every id that is not deleted
+        self.alive = bytearray()
+        self.count = 0
+        self.ids = []
+        self.ids_by_event = defaultdict(list)
+        self.ids_by_frame = defaultdict(set)
+        self.ids_by_video = defaultdict(list)
+        self.frames_by_video = defaultdict(list)
+        self.frames_by_video_event = defaultdict(list)
+        # Deleted ids and frames (by key of the frame lists) not yet compacted
+        self._deleted_ids = []
+        self._deleted_frames = defaultdict(Counter)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, timestamp_id):
+        return 0 <= timestamp_id < len(self.alive) and bool(self.alive[timestamp_id])
+
+    def add(self, timestamp):
+        """Add a timestamp.
+
+        Args:
+            timestamp (dict): Values of the timestamp by header
+
+        Returns:
+            int: Id of the timestamp
+        """
+        return self.extend({header: [timestamp.get(header)] for header in HEADERS})[0]
+
+    def extend(self, columns):
+        """Add many timestamps at once, e.g. all columns of a csv file.
+
+        Args:
+            columns (mapping): Sequences of values by header (e.g. a DataFrame).
+                Missing headers are filled with None or 0.
+
+        Returns:
+            range: Ids of the added timestamps
+        """
+        first_id = len(self.columns[CREATED])
+        count = len(columns[CREATED])
+        for header, column in self.columns.items():
+            values = columns[header] if header in columns else [None] * count
+            if header in TYPECODES:
+                convert = int if TYPECODES[header] == "q" else float
+                column.extend(_to_number(convert, value) for value in values)
+            else:
+                column.extend(
+                    sys.intern(value) if isinstance(value, str) else value
+                    for value in values
+                )
+        new_ids = range(first_id, first_id + count)
+        self.alive.extend(b"\x01" * count)
+        self.count += count
+        self.ids.extend(new_ids)
+        events = self.columns[EVENT]
+        frames = self.columns[FRAME]
+        videopaths = self.columns[VIDEOPATH]
+        # Sorted frame lists touched out of order by their video (and event)
+        unsorted = {}
+        for timestamp_id in new_ids:
+            event = events[timestamp_id]
+            frame = frames[timestamp_id]
+            videopath = videopaths[timestamp_id]
+            self.ids_by_event[event].append(timestamp_id)
+            self.ids_by_frame[frame].add(timestamp_id)
+            self.ids_by_video[videopath].append(timestamp_id)
+            for key, frames_of_key in [
+                (videopath, self.frames_by_video[videopath]),
+                ((videopath, event), self.frames_by_video_event[(videopath, event)]),
+            ]:
+                if count == 1:
+                    insort(frames_of_key, frame)
+                    continue
+                if frames_of_key and frames_of_key[-1] > frame:
+                    unsorted[key] = frames_of_key
+                frames_of_key.append(frame)
+        # Sort each touched list once instead of inserting every frame in order
+        for frames_of_key in unsorted.values():
+            frames_of_key.sort()
+        return new_ids
+
+    def delete(self, timestamp_ids):
+        """Delete timestamps.
+
+        Args:
+            timestamp_ids (iterable): Ids of the timestamps (unknown ids are ignored)
+        """
+        for timestamp_id in set(timestamp_ids):
+            if timestamp_id not in self:
+                continue
+            event = self.columns[EVENT][timestamp_id]
+            frame = self.columns[FRAME][timestamp_id]
+            videopath = self.columns[VIDEOPATH][timestamp_id]
+            # Only marked, the other indexes are compacted when read next
+            self.alive[timestamp_id] = 0
+            self.count -= 1
+            self._deleted_ids.append(timestamp_id)
+            self.ids_by_frame[frame].discard(timestamp_id)
+            self._deleted_frames[videopath][frame] += 1
+            self._deleted_frames[(videopath, event)][frame] += 1
+
+    def _compact(self):
+        # Drop all deleted rows from the indexes in one pass per touched index
+        if not self._deleted_ids:
+            return
+        alive = self.alive
+        events = {
+            self.columns[EVENT][timestamp_id] for timestamp_id in self._deleted_ids
+        }
+        videopaths = {
+            self.columns[VIDEOPATH][timestamp_id] for timestamp_id in self._deleted_ids
+        }
+        self.ids = _filter_alive(self.ids, alive)
+        for event in events:
+            self.ids_by_event[event] = _filter_alive(self.ids_by_event[event], alive)
+        for videopath in videopaths:
+            self.ids_by_video[videopath] = _filter_alive(
+                self.ids_by_video[videopath], alive
+            )
+        for key, deleted_frames in self._deleted_frames.items():
+            frames_by_key = (
+                self.frames_by_video_event
+                if isinstance(key, tuple)
+                else self.frames_by_video
+            )
+            frames_by_key[key] = _remove_counted(frames_by_key[key], deleted_frames)
+        self._deleted_ids = []
+        self._deleted_frames = defaultdict(Counter)
+
+    def get_ids(self):
+        """Get the ids of all timestamps in order of insertion.
+
+        Returns:
+            list: Ids of the timestamps
+        """
+        self._compact()
+        return list(self.ids)
+
+    def get_id(self, index):
+        """Get the id of the timestamp at a position in order of insertion.
+
+        Args:
+            index (int): Position of the timestamp
+
+        Returns:
+            int: Id of the timestamp
+        """
+        self._compact()
+        return self.ids[index]
+
+    def get(self, timestamp_id, header):
+        """Get a value of a timestamp.
+
+        Args:
+            timestamp_id (int): Id of the timestamp
+            header (str): Header of the value (one of HEADERS)
+
+        Returns:
+            Value of the timestamp
+        """
+        return self.columns[header][timestamp_id]
+
+    def get_ids_of_event(self, event):
+        self._compact()
+        return list(self.ids_by_event.get(event, ()))
+
+    def get_ids_of_frame(self, frame):
+        return set(self.ids_by_frame.get(frame, ()))
+
+    def get_ids_of_video(self, videopath):
+        self._compact()
+        return list(self.ids_by_video.get(videopath, ()))
+
+    def get_next_frame(self, videopath, frame, event=None):
+        """Get the frame of the next timestamp of a video after a frame.
+
+        Args:
+            videopath (str): Path of the video
+            frame (int): Frame number to search from
+            event (str, optional): Only timestamps of this event. Defaults to None.
+
+        Returns:
+            int: Frame number of the next timestamp or None
+        """
+        frames = self._get_frames(videopath, event)
+        index = bisect_right(frames, frame)
+        return frames[index] if index < len(frames) else None
+
+    def get_previous_frame(self, videopath, frame, event=None):
+        """Get the frame of the previous timestamp of a video before a frame.
+
+        Args:
+            videopath (str): Path of the video
+            frame (int): Frame number to search from
+            event (str, optional): Only timestamps of this event. Defaults to None.
+
+        Returns:
+            int: Frame number of the previous timestamp or None
+        """
+        frames = self._get_frames(videopath, event)
+        index = bisect_left(frames, frame)
+        return frames[index - 1] if index > 0 else None
+
+    def _get_frames(self, videopath, event=None):
+        self._compact()
+        if event is None:
+            return self.frames_by_video.get(videopath, [])
+        return self.frames_by_video_event.get((videopath, event), [])
+
+    def iter_rows(self, *headers):
+        """Iterate over values of all timestamps in order of insertion.
+
+        Args:
+            *headers (str): Headers of the values. Defaults to all HEADERS.
+
+        Yields:
+            tuple: Values of a timestamp
+        """
+        self._compact()
+        columns = [self.columns[header] for header in headers or HEADERS]
+        for timestamp_id in self.ids:
+            yield tuple(column[timestamp_id] for column in columns)
+
+    def to_columns(self, timestamp_ids=None):
+        """Get the values of timestamps by header, e.g. to create a DataFrame.
+
+        Args:
+            timestamp_ids (list, optional): Ids of the timestamps.
+                Defaults to None (all timestamps in order of insertion).
+
+        Returns:
+            dict: Lists of values by header
+        """
+        if timestamp_ids is None:
+            self._compact()
+            timestamp_ids = self.ids
+        return {
+            header: [column[timestamp_id] for timestamp_id in timestamp_ids]
+            for header, column in self.columns.items()
+        }
+
+
+def _to_number(convert, value):
+    # Missing values (None, or NaN from pandas) are stored as 0
+    if value is None or value != value:
+        return convert(0)
+    return convert(value)
+
+
+def _filter_alive(ids, alive):
+    return list(compress(ids, [alive[timestamp_id] for timestamp_id in ids]))
+
+
+def _remove_counted(frames, deleted_frames):
+    # Remove each frame as often as it was deleted from a sorted list of frames
+    remaining = []
+    for frame in frames:
+        if deleted_frames[frame]:
+            deleted_frames[frame] -= 1
+        else:
+            remaining.append(frame)
+    return remaining
@@ -17,20 +17,36 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import collections
 import datetime
+import threading
+import time
 from pathlib import Path
 
 import cv2
+import numpy as np
 
-from helpers import _get_datetime_from_filename
+from frame_cache import FrameCache
+from helpers import _get_datetime_from_filename, _get_file_fingerprint
+from video_index import VideoIndex
+
+# Interpolation for showing frames while paused and during playback or
+# scrubbing, where INTER_AREA takes several times longer for big downscales
+QUALITY_INTERPOLATION = cv2.INTER_AREA
+FAST_INTERPOLATION = cv2.INTER_LINEAR
 
 
 class VideoCapture:
-    def __init__(self, video_path=0):
+    def __init__(self, video_path=0, buffer_size=32, cache_mb=256, use_index=True):
         # Open the video source
+        self.video_path = video_path
         self.capture = cv2.VideoCapture(video_path)
         if not self.capture.isOpened():
             raise ValueError("Unable to open video source", video_path)
+        # Index of the frame to be read next (starting at 0)
+        self._position = 0
+        # Keyframe and timestamp index (see below)
+        self.index = None
 
         # Get video source width and height
         self.width = self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)
@@ -40,28 +56,613 @@ class VideoCapture:
         self.get_current_time()
         self.total_frames = self.capture.get(cv2.CAP_PROP_FRAME_COUNT)
 
+        # Bounded buffer of frames decoded ahead by a worker thread during playback.
+        # All access to self.capture is serialized by self._lock, entries of outdated
+        # generations (before the latest seek) are dropped by the consumer.
+        self.buffer_size = buffer_size
+        self._buffer = collections.deque()
+        self._buffer_changed = threading.Condition()
+        self._skip_to = 0
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._decoder = None
+        self._decoder_stop = threading.Event()
+        # Set once the decoder thread reached the end of the video
+        self.decoder_at_end = False
+
+        # Recently displayed frames by frame number and size for stepping back and
+        # forth without decoding again
+        self.cache = FrameCache(max_mb=cache_mb)
+
+        # Timings of seeking, decoding, resizing and converting (see set_timings())
+        self.timings = None
+
+        # Resize buffers reused per thread, so converting a frame allocates only
+        # the resulting frame
+        self._resize_buffers = threading.local()
+        # Latest frame read in native resolution, so showing it with another
+        # region of interest (zooming or panning while paused) needs no decoding
+        self._native_frame = (None, None)
+        # Region of interest and fast interpolation of the frames decoded ahead
+        # (see start_decoder())
+        self._decoder_options = (None, False)
+
+        # Segments decoded for playing and stepping backward by a second capture,
+        # frames of the current segment are served from the end of the list while
+        # the segment before is prefetched in the background by a third capture
+        # (the lock is only held to swap segments, not while prefetching)
+        self._reverse_capture = None
+        self._reverse_lock = threading.Lock()
+        self._reverse_segment = []
+        self._prefetched_segment = []
+        self._prefetch_capture = None
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_request = None
+        self._prefetch_thread = None
+
+        # Keyframe index for exact seeking, loaded from the sidecar file or built
+        # in the background (until then seeking falls back to OpenCV)
+        self._index_loaded = threading.Event()
+        if use_index:
+            self._load_index()
+        else:
+            self._index_loaded.set()
+
+    def _load_index(self):
+        fingerprint = _get_file_fingerprint(self.video_path)
+        index = VideoIndex.load(self.video_path, fingerprint)
+        if index:
+            self.set_index(index)
+            self._index_loaded.set()
+        else:
+            threading.Thread(
+                target=self._build_index, args=(fingerprint,), daemon=True
+            ).start()
+
+    def _build_index(self, fingerprint):
+        try:
+            index = VideoIndex.build(self.video_path)
+            index.save(self.video_path, fingerprint)
+            self.set_index(index)
+        except ValueError as e:
+            print(e)
+        finally:
+            self._index_loaded.set()
+
+    def set_index(self, index):
+        """Use a keyframe index for seeking and its exact frame count.
+
+        Args:
+            index (VideoIndex): Keyframe index of the video
+        """
+        if index.total_frames:
+            self.index = index
+            self.total_frames = index.total_frames
+
+    def wait_for_index(self, timeout=None):
+        """Wait until the keyframe index has been loaded or built.
+
+        Args:
+            timeout (float, optional): Timeout in seconds. Defaults to None.
+
+        Returns:
+            VideoIndex: Keyframe index or None if it is not available
+        """
+        self._index_loaded.wait(timeout)
+        return self.index
+
+    def set_timings(self, timings):
+        """Record the durations of the stages of getting frames.
+
+        Args:
+            timings (FrameTimings): Timings to record to (None to stop)
+        """
+        self.timings = timings
+
     def get_current_time(self):
-        self.current_frame = self.capture.get(cv2.CAP_PROP_POS_FRAMES)
-        self.current_time = self.start_time + datetime.timedelta(
-            seconds=(self.current_frame - 1) / self.fps
-        )
+        self.current_frame = self._position
+        self.current_time = self.get_time_of_frame(self.current_frame)
+
+    def get_time_of_frame(self, frame_number):
+        """Get the real time of a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            datetime.datetime: Time of the frame
+        """
+        if self.index and 1 <= frame_number <= self.index.total_frames:
+            # Presentation time, also exact for variable frame rates
+            seconds = self.index.get_time(int(frame_number) - 1)
+        else:
+            seconds = (frame_number - 1) / self.fps
+        return self.start_time + datetime.timedelta(seconds=seconds)
 
-    def get_frame(self, frame_number=None, height=None, width=None):
+    def get_frame_of_time(self, time):
+        """Get the frame presented at a real time.
+
+        Args:
+            time (datetime.datetime): Real time
+
+        Returns:
+            int: Number of the frame (starting at 1), clamped to the video
+        """
+        seconds = (time - self.start_time).total_seconds()
+        if self.index:
+            return self.index.get_frame_index(seconds) + 1
+        # Until the index is built assume a constant frame rate
+        frame_number = int(max(seconds, 0) * self.fps + 1e-6) + 1
+        return min(frame_number, max(int(self.total_frames), 1))
+
+    def get_frame(
+        self,
+        frame_number=None,
+        height=None,
+        width=None,
+        roi=None,
+        fast=False,
+        abort=None,
+    ):
+        """Get a frame resized and converted to RGB for showing it.
+
+        Args:
+            frame_number (int, optional): Number of the frame (starting at 1).
+                Defaults to None (next frame).
+            height (int, optional): Height of the frame. Defaults to None (native).
+            width (int, optional): Width of the frame. Defaults to None (native).
+            roi (tuple, optional): Region of interest x, y, width and height in
+                native pixels, cropped before resizing. Defaults to None (whole
+                frame).
+            fast (bool, optional): Resize with FAST_INTERPOLATION instead of
+                QUALITY_INTERPOLATION. Defaults to False.
+            abort (callable, optional): Aborts seeking if it returns True (see
+                seek()). Defaults to None.
+
+        Returns:
+            tuple: ret and frame (None if no frame could be read)
+        """
+        with self._lock:
+            if not self.capture.isOpened():
+                return (False, None)
+            if not frame_number:
+                frame_number = self.current_frame + 1
+            frame_number = int(frame_number)
+            size = (int(width or self.width), int(height or self.height))
+            frame = self.cache.get((frame_number, *size, roi, fast))
+            if frame is None and self._native_frame[0] == frame_number:
+                frame = self._convert(
+                    self._native_frame[1], height, width, roi=roi, fast=fast
+                )
+                self._cache_frame(frame_number, frame, roi, fast)
+            if frame is not None:
+                self.current_frame = frame_number
+                self.current_time = self.get_time_of_frame(frame_number)
+                return (True, frame)
+            # Capture may be elsewhere after seeks, cache hits or reading ahead
+            if self._position != frame_number - 1:
+                start = time.perf_counter()
+                if not self.seek(frame_number, abort=abort):
+                    return (False, None)
+                if self.timings:
+                    self.timings.record("seek", start)
+            ret, frame = self._read(height, width, roi=roi, fast=fast)
+            self.get_current_time()
+            if ret:
+                self._cache_frame(self.current_frame, frame, roi, fast)
+        return (ret, frame)
+
+    def get_native_frame(self, frame_number):
+        """Get a frame in native resolution and BGR color order as decoded.
+
+        The frame is neither cached nor converted, e.g. for exporting it.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            tuple: ret, frame like from get_frame()
+        """
+        with self._lock:
+            frame_number = int(frame_number)
+            if self._position != frame_number - 1:
+                self.seek(frame_number)
+            ret, frame = self.capture.read()
+            if not ret:
+                return (ret, None)
+            self._position += 1
+            self.get_current_time()
+        return (ret, frame)
+
+    def _cache_frame(self, frame_number, frame, roi=None, fast=False):
+        height, width = frame.shape[:2]
+        self.cache.put((int(frame_number), width, height, roi, fast), frame)
+
+    def _read(self, height=None, width=None, roi=None, fast=False):
+        start = time.perf_counter()
+        ret, frame = self.capture.read()
+        if self.timings:
+            self.timings.record("decode", start)
+        if not ret:
+            return (ret, None)
+        self._position += 1
+        self._native_frame = (self._position, frame)
+        return (ret, self._convert(frame, height, width, roi=roi, fast=fast))
+
+    def _convert(self, frame, height=None, width=None, roi=None, fast=False):
         if not height:
             height = self.height
         if not width:
             width = self.width
-        if not self.capture.isOpened():
-            return (ret, None)
-        if frame_number:
-            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
-        ret, frame = self.capture.read()
-        self.get_current_time()
-        if height != self.height or width != self.width:
-            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
-        return (ret, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) if ret else (ret, None)
+        if roi:
+            # Only the region of interest is scaled, slicing does not copy
+            x, y, roi_width, roi_height = roi
+            frame = frame[y : y + roi_height, x : x + roi_width]
+        start = time.perf_counter()
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(
+                frame,
+                (width, height),
+                dst=self._get_resize_buffer(height, width),
+                interpolation=FAST_INTERPOLATION if fast else QUALITY_INTERPOLATION,
+            )
+            if self.timings:
+                self.timings.record("resize", start)
+                start = time.perf_counter()
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.timings:
+            self.timings.record("convert", start)
+        return frame
+
+    def _get_resize_buffer(self, height, width):
+        buffer = getattr(self._resize_buffers, "buffer", None)
+        if buffer is None or buffer.shape != (height, width, 3):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self._resize_buffers.buffer = buffer
+        return buffer
+
+    def get_previous_frame(self, height=None, width=None, roi=None, fast=False):
+        """Get the frame before the current frame for stepping or playing backward.
+
+        Instead of seeking for every frame, the segment from the preceding keyframe
+        up to the requested frame is decoded once and served backward, while the
+        segment before is prefetched in the background. The capture used for
+        forward reading is not touched.
+
+        Args:
+            height (int, optional): Height of the frame. Defaults to None.
+            width (int, optional): Width of the frame. Defaults to None.
+            roi (tuple, optional): Region of interest (see get_frame()).
+                Defaults to None.
+            fast (bool, optional): Resize with fast interpolation (see
+                get_frame()). Defaults to False.
+
+        Returns:
+            tuple: ret, frame like from get_frame()
+        """
+        frame_number = int(self.current_frame) - 1
+        if frame_number < 1:
+            return (False, None)
+        # Width, height, region of interest and interpolation of the frames
+        view = (int(width or self.width), int(height or self.height), roi, fast)
+        frame = self.cache.get((frame_number, *view))
+        if frame is None:
+            frame = self._get_reverse_segment_frame(frame_number, view)
+        if frame is None:
+            return (False, None)
+        self.current_frame = frame_number
+        self.current_time = self.get_time_of_frame(frame_number)
+        self._cache_frame(frame_number, frame, roi, fast)
+        return (True, frame)
+
+    def _get_reverse_segment_frame(self, frame_number, view):
+        with self._reverse_lock:
+            self._drop_reverse_frames_after(frame_number)
+            if self._segment_contains(self._reverse_segment, frame_number, view):
+                return self._reverse_segment.pop()[1]
+            prefetch = self._prefetch_thread
+            prefetching = self._prefetch_request == (frame_number, view)
+        # Wait for the segment being prefetched instead of decoding it twice
+        if prefetching and prefetch is not None:
+            prefetch.join()
+        with self._reverse_lock:
+            self._drop_reverse_frames_after(frame_number)
+            if not self._segment_contains(self._reverse_segment, frame_number, view):
+                if self._segment_contains(self._prefetched_segment, frame_number, view):
+                    segment = self._prefetched_segment
+                else:
+                    if self._reverse_capture is None:
+                        self._reverse_capture = cv2.VideoCapture(self.video_path)
+                    segment = self._decode_segment(
+                        self._reverse_capture, frame_number, view
+                    )
+                self._reverse_segment = [
+                    entry for entry in segment if entry[0] <= frame_number
+                ]
+                self._prefetched_segment = []
+                self._prefetch_request = None
+                if self._reverse_segment and self._reverse_segment[0][0] > 1:
+                    self._prefetch_request = (self._reverse_segment[0][0] - 1, view)
+                    self._prefetch_thread = threading.Thread(
+                        target=self._prefetch_segment,
+                        args=self._prefetch_request,
+                        daemon=True,
+                    )
+                    self._prefetch_thread.start()
+            if not self._segment_contains(self._reverse_segment, frame_number, view):
+                return None
+            return self._reverse_segment.pop()[1]
+
+    def _drop_reverse_frames_after(self, frame_number):
+        # Frames after the requested frame are not needed (e.g. after seeking back)
+        while self._reverse_segment and self._reverse_segment[-1][0] > frame_number:
+            self._reverse_segment.pop()
+
+    def _segment_contains(self, segment, frame_number, view):
+        return bool(
+            segment
+            and segment[0][0] <= frame_number <= segment[-1][0]
+            and segment[-1][2] == view
+        )
+
+    def _prefetch_segment(self, frame_number, view):
+        # Prefetches run one after another, each decoding with the prefetch capture
+        with self._prefetch_lock:
+            with self._reverse_lock:
+                if self._prefetch_request != (frame_number, view):
+                    return
+            if self._prefetch_capture is None:
+                self._prefetch_capture = cv2.VideoCapture(self.video_path)
+            segment = self._decode_segment(self._prefetch_capture, frame_number, view)
+        with self._reverse_lock:
+            # Segments requested before the last seek or view change are dropped
+            if self._prefetch_request == (frame_number, view):
+                self._prefetched_segment = segment
+
+    def _decode_segment(self, capture, frame_number, view):
+        # Decode from the preceding keyframe (or one second before without index)
+        # up to frame_number
+        frame_index = frame_number - 1
+        keyframe = self.index.get_keyframe(frame_index) if self.index else None
+        if keyframe is None:
+            position = max(frame_index - int(self.fps), 0)
+            capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+        else:
+            position = self._seek_keyframe(capture, keyframe, frame_index)
+        width, height, roi, fast = view
+        segment = []
+        for segment_frame_number in range(position + 1, frame_number + 1):
+            ret, frame = capture.read()
+            if not ret:
+                break
+            segment.append(
+                (
+                    segment_frame_number,
+                    self._convert(frame, height, width, roi=roi, fast=fast),
+                    view,
+                )
+            )
+        return segment
+
+    def seek(self, frame_number, abort=None):
+        """Set the position of the capture to frame_number.
+
+        Frames already decoded ahead by the decoder thread are discarded and the
+        decoder continues at the new position.
+
+        Args:
+            frame_number (int): Number of the frame to be read next (starting at 1)
+            abort (callable, optional): Checked while decoding forward from the
+                keyframe, if it returns True the seek is aborted. Defaults to None.
+
+        Returns:
+            bool: False if the seek has been aborted
+        """
+        with self._lock:
+            self._generation += 1
+            self._skip_to = 0
+            self.decoder_at_end = False
+            self._flush_buffer()
+            return self._set_position(max(int(frame_number) - 1, 0), abort=abort)
+
+    def get_keyframe_number(self, frame_number):
+        """Get the number of the nearest keyframe at or before a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            int: Number of the keyframe or None if the keyframe index is not ready
+        """
+        keyframe = self.index.get_keyframe(frame_number - 1) if self.index else None
+        return None if keyframe is None else keyframe + 1
+
+    def _set_position(self, frame_index, abort=None):
+        # Without keyframe index let OpenCV seek (may be slow and inexact)
+        keyframe = self.index.get_keyframe(frame_index) if self.index else None
+        if keyframe is None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self._position = int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
+            return True
+        # Seek to the nearest preceding keyframe (unless the capture is already
+        # positioned between keyframe and frame) and decode forward to the frame
+        if not keyframe <= self._position <= frame_index:
+            self._position = self._seek_keyframe(self.capture, keyframe, frame_index)
+        while self._position < frame_index:
+            if abort and abort():
+                return False
+            if not self.capture.grab():
+                break
+            self._position += 1
+        return True
+
+    def _seek_keyframe(self, capture, keyframe, frame_index):
+        # OpenCV seeks by time and can miss the keyframe (e.g. in videos with a
+        # variable frame rate). The position is taken from the time of the last
+        # decoded frame instead, earlier keyframes are tried if it is after
+        # frame_index and the video is decoded from the start as last resort.
+        while keyframe > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            seconds = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            position = self.index.get_frame_index(seconds) + 1
+            if position <= frame_index:
+                return position
+            keyframe = self.index.get_keyframe(keyframe - 1) or 0
+        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return 0
+
+    def _flush_buffer(self):
+        with self._buffer_changed:
+            self._buffer.clear()
+            self._buffer_changed.notify_all()
+
+    def start_decoder(self, height=None, width=None, roi=None, fast=False):
+        """Start a worker thread decoding frames ahead into the frame buffer.
+
+        Frames are resized and converted like in get_frame() and can be taken
+        from the buffer using read_buffered().
+
+        Args:
+            height (int, optional): Height of the buffered frames. Defaults to None.
+            width (int, optional): Width of the buffered frames. Defaults to None.
+            roi (tuple, optional): Region of interest of the buffered frames (see
+                get_frame()). Defaults to None.
+            fast (bool, optional): Resize with fast interpolation (see
+                get_frame()). Defaults to False.
+        """
+        if self._decoder:
+            return
+        self._decoder_options = (roi, fast)
+        with self._lock:
+            # Continue after the current frame (capture may be elsewhere)
+            if self._position != self.current_frame:
+                self.seek(self.current_frame + 1)
+        self._decoder_stop.clear()
+        self._decoder = threading.Thread(
+            target=self._decode_ahead,
+            args=(height, width, roi, fast),
+            daemon=True,
+        )
+        self._decoder.start()
+
+    def stop_decoder(self):
+        """Stop the decoder thread and discard all frames decoded ahead."""
+        if not self._decoder:
+            return
+        self._decoder_stop.set()
+        self._flush_buffer()
+        self._decoder.join()
+        self._decoder = None
+        with self._lock:
+            self._generation += 1
+            self.decoder_at_end = False
+            self._flush_buffer()
+
+    def skip_to(self, frame_number):
+        """Let the decoder thread skip all frames before frame_number.
+
+        Used when playback falls behind, skipped frames are only grabbed but
+        not retrieved, resized or converted.
+
+        Args:
+            frame_number (int): Number of the next frame to be buffered
+        """
+        self._skip_to = frame_number
+
+    def _decode_ahead(self, height, width, roi, fast):
+        while not self._decoder_stop.is_set():
+            with self._lock:
+                generation = self._generation
+                while self._position < self._skip_to - 1 and self.capture.grab():
+                    self._position += 1
+                ret, frame = self._read(height, width, roi=roi, fast=fast)
+                frame_number = self._position
+            if not ret:
+                # End of video, wait for a seek
+                self.decoder_at_end = True
+                while generation == self._generation:
+                    if self._decoder_stop.wait(0.01):
+                        break
+                continue
+            entry = (
+                generation,
+                frame_number,
+                self.get_time_of_frame(frame_number),
+                frame,
+            )
+            with self._buffer_changed:
+                while (
+                    len(self._buffer) >= self.buffer_size
+                    and generation == self._generation
+                    and not self._decoder_stop.is_set()
+                ):
+                    self._buffer_changed.wait(0.1)
+                if generation == self._generation:
+                    self._buffer.append(entry)
+
+    def read_buffered(self, frame_number=None):
+        """Take a frame from the buffer filled by the decoder thread.
+
+        Does not block, if no frame is ready yet (False, None) is returned.
+
+        Args:
+            frame_number (int, optional): Take the latest buffered frame up to
+                frame_number and drop the ones before. Defaults to None (next frame).
+
+        Returns:
+            tuple: ret, frame like from get_frame()
+        """
+        entry = None
+        with self._buffer_changed:
+            while self._buffer:
+                if self._buffer[0][0] != self._generation:
+                    self._buffer.popleft()
+                    continue
+                if frame_number is not None and self._buffer[0][1] > frame_number:
+                    break
+                entry = self._buffer.popleft()
+                if frame_number is None:
+                    break
+            self._buffer_changed.notify_all()
+        if entry is None:
+            return (False, None)
+        _, frame_number, time, frame = entry
+        self.current_frame = frame_number
+        self.current_time = time
+        self._cache_frame(frame_number, frame, *self._decoder_options)
+        return (True, frame)
+
+    def get_source(self, frame_number):
+        """Get the video file and the frame number in it of a frame.
+
+        Args:
+            frame_number (int): Number of the frame (starting at 1)
+
+        Returns:
+            tuple: Path of the video file and number of the frame in it
+        """
+        return self.video_path, int(frame_number)
+
+    def release(self):
+        """Stop the decoder thread and release the video source."""
+        self.stop_decoder()
+        with self._lock:
+            self.capture.release()
+        with self._reverse_lock:
+            self._prefetch_request = None
+            if self._reverse_capture is not None:
+                self._reverse_capture.release()
+        with self._prefetch_lock:
+            if self._prefetch_capture is not None:
+                self._prefetch_capture.release()
 
     # Release the video source when the object is destroyed
     def __del__(self):
         if self.capture.isOpened():
             self.capture.release()
+        for capture in [
+            getattr(self, "_reverse_capture", None),
+            getattr(self, "_prefetch_capture", None),
+        ]:
+            if capture is not None:
+                capture.release()
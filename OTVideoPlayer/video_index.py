@@ -0,0 +1,180 @@
+# OTVideoPlayer: Keyframe and timestamp index of a video file
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from helpers import _get_file_fingerprint
+
+INDEX_SUFFIX = ".otindex.npz"
+
+
+class VideoIndex:
+    """Keyframe positions, exact frame count and timestamps of a video file.
+
+    The index is built once by reading all packets of the video without decoding
+    them and cached in a sidecar file next to the video, keyed by a fingerprint of
+    the video file, so reopening the video is instant. The timestamps are exact
+    also for videos with a variable frame rate.
+
+    Args:
+        keyframes (np.ndarray): Sorted indices of the keyframes (starting at 0)
+        timestamps (np.ndarray): Presentation timestamp of each frame in ms
+    """
+
+    def __init__(self, keyframes, timestamps):
+        self.keyframes = keyframes
+        self.timestamps = timestamps
+        self.total_frames = len(timestamps)
+
+    @classmethod
+    def load_or_build(cls, video_path):
+        """Load the index from its sidecar file or build and save it if outdated.
+
+        Args:
+            video_path (str or Path): Path of the video file
+
+        Returns:
+            VideoIndex: Index of the video
+        """
+        fingerprint = _get_file_fingerprint(video_path)
+        index = cls.load(video_path, fingerprint)
+        if index is None:
+            index = cls.build(video_path)
+            index.save(video_path, fingerprint)
+        return index
+
+    @classmethod
+    def load(cls, video_path, fingerprint):
+        """Load the index from its sidecar file.
+
+        Args:
+            video_path (str or Path): Path of the video file
+            fingerprint (str): Fingerprint of the video file
+
+        Returns:
+            VideoIndex: Index of the video or None if missing or outdated
+        """
+        try:
+            with np.load(get_index_path(video_path), allow_pickle=False) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                return cls(data["keyframes"], data["timestamps"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def build(cls, video_path):
+        """Scan all packets of a video for keyframes and timestamps.
+
+        Packets are read in raw mode without decoding. As packets are stored in
+        decoding order, the timestamps are sorted to get the presentation order.
+
+        Args:
+            video_path (str or Path): Path of the video file
+
+        Returns:
+            VideoIndex: Index of the video
+        """
+        capture = cv2.VideoCapture(
+            str(video_path), cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1]
+        )
+        if not capture.isOpened():
+            raise ValueError("Unable to open video source in raw mode", video_path)
+        timestamps = []
+        keyframe_timestamps = []
+        try:
+            while capture.grab():
+                timestamp = capture.get(cv2.CAP_PROP_POS_MSEC)
+                timestamps.append(timestamp)
+                if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframe_timestamps.append(timestamp)
+        finally:
+            capture.release()
+        timestamps = np.sort(np.array(timestamps, dtype=np.float64))
+        keyframes = np.searchsorted(timestamps, keyframe_timestamps).astype(np.int64)
+        return cls(np.unique(keyframes), timestamps)
+
+    def save(self, video_path, fingerprint):
+        """Save the index to its sidecar file next to the video.
+
+        Args:
+            video_path (str or Path): Path of the video file
+            fingerprint (str): Fingerprint of the video file
+        """
+        index_path = get_index_path(video_path)
+        temp_path = index_path.with_name(f"{index_path.name}.tmp")
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    keyframes=self.keyframes,
+                    timestamps=self.timestamps,
+                    fingerprint=np.array(fingerprint),
+                )
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            print(e)
+
+    def get_keyframe(self, frame_index):
+        """Get the nearest keyframe at or before a frame.
+
+        Args:
+            frame_index (int): Index of the frame (starting at 0)
+
+        Returns:
+            int: Index of the keyframe or None if no keyframes are known
+        """
+        position = np.searchsorted(self.keyframes, frame_index, side="right") - 1
+        if position < 0:
+            return None
+        return int(self.keyframes[position])
+
+    def get_time(self, frame_index):
+        """Get the presentation time of a frame relative to the first frame.
+
+        Args:
+            frame_index (int): Index of the frame (starting at 0)
+
+        Returns:
+            float: Time in seconds
+        """
+        return float(self.timestamps[frame_index] - self.timestamps[0]) / 1000
+
+    def get_frame_index(self, seconds):
+        """Get the frame presented at a time relative to the first frame.
+
+        Args:
+            seconds (float): Time in seconds (clamped to the video)
+
+        Returns:
+            int: Index of the frame (starting at 0)
+        """
+        # Tolerate the rounding of times to µs (e.g. by datetime.timedelta)
+        timestamp = self.timestamps[0] + seconds * 1000 + 0.0005
+        position = np.searchsorted(self.timestamps, timestamp, side="right") - 1
+        return int(min(max(position, 0), self.total_frames - 1))
+
+
+def get_index_path(video_path):
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + INDEX_SUFFIX)
@@ -0,0 +1,165 @@
+# OTVideoPlayer: ttk Treeview that only renders the rows in its visible window
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from tkinter import ttk
+
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTreeview(ttk.Treeview):
+    """Treeview holding only the items of the rows in its visible window.
+
+    Rows live in a data source outside of the widget and are formatted only when
+    they scroll into view. Refreshing after a change inserts, moves or deletes
+    only the items that differ, so its cost does not depend on the number of
+    rows. The selection is kept by row id, also for rows scrolled out of view.
+
+    Args:
+        get_row_count (callable): Returns the number of rows
+        get_row_id (callable): Returns the unique id (str) of the row at an index
+        format_row (callable): Returns text and values of the row at an index
+    """
+
+    def __init__(self, get_row_count, get_row_id, format_row, **kwargs):
+        super().__init__(**kwargs)
+        self.get_row_count = get_row_count
+        self.get_row_id = get_row_id
+        self.format_row = format_row
+        self.yscrollcommand = None
+        self.first_row = 0
+        self.visible_rows = 1
+        self.selected_ids = set()
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        self.row_height = int(row_height) if row_height else DEFAULT_ROW_HEIGHT
+        self.bind("<Configure>", self.resize)
+        self.bind("<<TreeviewSelect>>", self.update_selected_ids)
+        self.bind("<MouseWheel>", self.scroll_wheel)
+        self.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.bind("<Button-5>", lambda event: self.scroll(1))
+        self.bind("<Up>", lambda event: self.move_focus(-1))
+        self.bind("<Down>", lambda event: self.move_focus(1))
+
+    def refresh(self, see_end=False):
+        """Render the rows of the visible window after the data source changed.
+
+        Args:
+            see_end (bool, optional): Scroll to the last row. Defaults to False.
+        """
+        row_count = self.get_row_count()
+        if see_end:
+            self.first_row = row_count
+        self.first_row = max(0, min(self.first_row, row_count - self.visible_rows))
+        rows = range(self.first_row, min(self.first_row + self.visible_rows, row_count))
+        row_ids = [self.get_row_id(index) for index in rows]
+
+        # Only delete, insert or move items that changed
+        wanted = set(row_ids)
+        outdated = [iid for iid in self.get_children() if iid not in wanted]
+        if outdated:
+            self.delete(*outdated)
+        existing = set(self.get_children())
+        for position, (index, row_id) in enumerate(zip(rows, row_ids)):
+            if row_id not in existing:
+                text, values = self.format_row(index)
+                self.insert("", position, iid=row_id, text=text, values=values)
+            elif self.index(row_id) != position:
+                self.move(row_id, "", position)
+        self.selection_set(
+            [row_id for row_id in row_ids if row_id in self.selected_ids]
+        )
+
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.yview())
+
+    def yview(self, *args):
+        """Get or change the visible window like ttk.Treeview.yview().
+
+        Args:
+            *args: "moveto" and a fraction or "scroll", a number and "units" or
+                "pages". Without args the visible fractions are returned.
+
+        Returns:
+            tuple: First and last visible fraction of the rows (without args)
+        """
+        row_count = self.get_row_count()
+        if not args:
+            if not row_count:
+                return 0.0, 1.0
+            last_row = min(self.first_row + self.visible_rows, row_count)
+            return self.first_row / row_count, last_row / row_count
+        if args[0] == "moveto":
+            self.first_row = int(float(args[1]) * row_count)
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.first_row += int(args[1]) * step
+        self.refresh()
+
+    def scroll(self, units):
+        self.yview("scroll", units, "units")
+        return "break"  # Do not also scroll the video player
+
+    def scroll_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def move_focus(self, step):
+        """Move focus and selection by one row and scroll at the window edges.
+
+        Args:
+            step (int): -1 for up or 1 for down
+        """
+        children = self.get_children()
+        focus = self.focus()
+        if not children or focus not in children:
+            return None
+        position = children.index(focus) + step
+        if 0 <= position < len(children):
+            return None  # Treeview handles moves within the window itself
+        index = self.first_row + position
+        if not 0 <= index < self.get_row_count():
+            return "break"
+        self.first_row += step
+        row_id = self.get_row_id(index)
+        self.selected_ids = {row_id}
+        self.refresh()
+        self.focus(row_id)
+        return "break"
+
+    def resize(self, event):
+        # Heading takes about one row
+        visible_rows = max(1, event.height // self.row_height - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+
+    def update_selected_ids(self, event=None):
+        visible = set(self.get_children())
+        self.selected_ids = (self.selected_ids - visible) | set(self.selection())
+
+    def get_selected_ids(self):
+        """Get the ids of all selected rows, also of those out of view.
+
+        Returns:
+            set: Ids of the selected rows
+        """
+        self.update_selected_ids()
+        return set(self.selected_ids)
+
+    def clear_selection(self):
+        self.selected_ids.clear()
+        self.selection_set([])
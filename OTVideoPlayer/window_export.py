@@ -0,0 +1,99 @@
+# OTVideoPlayer: Tk window showing the progress of an export
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import threading
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+
+class WindowExport(tk.Toplevel):
+    """Window showing the progress of an export running in a background thread.
+
+    Args:
+        export (callable): Export function, called with on_progress and
+            cancel_event keyword arguments, returning a list of written files
+        title (str, optional): Title of the window. Defaults to "Export".
+        poll_interval (int, optional): Interval in ms to update the progress.
+            Defaults to 200.
+    """
+
+    def __init__(self, export, title="Export", poll_interval=200, **kwargs):
+        super().__init__(**kwargs)
+        self.title(title)
+        self.poll_interval = poll_interval
+        self.cancel_event = threading.Event()
+        self.progress = (0, 0, 0.0)
+        self.result = None
+        self.error = None
+        self.layout()
+        self.thread = threading.Thread(target=self.run, args=(export,), daemon=True)
+        self.thread.start()
+        self.poll()
+
+    def layout(self):
+        self.label_progress_var = tk.StringVar()
+        self.label_progress_var.set("Starting export ...")
+        self.label_progress = tk.Label(
+            master=self, textvariable=self.label_progress_var, width=50
+        )
+        self.label_progress.pack(padx=10, pady=5)
+        self.progressbar = ttk.Progressbar(
+            master=self, orient="horizontal", length=300, mode="determinate"
+        )
+        self.progressbar.pack(padx=10, pady=5)
+        self.button_cancel = tk.Button(master=self, text="Cancel", command=self.cancel)
+        self.button_cancel.pack(padx=10, pady=5)
+
+    def run(self, export):
+        try:
+            self.result = export(
+                on_progress=self.set_progress, cancel_event=self.cancel_event
+            )
+        except Exception as e:
+            self.error = e
+
+    def set_progress(self, processed, total, throughput):
+        # Called from the export thread, shown by poll()
+        self.progress = (processed, total, throughput)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.label_progress_var.set("Cancelling ...")
+
+    def poll(self):
+        processed, total, throughput = self.progress
+        if total:
+            self.progressbar.configure(maximum=total, value=processed)
+            if not self.cancel_event.is_set():
+                self.label_progress_var.set(
+                    f"{processed} of {total} frames ({throughput:.1f} frames/s)"
+                )
+        if self.thread.is_alive():
+            self.after(self.poll_interval, self.poll)
+            return
+        if self.error:
+            messagebox.showerror("Export failed", str(self.error), parent=self)
+        else:
+            state = "cancelled" if self.cancel_event.is_set() else "finished"
+            messagebox.showinfo(
+                f"Export {state}",
+                f"Export {state}, {len(self.result)} files written",
+                parent=self,
+            )
+        self.destroy()
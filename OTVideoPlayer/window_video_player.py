@@ -17,13 +17,17 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import threading
 import tkinter as tk
 from pathlib import Path
-from tkinter import filedialog
+from tkinter import filedialog, messagebox, simpledialog
 
 from frame_quick_time_stamps import FrameQuickTimeStamps, MenuQuickTimeStamps
 from frame_video_player import FrameVideoPlayer
-from helpers import ON_WINDOWS
+from helpers import ON_WINDOWS, _get_datetime_from_string
+
+# Recording segments opened before and after the one at the requested time
+SEGMENTS_AROUND = 2
 
 
 class WindowVideoPlayer(tk.Tk):
@@ -31,8 +35,9 @@ class WindowVideoPlayer(tk.Tk):
         self,
         title="OTVideoPlayer Standalone Application",
         video_path=None,
+        playlist=False,
         quick_time_stamps_enabled=True,
-        **kwargs
+        **kwargs,
     ):
         super().__init__(**kwargs)
         self.title(title)
@@ -40,6 +45,7 @@ class WindowVideoPlayer(tk.Tk):
             self.iconbitmap(Path(__file__).parents[0] / r"OTC.ico")
         self.quick_time_stamps_enabled = quick_time_stamps_enabled
         self.video_path = video_path
+        self.playlist = playlist
         self.frame_video_player = None
         self.width, self.height = self.winfo_screenmmwidth(), self.winfo_screenheight()
         self.state("zoomed")
@@ -49,7 +55,7 @@ class WindowVideoPlayer(tk.Tk):
     def layout(self):
 
         # Frame video player
-        self.open_video(video_path=self.video_path)
+        self.open_video(video_path=self.video_path, playlist=self.playlist)
 
         # Frame quick timestamps
         if self.quick_time_stamps_enabled:
@@ -64,12 +70,14 @@ class WindowVideoPlayer(tk.Tk):
         if self.quick_time_stamps_enabled:
             self.menu_quick_time_stamps = MenuQuickTimeStamps(master=self.menubar)
 
-        # Make window responsive
-        self.columnconfigure(0, weight=0)
+        # Make window responsive, the video gets most of the additional space
+        self.columnconfigure(0, weight=3)
         self.columnconfigure(1, weight=1)
         self.rowconfigure(0, weight=1)
 
-    def open_video(self, video_path=None):
+    def open_video(
+        self, video_path=None, playlist=False, segments=None, start_time=None
+    ):
         if self.frame_video_player:
             self.frame_video_player.destroy()
         if not video_path:
@@ -84,8 +92,93 @@ class WindowVideoPlayer(tk.Tk):
                     ("h264", "*.h264"),
                 ],
             )
-        self.frame_video_player = FrameVideoPlayer(master=self, video_path=video_path)
+        self.frame_video_player = FrameVideoPlayer(
+            master=self,
+            video_path=video_path,
+            playlist=playlist,
+            segments=segments,
+            start_time=start_time,
+        )
         self.frame_video_player.grid(column=0, row=0, sticky="NSEW")
+        self.frame_video_player.bind("<<VideoOpened>>", self.show_event_markers)
+
+    def open_recording_at_time(self):
+        from recording_index import RecordingIndex
+
+        directory = filedialog.askdirectory(
+            title="Please choose a directory of recordings (of one or more sites)"
+        )
+        if not directory:
+            return
+        # Only new or changed recordings are probed, by a worker thread so the
+        # window stays responsive
+        self.config(cursor="watch")
+        recording_index = RecordingIndex(directory)
+        worker = threading.Thread(target=recording_index.update, daemon=True)
+        worker.start()
+        self.after_thread(
+            worker, lambda: self.open_recording_of_index(recording_index, directory)
+        )
+
+    def after_thread(self, thread, callback, interval=50):
+        """Call callback in the Tk main loop once a thread has finished.
+
+        Args:
+            thread (threading.Thread): Thread to wait for
+            callback (callable): Called without arguments
+            interval (int, optional): Interval in ms to check the thread.
+                Defaults to 50.
+        """
+        if thread.is_alive():
+            self.after(interval, lambda: self.after_thread(thread, callback, interval))
+            return
+        callback()
+
+    def open_recording_of_index(self, recording_index, directory):
+        from segmented_video_capture import find_segments_around
+
+        self.config(cursor="")
+        if not len(recording_index):
+            messagebox.showinfo("No recordings", f"No recordings found in {directory}")
+            return
+        site = simpledialog.askstring(
+            "Site", "Site (part of the path of the recordings, optional):"
+        )
+        if site is None:
+            return
+        text = simpledialog.askstring(
+            "Real time", "Real time (yyyy-mm-dd HH:MM:SS or dd.mm.yyyy HH:MM:SS):"
+        )
+        if not text:
+            return
+        try:
+            # Times without date are on the day of the first recording
+            start_time = _get_datetime_from_string(
+                text.strip(), recording_index.get_start_time()
+            )
+        except ValueError:
+            messagebox.showinfo(
+                "Unknown time format", "Please enter a time like 2022-05-04 07:31:10"
+            )
+            return
+        video_paths = recording_index.find(start_time, site=site or None)
+        if not video_paths:
+            messagebox.showinfo(
+                "No recording", f"No recording of {site or 'any site'} at {text}"
+            )
+            return
+        # Recordings of the site around the time are played without gap
+        segments = find_segments_around(video_paths[0], SEGMENTS_AROUND)
+        self.open_video(
+            video_path=str(segments[0]),
+            playlist=True,
+            segments=segments,
+            start_time=start_time,
+        )
+
+    def show_event_markers(self, event=None):
+        if self.quick_time_stamps_enabled:
+            self.frame_quick_timestamps.show_event_markers()
 
 
 class MenuFile(tk.Menu):
@@ -96,5 +189,26 @@ class MenuFile(tk.Menu):
     def layout(self):
         self.master.add_cascade(menu=self, label="File")
         self.add_command(label="Open video...", command=self.master.master.open_video)
+        self.add_command(
+            label="Open recording segments as playlist...",
+            command=lambda: self.master.master.open_video(playlist=True),
+        )
+        self.add_command(
+            label="Open recording at time...",
+            command=self.master.master.open_recording_at_time,
+        )
+        self.add_command(
+            label="Go to time...",
+            command=lambda: self.master.master.frame_video_player.go_to_time(),
+        )
+        self.add_separator()
+        self.add_command(
+            label="Performance overlay (F3)",
+            command=lambda: self.master.master.frame_video_player.toggle_overlay(),
+        )
+        self.add_command(
+            label="Export frame timings...",
+            command=lambda: self.master.master.frame_video_player.export_timings(),
+        )
         self.add_separator()
         self.add_command(label="Quit", command=self.master.master.destroy)
@@ -0,0 +1,374 @@
+# OTVideoPlayer: Benchmark suite of the decode, seek, render and timestamp paths
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measure the hot paths of the player without a display and print json.
+
+Videos are the test video and synthetic longer and higher resolution videos,
+which are generated once into the work directory. Measured are sequential
+decode fps, random and backward seek latency of VideoCapture.get_frame(), the
+per-frame cost of the display_new_frame() pipeline (without a display only up
+to the PIL image) and timestamp table and csv operations at 10k to 1M rows.
+Save the output of runs (--output) to compare them over time.
+
+Usage: python benchmarks/hot_paths.py [--groups decode seek render timestamps]
+    [--rows 10000 100000 1000000] [--output results.json]
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import PIL.Image
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "OTVideoPlayer"))
+
+from render_pipeline import get_photo_image_factory  # noqa: E402
+from timestamp_database import TimestampDatabase  # noqa: E402
+from timestamp_store import (  # noqa: E402
+    CREATED,
+    CREATOR,
+    EVENT,
+    FRAME,
+    HEADERS,
+    REALTIME,
+    VIDEOPATH,
+    VIDEOTIME,
+    TimestampStore,
+)
+from video_capture import VideoCapture  # noqa: E402
+from video_index import VideoIndex  # noqa: E402
+
+TEST_VIDEO = (
+    Path(__file__).parents[1]
+    / "tests"
+    / "data"
+    / "Testvideo_Cars-Cyclist_FR20_2020-01-01_00-00-00.mp4"
+)
+
+# Name, width, height, fps and seconds of the synthetic videos
+SYNTHETIC_VIDEOS = [
+    ("Synthetic_720p_long", 1280, 720, 25, 60),
+    ("Synthetic_1080p", 1920, 1080, 25, 20),
+]
+
+GROUPS = ["decode", "seek", "render", "timestamps"]
+
+
+def make_synthetic_video(directory, name, width, height, fps, seconds):
+    """Write a video of moving noise and a moving box, unless it exists.
+
+    Args:
+        directory (Path): Directory of the video
+        name (str): Name of the video (without date and suffix)
+        width (int): Width of the frames
+        height (int): Height of the frames
+        fps (int): Frame rate
+        seconds (int): Duration in seconds
+
+    Returns:
+        Path: Path of the video
+    """
+    video_path = directory / f"{name}_2020-01-01_00-00-00.mp4"
+    if video_path.exists():
+        return video_path
+    temp_path = directory / f"tmp_{video_path.name}"
+    writer = cv2.VideoWriter(
+        str(temp_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    # Smooth noise has texture like real footage but keeps the file small
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    background = cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+    box = height // 4
+    for frame_index in range(fps * seconds):
+        frame = np.roll(background, frame_index * 4, axis=1)
+        x = frame_index * 8 % (width - box)
+        frame[box : 2 * box, x : x + box] = 255
+        writer.write(frame)
+    writer.release()
+    temp_path.replace(video_path)
+    return video_path
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "median_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def open_indexed(video_path):
+    video_capture = VideoCapture(str(video_path), use_index=False)
+    video_capture.set_index(VideoIndex.load_or_build(video_path))
+    return video_capture
+
+
+def get_canvas_size(video_capture, canvas_height):
+    width = int(canvas_height * video_capture.width / video_capture.height)
+    return canvas_height, width
+
+
+def benchmark_decode(video_path, canvas_height, max_frames=500):
+    """Decode frames in order natively and converted to the canvas size."""
+    capture = cv2.VideoCapture(str(video_path))
+    start = time.perf_counter()
+    frames = 0
+    while frames < max_frames and capture.read()[0]:
+        frames += 1
+    native_fps = frames / (time.perf_counter() - start)
+    capture.release()
+
+    video_capture = open_indexed(video_path)
+    height, width = get_canvas_size(video_capture, canvas_height)
+    video_capture.seek(1)
+    start = time.perf_counter()
+    frames = 0
+    while frames < max_frames:
+        if not video_capture.get_frame(height=height, width=width)[0]:
+            break
+        frames += 1
+    get_frame_fps = frames / (time.perf_counter() - start)
+    video_capture.release()
+    return {
+        "frames": frames,
+        "native_fps": native_fps,
+        "get_frame_fps": get_frame_fps,
+    }
+
+
+def benchmark_seek(video_path, canvas_height, seeks=50):
+    """Get random frames and frames in backward order, without the frame cache."""
+    video_capture = open_indexed(video_path)
+    height, width = get_canvas_size(video_capture, canvas_height)
+    total_frames = int(video_capture.total_frames)
+
+    def get_frame(frame_number):
+        video_capture.cache.clear()
+        start = time.perf_counter()
+        video_capture.get_frame(frame_number, height=height, width=width)
+        return time.perf_counter() - start
+
+    frame_numbers = random.Random(0).sample(
+        range(1, total_frames + 1), min(seeks, total_frames)
+    )
+    random_seek = summarize([get_frame(number) for number in frame_numbers])
+    last_frames = range(total_frames, max(total_frames - seeks, 0), -1)
+    backward_seek = summarize([get_frame(number) for number in last_frames])
+
+    # Stepping backward decodes segments once and serves them in reverse
+    video_capture.get_frame(total_frames, height=height, width=width)
+    latencies = []
+    for _ in range(min(seeks, total_frames - 1)):
+        video_capture.cache.clear()
+        start = time.perf_counter()
+        video_capture.get_previous_frame(height=height, width=width)
+        latencies.append(time.perf_counter() - start)
+    video_capture.release()
+    return {
+        "total_frames": total_frames,
+        "random_seek": random_seek,
+        "backward_seek": backward_seek,
+        "backward_step": summarize(latencies),
+    }
+
+
+def benchmark_render(video_path, canvas_height, photo_image, max_frames=200):
+    """Run the display_new_frame() pipeline: decode, resize, convert, show."""
+    video_capture = open_indexed(video_path)
+    height, width = get_canvas_size(video_capture, canvas_height)
+    video_capture.seek(1)
+    photo = None
+    latencies = []
+    for _ in range(max_frames):
+        start = time.perf_counter()
+        ret, frame = video_capture.get_frame(height=height, width=width)
+        if not ret:
+            break
+        image = PIL.Image.fromarray(frame)
+        if photo:
+            photo.paste(image)
+        elif photo_image:
+            photo = photo_image(image=image)
+        latencies.append(time.perf_counter() - start)
+    video_capture.release()
+    return {"canvas_size": [width, height], **summarize(latencies)}
+
+
+def make_timestamp_columns(rows, videos=10, events=5):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(1, 100000, rows)
+    return {
+        REALTIME: 1.6e9 + frames / 20,
+        VIDEOTIME: frames / 20,
+        FRAME: frames,
+        EVENT: [f"event_{number}" for number in rng.integers(0, events, rows)],
+        VIDEOPATH: [
+            f"/videos/site_{number}_2020-01-01_00-00-00.mp4"
+            for number in rng.integers(0, videos, rows)
+        ],
+        CREATED: 1.6e9 + np.arange(rows, dtype=np.float64),
+        CREATOR: ["benchmark"] * rows,
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def benchmark_timestamps(rows, work_dir):
+    """Load, edit, look up and save timestamps like FrameQuickTimeStamps."""
+    columns = make_timestamp_columns(rows)
+    csv_path = work_dir / f"timestamps_{rows}.csv"
+    result = {"rows": rows}
+
+    store = TimestampStore()
+    _, result["store_extend_ms"] = timed(store.extend, columns)
+    _, result["csv_write_ms"] = timed(
+        lambda: pd.DataFrame(store.to_columns(), columns=HEADERS).to_csv(
+            csv_path, index=False
+        )
+    )
+    _, result["csv_open_ms"] = timed(
+        lambda: TimestampStore().extend(pd.read_csv(csv_path, sep=",", comment="#"))
+    )
+
+    timestamp = {header: values[0] for header, values in columns.items()}
+    start = time.perf_counter()
+    for _ in range(1000):
+        store.add(timestamp)
+    result["store_add_us"] = (time.perf_counter() - start) * 1000
+    videopath = columns[VIDEOPATH][0]
+    start = time.perf_counter()
+    for frame in range(1, 100000, 100):
+        store.get_next_frame(videopath, frame)
+    result["store_next_frame_us"] = (time.perf_counter() - start) * 1000
+    delete_ids = random.Random(0).sample(range(rows), max(rows // 100, 1))
+    _, result["store_delete_1_percent_ms"] = timed(store.delete, delete_ids)
+
+    database_path = work_dir / f"timestamps_{rows}.sqlite"
+    for path in work_dir.glob(f"{database_path.name}*"):
+        path.unlink()
+    database = TimestampDatabase(database_path)
+    _, result["database_import_csv_ms"] = timed(database.import_csv, [csv_path])
+    _, result["database_query_ms"] = timed(
+        database.query, event="event_1", start=1.6e9, end=1.6e9 + 500
+    )
+    start = time.perf_counter()
+    for _ in range(100):
+        database.add(timestamp)
+    result["database_add_ms"] = (time.perf_counter() - start) * 10
+    database.close()
+    return result
+
+
+def get_environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--rows", nargs="+", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--canvas-height", type=int, default=500)
+    parser.add_argument(
+        "--work-dir",
+        default=str(Path(tempfile.gettempdir()) / "otvideoplayer_benchmarks"),
+        help="Directory of the synthetic videos and temporary files",
+    )
+    parser.add_argument("--output", help="Also write the results to this json file")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    results = {"environment": get_environment()}
+
+    # Copy of the test video, so its sidecar files are written to the work dir
+    test_video_path = work_dir / TEST_VIDEO.name
+    if not test_video_path.exists():
+        shutil.copy2(TEST_VIDEO, test_video_path)
+    video_paths = [test_video_path]
+    if set(args.groups) & {"decode", "seek", "render"}:
+        for name, width, height, fps, seconds in SYNTHETIC_VIDEOS:
+            video_paths.append(
+                make_synthetic_video(work_dir, name, width, height, fps, seconds)
+            )
+    photo_image = get_photo_image_factory() if "render" in args.groups else None
+    if "render" in args.groups:
+        results["render_includes_photo_image"] = photo_image is not None
+
+    for group, benchmark in [
+        ("decode", benchmark_decode),
+        ("seek", benchmark_seek),
+        ("render", benchmark_render),
+    ]:
+        if group not in args.groups:
+            continue
+        extra_args = (photo_image,) if group == "render" else ()
+        results[group] = {
+            video_path.name: benchmark(video_path, args.canvas_height, *extra_args)
+            for video_path in video_paths
+        }
+    if "timestamps" in args.groups:
+        results["timestamps"] = [
+            benchmark_timestamps(rows, work_dir) for rows in args.rows
+        ]
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
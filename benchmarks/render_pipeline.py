@@ -0,0 +1,136 @@
+# OTVideoPlayer: Benchmark of the render pipeline
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Compare the per-frame CPU time of the former and the current render pipeline.
+
+Decoding is done once up front, so only resizing, color conversion and the
+creation or update of the Tk PhotoImage are measured. Without a display, the
+PhotoImage part is skipped.
+
+Usage: python benchmarks/render_pipeline.py [video_path] [--canvas-height 500]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import PIL.Image
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "OTVideoPlayer"))
+
+from video_capture import VideoCapture  # noqa: E402
+
+TEST_VIDEO = (
+    Path(__file__).parents[1]
+    / "tests"
+    / "data"
+    / "Testvideo_Cars-Cyclist_FR20_2020-01-01_00-00-00.mp4"
+)
+
+
+def read_frames(video_path, max_frames=200):
+    capture = cv2.VideoCapture(str(video_path))
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def get_photo_image_factory():
+    try:
+        import tkinter as tk
+
+        import PIL.ImageTk
+
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return PIL.ImageTk.PhotoImage
+
+
+def render_former(frames, width, height, photo_image):
+    # Resize in OpenCV, convert into new array, resize again in PIL, new PhotoImage
+    for frame in frames:
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image = PIL.Image.fromarray(frame).resize((width, height))
+        if photo_image:
+            photo_image(image=image)
+
+
+def render_current(frames, width, height, photo_image, video_capture):
+    # One resize into a reused buffer, one color conversion, PhotoImage updated
+    photo = None
+    for frame in frames:
+        image = PIL.Image.fromarray(
+            video_capture._convert(frame, height=height, width=width)
+        )
+        if not photo_image:
+            continue
+        if photo:
+            photo.paste(image)
+        else:
+            photo = photo_image(image=image)
+
+
+def measure(function, frames, *args):
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    function(frames, *args)
+    return {
+        "cpu_ms_per_frame": (time.process_time() - start_cpu) * 1000 / len(frames),
+        "wall_ms_per_frame": (time.perf_counter() - start_wall) * 1000 / len(frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video_path", nargs="?", default=str(TEST_VIDEO))
+    parser.add_argument("--canvas-height", type=int, default=500)
+    args = parser.parse_args()
+
+    video_capture = VideoCapture(args.video_path, use_index=False)
+    height = args.canvas_height
+    width = int(height * video_capture.width / video_capture.height)
+    frames = read_frames(args.video_path)
+    photo_image = get_photo_image_factory()
+
+    print(f"{len(frames)} frames of {args.video_path} rendered at {width}x{height}")
+    if not photo_image:
+        print("No display available, PhotoImage creation/update not measured")
+    for name, function, extra_args in [
+        ("former", render_former, ()),
+        ("current", render_current, (video_capture,)),
+    ]:
+        result = measure(function, frames, width, height, photo_image, *extra_args)
+        print(
+            f"{name:8s} cpu {result['cpu_ms_per_frame']:.2f} ms/frame, "
+            f"wall {result['wall_ms_per_frame']:.2f} ms/frame"
+        )
+
+
+if __name__ == "__main__":
+    main()
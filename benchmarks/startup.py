@@ -0,0 +1,156 @@
+# OTVideoPlayer: Benchmark of the startup time
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measure import time, time to window and time to first frame of the player.
+
+Every run starts a fresh interpreter, so imports are measured cold. Without a
+display, only the import time is measured. The exit code is 1 if a median
+exceeds its limit, to guard against startup regressions.
+
+Usage: python benchmarks/startup.py [video_path] [--runs 5]
+    [--max-import-ms 300] [--max-first-frame-ms 2000] [--work-dir DIR]
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+OTVIDEOPLAYER_DIR = Path(__file__).parents[1] / "OTVideoPlayer"
+
+TEST_VIDEO = (
+    Path(__file__).parents[1]
+    / "tests"
+    / "data"
+    / "Testvideo_Cars-Cyclist_FR20_2020-01-01_00-00-00.mp4"
+)
+
+# Modules that should not be imported before they are needed
+HEAVY_MODULES = ["cv2", "numpy", "pandas", "PIL"]
+
+
+def measure_once(video_path):
+    # Runs in a fresh interpreter (see main()) and prints the result as json
+    start = time.perf_counter()
+    sys.path.insert(0, str(OTVIDEOPLAYER_DIR))
+    import tkinter as tk
+
+    import window_video_player  # noqa: F401
+    from frame_video_player import FrameVideoPlayer
+
+    result = {
+        "import_ms": (time.perf_counter() - start) * 1000,
+        "heavy_modules_imported": [
+            module for module in HEAVY_MODULES if module in sys.modules
+        ],
+    }
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        print(json.dumps(result))
+        return
+
+    def elapsed_ms():
+        return (time.perf_counter() - start) * 1000
+
+    def on_map(event):
+        result.setdefault("window_ms", elapsed_ms())
+
+    def poll_first_frame():
+        if player.photo:
+            result["first_frame_ms"] = elapsed_ms()
+            root.destroy()
+        else:
+            root.after(1, poll_first_frame)
+
+    root.bind("<Map>", on_map)
+    player = FrameVideoPlayer(master=root, video_path=str(video_path))
+    player.pack()
+    root.after(1, poll_first_frame)
+    root.mainloop()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-frame-ms", type=float, default=None)
+    parser.add_argument(
+        "--work-dir",
+        default=str(Path(tempfile.gettempdir()) / "otvideoplayer_benchmarks"),
+        help="Directory of the copy of the test video and its sidecar files",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.video_path is None:
+        # Copy of the test video, so its sidecar files are written to the work dir
+        work_dir = Path(args.work_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        test_video_path = work_dir / TEST_VIDEO.name
+        if not test_video_path.exists():
+            shutil.copy2(TEST_VIDEO, test_video_path)
+        args.video_path = str(test_video_path)
+
+    if args.child:
+        measure_once(args.video_path)
+        return
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, args.video_path, "--child"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {"runs": args.runs, "video_path": args.video_path}
+    for key in ["import_ms", "window_ms", "first_frame_ms"]:
+        values = [result[key] for result in results if key in result]
+        if values:
+            summary[key] = statistics.median(values)
+    summary["heavy_modules_imported"] = results[-1]["heavy_modules_imported"]
+    if "first_frame_ms" not in summary:
+        summary["note"] = "No display available, only the import time is measured"
+    print(json.dumps(summary, indent=2))
+
+    failed = [
+        f"{key} {summary[key]:.0f} ms > {limit:.0f} ms"
+        for key, limit in [
+            ("import_ms", args.max_import_ms),
+            ("first_frame_ms", args.max_first_frame_ms),
+        ]
+        if limit is not None and key in summary and summary[key] > limit
+    ]
+    if failed:
+        print("Startup regression: " + ", ".join(failed), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
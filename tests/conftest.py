@@ -0,0 +1,41 @@
+# OTVideoPlayer: Configuration of the tests
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules of the app import each other by their names
+sys.path.insert(0, str(Path(__file__).parents[1] / "OTVideoPlayer"))
+
+TEST_VIDEO = (
+    Path(__file__).parent
+    / "data"
+    / "Testvideo_Cars-Cyclist_FR20_2020-01-01_00-00-00.mp4"
+)
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    """Copy of the test video, so sidecar files are not written to tests/data."""
+    path = tmp_path / TEST_VIDEO.name
+    shutil.copy(TEST_VIDEO, path)
+    return path
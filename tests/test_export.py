@@ -0,0 +1,111 @@
+# OTVideoPlayer: Tests of exporting snapshots
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pathlib import Path
+
+import cv2
+import pytest
+
+import export
+from export import (
+    export_snapshots,
+    merge_windows,
+    save_clips,
+    save_snapshots,
+    split_into_segments,
+)
+
+
+def test_save_snapshots_creates_output_dir(video_path, tmp_path):
+    output_dir = tmp_path / "snapshots" / "cars"
+
+    snapshot_paths = save_snapshots(video_path, [3, 1, 20], output_dir=output_dir)
+
+    assert [Path(path).name for path in snapshot_paths] == [
+        f"{video_path.stem}_2020-01-01_00-00-00-000.jpg",
+        f"{video_path.stem}_2020-01-01_00-00-00-100.jpg",
+        f"{video_path.stem}_2020-01-01_00-00-00-950.jpg",
+    ]
+    for path in snapshot_paths:
+        assert Path(path).parent == output_dir
+        assert cv2.imread(path) is not None
+
+
+def test_save_snapshots_returns_only_written_paths(video_path, monkeypatch):
+    written = []
+
+    def imwrite(filename, img):
+        written.append(filename)
+        return len(written) != 2
+
+    monkeypatch.setattr(export.cv2, "imwrite", imwrite)
+
+    # Frame 10000 is beyond the end of the video and can not be read
+    snapshot_paths = save_snapshots(video_path, [1, 2, 3, 10000])
+
+    assert len(written) == 3
+    assert snapshot_paths == [written[0], written[2]]
+
+
+def test_merge_windows_of_overlapping_and_adjacent_frames():
+    # Windows 1-15 and 6-20 overlap, 21-35 is adjacent, 50-60 is clamped
+    assert merge_windows([10, 5, 25, 55], 5, 10, 60) == [(1, 35), (50, 60)]
+    assert merge_windows([10, 40], 2, 2, 60) == [(8, 12), (38, 42)]
+    assert merge_windows([], 2, 2, 60) == []
+
+
+def test_save_clips_creates_output_dir_and_writes_frames(video_path, tmp_path):
+    output_dir = tmp_path / "clips" / "cars"
+
+    clip_paths = save_clips(video_path, [(5, 20), (40, 45)], output_dir=output_dir)
+
+    assert len(clip_paths) == 2
+    frame_counts = []
+    for path in clip_paths:
+        assert Path(path).parent == output_dir
+        capture = cv2.VideoCapture(path)
+        frame_counts.append(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+        capture.release()
+    assert frame_counts == [16, 6]
+
+
+def test_save_clips_raises_if_writer_can_not_be_opened(video_path):
+    with pytest.raises(ValueError):
+        save_clips(video_path, [(5, 20)], fourcc="????")
+
+
+def test_export_snapshots_of_all_segments(video_path, tmp_path):
+    progress = []
+
+    snapshot_paths = export_snapshots(
+        [(video_path, frame_number) for frame_number in [5, 1, 5, 40]],
+        output_dir=tmp_path / "out",
+        processes=2,
+        on_progress=lambda done, total, fps: progress.append((done, total)),
+    )
+
+    assert len(snapshot_paths) == 3
+    assert all(Path(path).exists() for path in snapshot_paths)
+    assert progress[-1] == (3, 3)
+
+
+def test_split_into_segments():
+    assert split_into_segments([1, 2, 3, 4, 5], 2) == [[1, 2, 3], [4, 5]]
+    assert split_into_segments([1, 2], 4) == [[1], [2]]
+    assert split_into_segments([], 3) == []
@@ -0,0 +1,87 @@
+# OTVideoPlayer: Tests of the master clock of the playback
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+import playback_clock
+from playback_clock import PlaybackClock
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr(playback_clock, "time", fake_time)
+    return fake_time
+
+
+def test_due_frame_follows_time_and_speed(fake_time):
+    clock = PlaybackClock(fps=20)
+    clock.start(11)
+    fake_time.now += 0.5
+
+    assert clock.get_due_frame() == pytest.approx(21)
+    clock.set_speed(2)
+    fake_time.now += 0.5
+    assert clock.get_due_frame() == pytest.approx(41)
+
+
+def test_due_frame_backward(fake_time):
+    clock = PlaybackClock(fps=20)
+    clock.start(50, direction=-1)
+    fake_time.now += 1
+
+    assert clock.get_due_frame() == pytest.approx(30)
+
+
+def test_delay_until_next_frame_is_limited_by_max_fps(fake_time):
+    clock = PlaybackClock(fps=20, max_fps=10)
+    clock.start(1)
+
+    # Next frame is due in 50 ms, but at most 10 frames are shown per second
+    assert clock.get_delay(1) == 100
+    fake_time.now += 1
+    # Frames behind the clock are due immediately (limited by max_fps)
+    assert clock.get_delay(2) == 100
+    clock.max_fps = 1000
+    assert clock.get_delay(2) == 1
+
+
+def test_stats_count_dropped_frames_and_drift(fake_time):
+    clock = PlaybackClock(fps=20)
+    clock.start(1)
+    clock.frame_shown(1)
+    fake_time.now += 0.25
+    clock.frame_shown(4)
+
+    assert clock.get_stats() == {
+        "shown_frames": 2,
+        "dropped_frames": 2,
+        "drift": pytest.approx(0.1),
+        "max_drift": pytest.approx(0.1),
+    }
+    clock.reset_stats()
+    assert clock.get_stats()["shown_frames"] == 0
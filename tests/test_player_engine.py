@@ -0,0 +1,101 @@
+# OTVideoPlayer: Tests of the playback engine without user interface
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import datetime
+from pathlib import Path
+
+import pytest
+
+from player_engine import MAX_ZOOM, PlayerEngine
+
+
+@pytest.fixture
+def engine(video_path):
+    shown = []
+    engine = PlayerEngine(video_path, height=90, on_frame=lambda *args: shown.append(1))
+    engine.shown = shown
+    yield engine
+    engine.release()
+
+
+def test_size_keeps_aspect_ratio(engine):
+    native_width = engine.video_capture.width
+    native_height = engine.video_capture.height
+
+    assert engine.height == 90
+    assert engine.width == int(90 * native_width / native_height)
+
+
+def test_frames_yields_numbers_times_and_resized_frames(engine):
+    frames = list(engine.frames(start=1, end=30, step=10))
+
+    assert [frame_number for frame_number, _, _ in frames] == [1, 11, 21]
+    assert frames[1][1] == datetime.datetime(2020, 1, 1, 0, 0, 0, 500000)
+    assert all(frame.shape == (90, engine.width, 3) for _, _, frame in frames)
+    assert len(engine.shown) == 3
+
+
+def test_seek_and_step(engine):
+    engine.seek(20)
+    assert engine.current_frame == 20
+    engine.step(1)
+    assert engine.current_frame == 21
+    engine.step(-1)
+    assert engine.current_frame == 20
+    engine.step(-5)
+    assert engine.current_frame == 15
+    engine.seek_time(datetime.datetime(2020, 1, 1, 0, 0, 2))
+
+    assert engine.current_frame == 41
+    assert engine.get_timestamp()[1:] == (2.0, 41)
+
+
+def test_zoom_keeps_point_in_place_and_stays_inside_frame(engine):
+    native_width = int(engine.video_capture.width)
+    native_height = int(engine.video_capture.height)
+    engine.zoom_at(2, x=0.25, y=0.25)
+    x, y, width, height = engine.roi
+
+    assert (width, height) == (native_width // 2, native_height // 2)
+    assert x + 0.25 * width == pytest.approx(native_width / 4, abs=1)
+    engine.pan(-10, -10)
+    assert engine.roi[:2] == (native_width - width, native_height - height)
+    engine.zoom_at(1000)
+    assert engine.zoom == MAX_ZOOM
+    engine.zoom_at(0.5)
+    assert engine.roi is None
+
+
+def test_run_plays_in_real_time_until_end(engine):
+    engine.seek(1)
+    engine.run(end=10)
+
+    assert engine.paused
+    assert engine.current_frame >= 10
+    stats = engine.clock.get_stats()
+    assert stats["shown_frames"] + stats["dropped_frames"] >= 9
+
+
+def test_snapshot_in_native_resolution(engine, tmp_path):
+    engine.seek(5)
+
+    snapshot_path = engine.snapshot(output_dir=tmp_path / "snapshots")
+
+    assert Path(snapshot_path).parent == tmp_path / "snapshots"
+    assert Path(snapshot_path).name.endswith("00-00-00-200.jpg")
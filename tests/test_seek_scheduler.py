@@ -0,0 +1,133 @@
+# OTVideoPlayer: Tests of coalescing seeks
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import threading
+import time
+
+from seek_scheduler import SeekScheduler
+
+
+class FakeWidget:
+    """Runs callbacks scheduled with after() when the test says so."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = (delay, callback)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def run(self, max_delay=10, until=None, timeout=5):
+        # Run callbacks (up to max_delay ms) until none are scheduled anymore
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if until and until():
+                return
+            due = [
+                after_id
+                for after_id, (delay, _) in self.callbacks.items()
+                if delay <= max_delay
+            ]
+            if not due:
+                return
+            for after_id in due:
+                _, callback = self.callbacks.pop(after_id)
+                callback()
+            time.sleep(0.001)
+        raise TimeoutError
+
+
+class FakeCapture:
+    """Returns frame numbers as frames, keyframes every 10 frames."""
+
+    def __init__(self):
+        self.requests = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_keyframe_number(self, frame_number):
+        return (frame_number - 1) // 10 * 10 + 1
+
+    def get_frame(self, frame_number, height, width, roi, fast, abort):
+        self.requests.append((frame_number, fast))
+        while not self.release.wait(0.001):
+            if abort():
+                return (False, None)
+        return (True, frame_number)
+
+
+def make_scheduler():
+    widget = FakeWidget()
+    capture = FakeCapture()
+    frames = []
+    scheduler = SeekScheduler(
+        widget, capture, lambda ret, frame: frames.append(frame), 10, 20
+    )
+    return scheduler, widget, capture, frames
+
+
+def test_only_latest_of_a_burst_of_seeks_is_shown():
+    scheduler, widget, capture, frames = make_scheduler()
+    capture.release.clear()
+    for frame_number in range(1, 30):
+        scheduler.request(frame_number)
+    capture.release.set()
+
+    widget.run()
+
+    assert frames == [29]
+    assert capture.requests[-1] == (29, False)
+    assert not scheduler.is_pending()
+    assert scheduler.get_pending_target() is None
+    scheduler.stop()
+
+
+def test_preview_shows_keyframe_then_exact_frame():
+    scheduler, widget, capture, frames = make_scheduler()
+    scheduler.request(25, preview=True)
+
+    assert scheduler.get_pending_target() == 25
+    widget.run(until=lambda: frames)
+    assert scheduler.get_pending_target() == 25
+    assert frames == [21]
+    # The exact frame follows once requests settle
+    widget.run(max_delay=scheduler.settle_delay)
+
+    assert frames == [21, 25]
+    assert capture.requests == [(21, True), (25, False)]
+    scheduler.stop()
+
+
+def test_cancel_discards_running_seek():
+    scheduler, widget, capture, frames = make_scheduler()
+    capture.release.clear()
+    scheduler.request(5)
+    scheduler.cancel()
+    capture.release.set()
+
+    widget.run()
+
+    assert frames == []
+    assert scheduler.get_pending_target() is None
+    scheduler.stop()
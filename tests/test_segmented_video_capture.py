@@ -0,0 +1,106 @@
+# OTVideoPlayer: Tests of playing recording segments as one video
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import shutil
+import threading
+
+import pytest
+
+import segmented_video_capture
+from segmented_video_capture import (
+    SegmentedVideoCapture,
+    find_segments,
+    find_segments_around,
+)
+from video_index import VideoIndex, get_index_path
+
+
+@pytest.fixture
+def segment_paths(video_path):
+    # Second segment recorded right after the 3 s of the first one
+    next_path = video_path.with_name(video_path.name.replace("00-00-00", "00-00-03"))
+    shutil.copy(video_path, next_path)
+    return find_segments(video_path)
+
+
+def test_offsets_use_exact_frame_counts(segment_paths):
+    video_capture = SegmentedVideoCapture(segment_paths)
+    video_capture.wait_for_indexes()
+
+    assert video_capture.frame_counts == [60, 60]
+    assert video_capture.offsets == [0, 60, 120]
+    assert all(get_index_path(path).exists() for path in segment_paths)
+    assert video_capture.get_source(61) == (str(segment_paths[1]), 1)
+    assert video_capture.get_frame(frame_number=61)[0]
+    assert video_capture.current_frame == 61
+    video_capture.release()
+
+
+def test_indexes_are_built_in_background(segment_paths, monkeypatch):
+    built = threading.Event()
+    load_or_build = VideoIndex.load_or_build
+
+    def wait_and_load_or_build(video_path):
+        built.wait(5)
+        index = load_or_build(video_path)
+        # Pretend the container count of the second segment was inexact
+        index.total_frames = 70
+        return index
+
+    monkeypatch.setattr(
+        segmented_video_capture.VideoIndex, "load_or_build", wait_and_load_or_build
+    )
+    video_capture = SegmentedVideoCapture(segment_paths)
+
+    # Estimated by the container until the index is built
+    assert video_capture.offsets == [0, 60, 120]
+    assert not get_index_path(segment_paths[1]).exists()
+    built.set()
+    video_capture.wait_for_indexes()
+    assert video_capture.offsets == [0, 60, 130]
+    video_capture.release()
+
+
+def test_failed_preload_can_be_retried(segment_paths, monkeypatch):
+    video_capture = SegmentedVideoCapture(segment_paths)
+
+    def open_fails(*args, **kwargs):
+        raise ValueError("Unable to open video source")
+
+    monkeypatch.setattr(segmented_video_capture, "VideoCapture", open_fails)
+    video_capture._preloading = True
+    with pytest.raises(ValueError):
+        video_capture._preload(1)
+
+    assert not video_capture._preloading
+    assert 1 not in video_capture._segments
+    video_capture.release()
+
+
+def test_find_segments_around(video_path):
+    for seconds in range(3, 15, 3):
+        name = video_path.name.replace("00-00-00", f"00-00-{seconds:02d}")
+        shutil.copy(video_path, video_path.with_name(name))
+    segments = find_segments(video_path)
+
+    assert find_segments_around(segments[2], 1) == segments[1:4]
+    assert find_segments_around(segments[0], 2) == segments[:3]
+    assert find_segments_around(segments[4], 2) == segments[2:]
+    other_path = video_path.with_name("other.mp4")
+    assert find_segments_around(other_path, 2) == [other_path]
@@ -0,0 +1,127 @@
+# OTVideoPlayer: Tests of the SQLite database of timestamps
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pandas as pd
+import pytest
+
+from timestamp_database import MAX_PARAMETERS, TimestampDatabase
+from timestamp_store import (
+    CREATED,
+    CREATOR,
+    EVENT,
+    FRAME,
+    HEADERS,
+    REALTIME,
+    VIDEOPATH,
+    VIDEOTIME,
+)
+
+
+def make_timestamp(frame, event="car", videopath="site_a/a.mp4"):
+    return {
+        REALTIME: 1000.0 + frame,
+        VIDEOTIME: frame / 20,
+        FRAME: frame,
+        EVENT: event,
+        VIDEOPATH: videopath,
+        CREATED: 2000.0 + frame,
+        CREATOR: "tester",
+    }
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = TimestampDatabase(tmp_path / "timestamps.sqlite")
+    yield database
+    database.close()
+
+
+def test_add_and_reopen(database, tmp_path):
+    ids = [database.add(make_timestamp(frame)) for frame in [5, 3, 8]]
+
+    assert len(database) == 3
+    assert database.get(ids[1], FRAME) == 3
+    assert database.get(ids[2], CREATOR) == "tester"
+    database.close()
+    reopened = TimestampDatabase(tmp_path / "timestamps.sqlite")
+    assert [reopened.get_id(index) for index in range(3)] == ids
+    assert list(reopened.iter_rows(FRAME)) == [(5,), (3,), (8,)]
+    reopened.close()
+
+
+def test_delete_keeps_order_of_remaining_ids(database):
+    ids = database.extend(
+        pd.DataFrame([make_timestamp(frame) for frame in range(10)], columns=HEADERS)
+    )
+    database.delete([ids[2], ids[7], ids[2], 10**6])
+
+    assert len(database) == 8
+    assert ids[2] not in database and ids[3] in database
+    assert [database.get_id(index) for index in range(len(database))] == [
+        timestamp_id for timestamp_id in ids if timestamp_id not in (ids[2], ids[7])
+    ]
+    assert database.get_ids_of_frame(7) == set()
+    assert database.get_next_frame("site_a/a.mp4", 6) == 8
+    assert database.get_previous_frame("site_a/a.mp4", 3) == 1
+
+
+def test_query_by_event_exact_videopath_pattern_and_time(database):
+    database.add(make_timestamp(1, "car", "site_a/a.mp4"))
+    database.add(make_timestamp(2, "bike", "site_a/a.mp4"))
+    database.add(make_timestamp(3, "car", "site_b/b.mp4"))
+    database.add(make_timestamp(4, "car", "site_a/a_mp4"))
+
+    assert database.query(event="car", videopath="site_a/a.mp4")[FRAME] == [1]
+    assert database.query(videopath_pattern="site_a/%")[FRAME] == [1, 2, 4]
+    assert database.query(event="car", start=1002.0, end=1003.0)[FRAME] == [3]
+    assert database.query(event="truck") == {header: [] for header in HEADERS}
+
+
+def test_to_columns_round_trip(database):
+    timestamps = [make_timestamp(frame) for frame in range(2 * MAX_PARAMETERS + 5)]
+    ids = database.extend(pd.DataFrame(timestamps, columns=HEADERS))
+
+    columns = database.to_columns()
+    assert columns == {
+        header: [timestamp[header] for timestamp in timestamps] for header in HEADERS
+    }
+    # Selected ids in their order across chunks, unknown ids are skipped
+    selected = [ids[-1], 10**6, *ids[: MAX_PARAMETERS + 1], ids[3]]
+    columns = database.to_columns(selected)
+    assert columns[FRAME] == [
+        2 * MAX_PARAMETERS + 4,
+        *range(MAX_PARAMETERS + 1),
+        3,
+    ]
+
+
+def test_csv_round_trip(database, tmp_path):
+    database.extend(
+        pd.DataFrame([make_timestamp(frame) for frame in range(5)], columns=HEADERS)
+    )
+    database.set_buttons(["car", "bike"])
+    csv_path = tmp_path / "timestamps.csv"
+
+    database.export_csv(csv_path, database.get_buttons(), event="car")
+    imported = TimestampDatabase(tmp_path / "imported.sqlite")
+
+    assert csv_path.read_text().startswith("# Buttons: car,bike\n")
+    assert imported.import_csv([csv_path]) == 5
+    assert imported.to_columns() == database.to_columns()
+    imported.close()
@@ -0,0 +1,192 @@
+# OTVideoPlayer: Tests of the journal of unsaved timestamps
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from timestamp_csv import load_timestamps, read_buttons, save_timestamps
+from timestamp_journal import TimestampJournal
+from timestamp_store import CREATED, EVENT, FRAME, VIDEOPATH, TimestampStore
+
+
+class Session:
+    """Timestamps of the csv file and its journal like FrameQuickTimeStamps."""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        if csv_path.exists():
+            self.timestamps, self.labels, self.journal, _ = load_timestamps(csv_path)
+        else:
+            self.timestamps, self.labels, self.journal = TimestampStore(), [], None
+
+    def add(self, frame):
+        timestamp = {FRAME: frame, EVENT: "car", VIDEOPATH: "a.mp4", CREATED: 0.5}
+        timestamp_id = self.timestamps.add(timestamp)
+        if self.journal:
+            self.journal.add(timestamp_id, timestamp)
+        return timestamp_id
+
+    def delete_frame(self, frame):
+        timestamp_ids = sorted(self.timestamps.get_ids_of_frame(frame))
+        self.timestamps.delete(timestamp_ids)
+        if self.journal:
+            self.journal.delete(timestamp_ids)
+
+    def set_buttons(self, labels):
+        self.labels = labels
+        self.journal.set_buttons(labels)
+
+    def save(self):
+        self.journal = save_timestamps(
+            self.csv_path, self.timestamps, self.labels, self.journal
+        )
+
+    def crash(self):
+        # Written changes stay in the journal without compacting it
+        self.journal.close()
+
+    def frames(self):
+        return [frame for frame, in self.timestamps.iter_rows(FRAME)]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return tmp_path / "timestamps.csv"
+
+
+def test_replay_after_save_with_deletions(csv_path):
+    session = Session(csv_path)
+    for frame in range(10):
+        session.add(frame)
+    session.save()
+    session.delete_frame(3)
+    session.save()
+    session.add(100)
+    session.delete_frame(5)
+    session.add(101)
+    session.delete_frame(100)
+    session.delete_frame(8)
+    expected = session.frames()
+    session.crash()
+
+    recovered = Session(csv_path)
+
+    assert expected == [0, 1, 2, 4, 6, 7, 9, 101]
+    assert recovered.frames() == expected
+    recovered.crash()
+
+
+def test_replay_twice_before_saving(csv_path):
+    session = Session(csv_path)
+    for frame in range(5):
+        session.add(frame)
+    session.save()
+    session.delete_frame(0)
+    session.save()
+    session.add(10)
+    session.crash()
+    # The recovered session crashes again before it is saved
+    session = Session(csv_path)
+    session.delete_frame(10)
+    session.delete_frame(2)
+    session.add(11)
+    expected = session.frames()
+    session.crash()
+
+    recovered = Session(csv_path)
+
+    assert expected == [1, 3, 4, 11]
+    assert recovered.frames() == expected
+    recovered.save()
+    recovered.crash()
+    assert Session(csv_path).frames() == expected
+
+
+def test_appending_save_keeps_rows_of_journal(csv_path):
+    session = Session(csv_path)
+    session.add(1)
+    session.save()
+    session.add(2)
+    session.add(3)
+    # Only appended timestamps, so the csv file is appended to
+    session.save()
+    session.delete_frame(2)
+    session.crash()
+
+    assert Session(csv_path).frames() == [1, 3]
+
+
+def test_appending_save_of_changed_buttons(csv_path):
+    session = Session(csv_path)
+    session.labels = ["car"]
+    session.add(1)
+    session.save()
+    session.set_buttons(["car", "bike"])
+    session.add(2)
+    # Changed buttons do not force rewriting the csv file
+    assert session.journal.can_append()
+    session.save()
+    session.crash()
+
+    lines = csv_path.read_text().splitlines()
+    assert lines[0] == "# Buttons: car"
+    assert lines[-2] == "# Buttons: car,bike"
+    assert read_buttons(csv_path) == ["car", "bike"]
+    recovered = Session(csv_path)
+    assert recovered.labels == ["car", "bike"]
+    assert recovered.frames() == [1, 2]
+    recovered.crash()
+
+
+def test_save_compacts_without_looking_up_all_ids(csv_path, monkeypatch):
+    session = Session(csv_path)
+    for frame in range(5):
+        session.add(frame)
+    session.save()
+    session.delete_frame(1)
+    session.add(5)
+    session.delete_frame(5)
+    session.add(6)
+    expected = session.timestamps.get_ids()
+    monkeypatch.setattr(TimestampStore, "get_ids", None)
+
+    session.save()
+
+    assert list(session.journal.saved_ids) == expected
+    session.crash()
+    monkeypatch.undo()
+    assert Session(csv_path).frames() == [0, 2, 3, 4, 6]
+
+
+def test_flush_raises_error_of_writer(csv_path):
+    journal = TimestampJournal(csv_path)
+    journal._file.close()
+    journal.add(0, {FRAME: 0})
+
+    with pytest.raises(ValueError):
+        journal.flush(timeout=5)
+
+
+def test_flush_times_out(csv_path):
+    journal = TimestampJournal(csv_path)
+    # The writer thread waits for the lock of the journal file
+    with journal._lock:
+        journal.add(0, {FRAME: 0})
+        with pytest.raises(TimeoutError):
+            journal.flush(timeout=0.1)
+    journal.close()
@@ -0,0 +1,106 @@
+# OTVideoPlayer: Tests of the column store of timestamps
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import random
+
+import pandas as pd
+
+from timestamp_store import CREATED, EVENT, FRAME, HEADERS, VIDEOPATH, TimestampStore
+
+
+def make_timestamp(frame, event="car", videopath="a.mp4"):
+    return {FRAME: frame, EVENT: event, VIDEOPATH: videopath, CREATED: frame / 10}
+
+
+def test_ids_are_stable_and_not_reused():
+    store = TimestampStore()
+    ids = [store.add(make_timestamp(frame)) for frame in range(5)]
+    store.delete([ids[1], ids[3]])
+    new_id = store.add(make_timestamp(10))
+
+    assert ids == [0, 1, 2, 3, 4]
+    assert new_id == 5
+    assert len(store) == 4
+    assert 1 not in store and 2 in store
+    assert [store.get_id(index) for index in range(len(store))] == [0, 2, 4, 5]
+    assert store.get(new_id, FRAME) == 10
+
+
+def test_indexes_match_brute_force_after_adds_and_deletes():
+    rng = random.Random(1)
+    store = TimestampStore()
+    reference = {}
+    for _ in range(20):
+        for _ in range(50):
+            timestamp = make_timestamp(
+                rng.randrange(100), rng.choice("xyz"), rng.choice(["a", "b"])
+            )
+            reference[store.add(timestamp)] = timestamp
+        deleted = rng.sample(sorted(reference), 20)
+        # Unknown and repeated ids are ignored
+        store.delete(deleted + deleted[:3] + [10**6])
+        for timestamp_id in deleted:
+            del reference[timestamp_id]
+
+        assert len(store) == len(reference)
+        assert list(store.iter_rows(FRAME)) == [
+            (reference[timestamp_id][FRAME],) for timestamp_id in sorted(reference)
+        ]
+        for event in "xyz":
+            assert store.get_ids_of_event(event) == [
+                timestamp_id
+                for timestamp_id in sorted(reference)
+                if reference[timestamp_id][EVENT] == event
+            ]
+        for videopath in ["a", "b"]:
+            frames = sorted(
+                timestamp[FRAME]
+                for timestamp in reference.values()
+                if timestamp[VIDEOPATH] == videopath
+            )
+            for frame in range(-1, 101):
+                assert store.get_next_frame(videopath, frame) == next(
+                    (other for other in frames if other > frame), None
+                )
+                assert store.get_previous_frame(videopath, frame) == next(
+                    (other for other in reversed(frames) if other < frame), None
+                )
+        for frame in range(100):
+            assert store.get_ids_of_frame(frame) == {
+                timestamp_id
+                for timestamp_id, timestamp in reference.items()
+                if timestamp[FRAME] == frame
+            }
+
+
+def test_extend_accepts_missing_values_of_pandas():
+    dataframe = pd.DataFrame(
+        {
+            FRAME: [1.0, float("nan"), 3.0],
+            EVENT: ["car", "car", None],
+            VIDEOPATH: ["a.mp4"] * 3,
+            CREATED: [0.1, float("nan"), 0.3],
+        },
+        columns=HEADERS,
+    )
+    store = TimestampStore()
+
+    assert list(store.extend(dataframe)) == [0, 1, 2]
+    assert [store.get(timestamp_id, FRAME) for timestamp_id in range(3)] == [1, 0, 3]
+    assert store.get(1, CREATED) == 0.0
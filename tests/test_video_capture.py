@@ -0,0 +1,93 @@
+# OTVideoPlayer: Tests of seeking and reading frames
+# Copyright (C) 2022 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam
+# <team@opentrafficcam.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import cv2
+import numpy as np
+import pytest
+
+from video_capture import VideoCapture
+from video_index import VideoIndex
+
+
+class OvershootingCapture:
+    """Capture seeking some frames too far like OpenCV in some VFR videos."""
+
+    def __init__(self, capture, overshoot):
+        self.capture = capture
+        self.overshoot = overshoot
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and value > 0:
+            value += self.overshoot
+        return self.capture.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+
+def read_all_frames(video_path):
+    capture = cv2.VideoCapture(str(video_path))
+    frames = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def open_capture(video_path, keyframe_step):
+    # The test video has a single keyframe, more are pretended to seek to
+    index = VideoIndex.build(video_path)
+    index.keyframes = np.arange(0, index.total_frames, keyframe_step)
+    video_capture = VideoCapture(str(video_path), use_index=False)
+    video_capture.set_index(index)
+    return video_capture
+
+
+@pytest.mark.parametrize("overshoot", [0, 3, 15])
+def test_seeks_get_exact_frames(video_path, overshoot):
+    frames = read_all_frames(video_path)
+    video_capture = open_capture(video_path, keyframe_step=10)
+    video_capture.capture = OvershootingCapture(video_capture.capture, overshoot)
+
+    for frame_number in [35, 12, 60, 1, 21, 20, 48]:
+        ret, frame = video_capture.get_native_frame(frame_number)
+
+        assert ret
+        assert np.array_equal(frame, frames[frame_number - 1])
+    video_capture.release()
+
+
+def test_stepping_backward_gets_exact_frames(video_path):
+    frames = read_all_frames(video_path)
+    video_capture = open_capture(video_path, keyframe_step=10)
+    height, width = frames[0].shape[:2]
+    video_capture.get_frame(frame_number=len(frames))
+
+    for frame_number in range(len(frames) - 1, 0, -1):
+        ret, frame = video_capture.get_previous_frame(height, width)
+
+        assert ret
+        assert np.array_equal(
+            frame, cv2.cvtColor(frames[frame_number - 1], cv2.COLOR_BGR2RGB)
+        )
+    assert video_capture.get_previous_frame(height, width) == (False, None)
+    video_capture.release()